@@ -0,0 +1,181 @@
+"""Computer opponent that can drive either snake.
+
+Each tick the bot overlays the danger it can foresee on a copy of the
+game board: bullets a few ticks ahead along their paths, cells the other
+snakes' heads can reach next, and the poop monsters. Poop, bodies and
+turrets are already on the board. A FlowField BFS then runs from the
+apple or power-up back to the head and stops as soon as it reaches it.
+The bot takes that step unless the move leads into a pocket too small for
+its body, judged by a capped flood fill. The search gives up after
+FLOW_LIMIT cells, so on a large arena a distant target is approached
+straight on instead. When boxed in, it picks the move with the most room.
+
+All buffers (the obstacle grid, the BFS arrays, the flood-fill stamps) are
+allocated once per bot and reused, so a decision costs a fraction of a
+millisecond.
+"""
+import random
+from array import array
+
+import numpy as np
+
+from engine import GRID_COUNT, DIRECTIONS, FLOW_LIMIT, FlowField
+
+# How many ticks ahead bullet paths count as dangerous
+BULLET_LOOKAHEAD = 3
+
+# Flood fills stop counting once they find this many cells beyond the body
+ROOM_MARGIN = 16
+
+
+class SnakeAI:
+    def __init__(self, player, size=GRID_COUNT):
+        self.player = player
+        self.size = size
+        self.blocked = bytearray(size * size)
+        self.field = FlowField(size)
+        self.seen = array('i', [0]) * (size * size)
+        self.generation = 0
+        self.queue = array('i', [0]) * (size * size)
+
+    def _mark_dangers(self, state, snake):
+        size, blocked = self.size, self.blocked
+        blocked[:] = state.board.cells
+        # The apple and the power-up are on the board but are worth walking on
+        pickups = [state.food] if state.food is not None else []
+        if state.power_up:
+            pickups.append((state.power_up.x, state.power_up.y))
+        for x, y in pickups:
+            blocked[y * size + x] -= 1
+
+        # Bullets where they will be over the next few ticks, except our own
+        pool = state.bullets
+        n = pool.count
+        if n:
+            own = snake.extra_turret.source if snake.extra_turret else -1
+            hostile = pool.source[:n] != own
+            x, y = pool.x[:n][hostile], pool.y[:n][hostile]
+            dx, dy = pool.dx[:n][hostile], pool.dy[:n][hostile]
+            for k in range(1, BULLET_LOOKAHEAD + 1):
+                bx, by = x + k * dx, y + k * dy
+                inside = (bx >= 0) & (bx < size) & (by >= 0) & (by < size)
+                for cell in (by[inside].astype(np.intp) * size + bx[inside].astype(np.intp)).tolist():
+                    blocked[cell] = 1
+
+        # Wherever the other heads can be after their next move
+        for other in state.snakes:
+            if other is snake or other.death:
+                continue
+            hx, hy = other.body[0]
+            reach = 2 if other.speed_boost else 1
+            for dx, dy in DIRECTIONS.values():
+                for k in range(1, reach + 1):
+                    x, y = hx + k * dx, hy + k * dy
+                    if 0 <= x < size and 0 <= y < size:
+                        blocked[y * size + x] = 1
+
+        for monster in state.poop_monsters:
+            x, y = int(monster.x), int(monster.y)
+            for cx, cy in ((x, y), (x + monster.heading[0], y + monster.heading[1])):
+                if 0 <= cx < size and 0 <= cy < size:
+                    blocked[cy * size + cx] = 1
+
+    def _room(self, start, limit):
+        """Free cells reachable from start, counting up to limit."""
+        size, blocked, seen, queue = self.size, self.blocked, self.seen, self.queue
+        self.generation += 1
+        gen = self.generation
+        seen[start] = gen
+        queue[0] = start
+        head, tail = 0, 1
+        while head < tail and tail < limit:
+            i = queue[head]
+            head += 1
+            x, y = i % size, i // size
+            for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                if 0 <= nx < size and 0 <= ny < size:
+                    j = ny * size + nx
+                    if seen[j] != gen and not blocked[j]:
+                        seen[j] = gen
+                        queue[tail] = j
+                        tail += 1
+        return tail
+
+    def _landing(self, head, action, steps):
+        """Where a move ends up, or None if any cell on the way is deadly."""
+        size, blocked = self.size, self.blocked
+        dx, dy = DIRECTIONS[action]
+        x, y = head
+        for _ in range(steps):
+            x, y = x + dx, y + dy
+            if not (0 <= x < size and 0 <= y < size) or blocked[y * size + x]:
+                return None
+        return (x, y)
+
+    def _target(self, state, head):
+        """The closer of the apple and the power-up, by Manhattan distance."""
+        targets = [state.food] if state.food is not None else []
+        if state.power_up:
+            targets.append((state.power_up.x, state.power_up.y))
+        if not targets:
+            return None
+        return min(targets, key=lambda t: abs(t[0] - head[0]) + abs(t[1] - head[1]))
+
+    def decide(self, state):
+        """The action for this tick: a direction, or None to keep going."""
+        snake = state.snakes[self.player]
+        if state.game_over or snake.death:
+            return None
+        self._mark_dangers(state, snake)
+        head = snake.body[0]
+        steps = 2 if snake.speed_boost else 1
+        size = self.size
+
+        moves = {}
+        for action, (dx, dy) in DIRECTIONS.items():
+            if [dx, dy] == [-snake.direction[0], -snake.direction[1]]:
+                continue
+            landing = self._landing(head, action, steps)
+            if landing is not None:
+                moves[action] = landing
+        if not moves:
+            return None
+
+        needed = len(snake.body) + ROOM_MARGIN
+        target = self._target(state, head)
+        if target is not None:
+            cut_short = self.field.compute(target, self.blocked, goals=[head], limit=FLOW_LIMIT)
+            step = self.field.next_step(head)
+            if step is not None:
+                candidates = [action for action, (dx, dy) in DIRECTIONS.items()
+                              if (head[0] + dx, head[1] + dy) == step]
+            elif cut_short:
+                # Out of the search's reach: close in on the target directly
+                candidates = sorted(moves, key=lambda a: abs(moves[a][0] - target[0]) +
+                                                         abs(moves[a][1] - target[1]))
+            else:
+                candidates = []
+            for action in candidates:
+                if action in moves:
+                    x, y = moves[action]
+                    if self._room(y * size + x, needed) >= needed:
+                        return action
+
+        # Boxed in or no safe path: the move with the most room
+        best, best_room = None, -1
+        for action, (x, y) in moves.items():
+            room = self._room(y * size + x, needed)
+            if room > best_room:
+                best, best_room = action, room
+        return best
+
+
+_bots = {}
+
+
+def policy(state, player, rng=random):
+    """SnakeAI as a tournament policy, one bot per player and process."""
+    bot = _bots.get(player)
+    if bot is None or bot.size != state.size:
+        bot = _bots[player] = SnakeAI(player, state.size)
+    return bot.decide(state)
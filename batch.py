@@ -0,0 +1,485 @@
+"""Many two-snake games stepped together as stacked NumPy arrays.
+
+BatchEngine runs the same rules as engine.GameState (snake moves and
+speed-boost sub-steps, turrets and bullets, power-ups, food, poop,
+next_level and flow-field monsters) for B games at once, one vectorized
+operation per rule per tick. There is no god mode and no visual effects.
+Finished games are reset automatically unless auto_reset is off.
+
+Cells are flat indices y * size + x. Only the random spawn choices differ
+from GameState: the batch draws them from one NumPy generator, through the
+_pick_* methods, which the parity tests override to line the two engines up.
+"""
+import math
+
+import numpy as np
+
+import engine
+from engine import GRID_COUNT, SHIELD, SPEED, POOP_EATER, TURRET, DIRECTIONS
+
+NO_ACTION = -1
+
+# Turret slots: the centre turret, then one per snake for the TURRET power-up
+CENTER_TURRET = 0
+TURRET_SLOTS = 3
+
+COUNTDOWN = 15
+
+
+class BatchEngine:
+    def __init__(self, batch_size, seed=None, size=GRID_COUNT, max_monsters=32,
+                 auto_reset=True):
+        self.batch_size = B = batch_size
+        self.size = G = size
+        self.cells = G * G
+        self.max_monsters = M = max_monsters
+        self.auto_reset = auto_reset
+        self.rng = np.random.default_rng(seed)
+
+        # A snake can never be longer than the board without god mode
+        self.capacity = L = self.cells
+        # Bullets fly at most the board diagonal, so only a few volleys per
+        # turret are ever alive at once. Balance knobs are read from engine at
+        # use time, but SHOOT_INTERVAL must not shrink after construction.
+        self.volleys = V = int(math.ceil(G * math.sqrt(2) / engine.SHOOT_INTERVAL)) + 1
+
+        x = np.arange(self.cells) % G
+        y = np.arange(self.cells) // G
+        self.interior = (x >= 1) & (x < G - 1) & (y >= 1) & (y < G - 1)
+
+        # Snakes: ring-buffer bodies, head first, and per-snake cell counts
+        self.body_x = np.zeros((B, 2, L), dtype=np.int16)
+        self.body_y = np.zeros((B, 2, L), dtype=np.int16)
+        self.head = np.zeros((B, 2), dtype=np.int64)
+        self.length = np.zeros((B, 2), dtype=np.int64)
+        self.occupancy = np.zeros((B, 2, self.cells), dtype=np.uint8)
+        self.direction = np.zeros((B, 2, 2), dtype=np.int64)
+        self.grow = np.zeros((B, 2), dtype=bool)
+        self.score = np.zeros((B, 2), dtype=np.int64)
+        self.apples_eaten = np.zeros((B, 2), dtype=np.int64)
+        self.shield = np.zeros((B, 2), dtype=np.int64)
+        self.speed_boost = np.zeros((B, 2), dtype=np.int64)
+        self.poop_eater = np.zeros((B, 2), dtype=np.int64)
+        self.extra_turret = np.zeros((B, 2), dtype=bool)
+
+        # Turrets and their bullets, one slot per (turret, volley, target)
+        self.turret_cell = np.zeros((B, TURRET_SLOTS), dtype=np.int64)
+        self.turret_active = np.zeros((B, TURRET_SLOTS), dtype=bool)
+        self.shoot_timer = np.zeros((B, TURRET_SLOTS), dtype=np.int64)
+        self.volley = np.zeros((B, TURRET_SLOTS), dtype=np.int64)
+        self.bullet_x = np.zeros((B, TURRET_SLOTS, V, 2))
+        self.bullet_y = np.zeros((B, TURRET_SLOTS, V, 2))
+        self.bullet_dx = np.zeros((B, TURRET_SLOTS, V, 2))
+        self.bullet_dy = np.zeros((B, TURRET_SLOTS, V, 2))
+        self.bullet_alive = np.zeros((B, TURRET_SLOTS, V, 2), dtype=bool)
+
+        # Poop owners per cell as bits: 1 for snake 0, 2 for snake 1
+        self.poop = np.zeros((B, self.cells), dtype=np.uint8)
+
+        # Food and power-up cells, -1 when absent
+        self.food = np.full(B, -1, dtype=np.int64)
+        self.power_up = np.full(B, -1, dtype=np.int64)
+        self.power_up_type = np.zeros(B, dtype=np.int64)
+
+        # Monsters move half a cell per tick, so positions are in half cells
+        self.monster_x2 = np.zeros((B, M), dtype=np.int64)
+        self.monster_y2 = np.zeros((B, M), dtype=np.int64)
+        self.monster_target = np.full((B, M), -1, dtype=np.int64)
+        self.monster_heading = np.zeros((B, M, 2), dtype=np.int64)
+        self.monster_alive = np.zeros((B, M), dtype=bool)
+
+        self.level = np.zeros(B, dtype=np.int64)
+        self.apples_eaten_this_level = np.zeros(B, dtype=np.int64)
+        self.countdown_timer = np.zeros(B, dtype=np.int64)
+        self.game_over = np.zeros(B, dtype=bool)
+        self.tick = np.zeros(B, dtype=np.int64)
+
+        self.reset()
+
+    # Random choices, overridable so tests can make them deterministic
+
+    def _pick_cells(self, free):
+        """One uniformly random True column per row of free, -1 for none."""
+        keys = self.rng.random(free.shape)
+        keys[~free] = -1
+        picks = keys.argmax(axis=1)
+        picks[~free.any(axis=1)] = -1
+        return picks
+
+    def _pick_power_up_types(self, games):
+        return self.rng.integers(SHIELD, TURRET + 1, size=len(games))
+
+    def _pick_monster_cells(self, games):
+        xy = self.rng.integers(1, self.size - 1, size=(len(games), 2))
+        return xy[:, 1] * self.size + xy[:, 0]
+
+    # Board helpers
+
+    def _head_cells(self, games, p):
+        i = self.head[games, p]
+        return self.body_y[games, p, i].astype(np.int64) * self.size + self.body_x[games, p, i]
+
+    def _tail_cells(self, games, p):
+        i = (self.head[games, p] + self.length[games, p] - 1) % self.capacity
+        return self.body_y[games, p, i].astype(np.int64) * self.size + self.body_x[games, p, i]
+
+    def _blocked(self, games):
+        """Cells holding a snake, poop or turret, per game in games."""
+        blocked = (self.occupancy[games].sum(axis=1) > 0) | (self.poop[games] > 0)
+        rows, slots = np.nonzero(self.turret_active[games])
+        blocked[rows, self.turret_cell[games[rows], slots]] = True
+        return blocked
+
+    def _spawn_cells(self, games):
+        """Random empty cells inside the walls, -1 on a full board."""
+        if len(games) == 0:
+            return np.zeros(0, dtype=np.int64)
+        free = ~self._blocked(games) & self.interior
+        rows = np.arange(len(games))
+        for cells in (self.food[games], self.power_up[games]):
+            present = cells >= 0
+            free[rows[present], cells[present]] = False
+        return self._pick_cells(free)
+
+    def _spawn_food(self, games):
+        self.food[games] = self._spawn_cells(games)
+
+    def _spawn_power_up(self, games):
+        cells = self._spawn_cells(games)
+        types = self._pick_power_up_types(games)
+        self.power_up[games] = cells
+        self.power_up_type[games] = np.where(cells >= 0, types, 0)
+
+    def _push_head(self, games, p, x, y):
+        i = (self.head[games, p] - 1) % self.capacity
+        self.head[games, p] = i
+        self.body_x[games, p, i] = x
+        self.body_y[games, p, i] = y
+        self.length[games, p] += 1
+        self.occupancy[games, p, y * self.size + x] += 1
+
+    def _pop_tail(self, games, p):
+        tail = self._tail_cells(games, p)
+        self.length[games, p] -= 1
+        self.occupancy[games, p, tail] -= 1
+
+    # Game lifecycle
+
+    def reset(self, games=None):
+        """Start fresh games (all of them by default)."""
+        if games is None:
+            games = np.arange(self.batch_size)
+        games = np.asarray(games, dtype=np.int64)
+        if len(games) == 0:
+            return
+        G = self.size
+        self.head[games] = 0
+        self.length[games] = 0
+        self.occupancy[games] = 0
+        for p, x in enumerate((5, G - 6)):
+            self._push_head(games, p, np.full(len(games), x), np.full(len(games), G // 2))
+        self.direction[games] = (1, 0)
+        for array in (self.grow, self.score, self.apples_eaten, self.shield,
+                      self.speed_boost, self.poop_eater, self.extra_turret,
+                      self.turret_active, self.shoot_timer, self.volley,
+                      self.bullet_alive, self.poop, self.monster_alive,
+                      self.monster_heading, self.apples_eaten_this_level,
+                      self.game_over, self.tick):
+            array[games] = 0
+        self.monster_target[games] = -1
+        self.turret_cell[games, CENTER_TURRET] = (G // 2) * G + G // 2
+        self.turret_active[games, CENTER_TURRET] = True
+        self.level[games] = 1
+        self.countdown_timer[games] = COUNTDOWN
+        self.food[games] = -1
+        self.power_up[games] = -1
+        self._spawn_food(games)
+        self._spawn_power_up(games)
+
+    def _next_level(self, games):
+        self.level[games] += 1
+        self.apples_eaten_this_level[games] = 0
+        self.poop[games] = 0
+
+        # Add new poop monster that will chase snake that poops
+        cells = self._pick_monster_cells(games)
+        free_slot = ~self.monster_alive[games]
+        has_slot = free_slot.any(axis=1)
+        slot = free_slot.argmax(axis=1)
+        g, slot, cells = games[has_slot], slot[has_slot], cells[has_slot]
+        self.monster_alive[g, slot] = True
+        self.monster_x2[g, slot] = 2 * (cells % self.size)
+        self.monster_y2[g, slot] = 2 * (cells // self.size)
+        self.monster_target[g, slot] = -1
+        self.monster_heading[g, slot] = 0
+
+        self._spawn_food(games)
+        self._spawn_power_up(games)
+
+    # Rules
+
+    def _apply_actions(self, actions):
+        actions = np.asarray(actions)
+        for action, (dx, dy) in DIRECTIONS.items():
+            games, players = np.nonzero(actions == action)
+            current = self.direction[games, players]
+            # No turning back onto yourself
+            allowed = ~((current[:, 0] == -dx) & (current[:, 1] == -dy))
+            self.direction[games[allowed], players[allowed]] = (dx, dy)
+
+    def _update_turrets(self, games):
+        # Move every bullet, then drop the ones that left the board
+        alive = self.bullet_alive[games]
+        x = self.bullet_x[games] + self.bullet_dx[games]
+        y = self.bullet_y[games] + self.bullet_dy[games]
+        self.bullet_x[games] = x
+        self.bullet_y[games] = y
+        self.bullet_alive[games] = alive & (x >= 0) & (x < self.size) & (y >= 0) & (y < self.size)
+
+        self.shoot_timer[games] -= self.turret_active[games]
+        rows, slots = np.nonzero(self.turret_active[games] & (self.shoot_timer[games] <= 0))
+        g = games[rows]
+        if len(g) == 0:
+            return
+        tx = (self.turret_cell[g, slots] % self.size).astype(float)
+        ty = (self.turret_cell[g, slots] // self.size).astype(float)
+        v = self.volley[g, slots]
+        for p in range(2):
+            head = self._head_cells(g, p)
+            dx = head % self.size - tx
+            dy = head // self.size - ty
+            length = np.sqrt(dx * dx + dy * dy)
+            aimed = length > 0
+            safe = np.where(aimed, length, 1)
+            self.bullet_x[g, slots, v, p] = tx
+            self.bullet_y[g, slots, v, p] = ty
+            self.bullet_dx[g, slots, v, p] = dx / safe
+            self.bullet_dy[g, slots, v, p] = dy / safe
+            self.bullet_alive[g, slots, v, p] = aimed
+        self.volley[g, slots] = (v + 1) % self.volleys
+        self.shoot_timer[g, slots] = engine.SHOOT_INTERVAL
+
+    def _move(self, games, p):
+        """Move snake p in games; returns the games where it hit the wall."""
+        i = self.head[games, p]
+        x = self.body_x[games, p, i] + self.direction[games, p, 0]
+        y = self.body_y[games, p, i] + self.direction[games, p, 1]
+        out = (x < 0) | (x >= self.size) | (y < 0) | (y >= self.size)
+        moved = games[~out]
+        self._push_head(moved, p, x[~out], y[~out])
+        grow = self.grow[moved, p]
+        self._pop_tail(moved[~grow], p)
+        self.grow[moved, p] = False
+
+        pooped = moved[self.apples_eaten[moved, p] >= 2]
+        if len(pooped):
+            self.poop[pooped, self._tail_cells(pooped, p)] |= 1 << p
+            self.apples_eaten[pooped, p] = 0
+            # Make all nearby monsters chase this snake
+            retarget = self.monster_alive[pooped] & (self.monster_target[pooped] != 1 - p)
+            self.monster_target[pooped] = np.where(retarget, p, self.monster_target[pooped])
+        return games[out]
+
+    def _collect_power_up(self, games, p):
+        types = self.power_up_type[games]
+        for kind, timer, time in ((SHIELD, self.shield, engine.SHIELD_TIME),
+                                  (SPEED, self.speed_boost, engine.SPEED_TIME),
+                                  (POOP_EATER, self.poop_eater, engine.POOP_EATER_TIME)):
+            timer[games[types == kind], p] = time
+        turret = games[(types == TURRET) & ~self.extra_turret[games, p]]
+        self.extra_turret[turret, p] = True
+        slot = CENTER_TURRET + 1 + p
+        self.turret_active[turret, slot] = True
+        self.turret_cell[turret, slot] = self.power_up[turret]
+        self.shoot_timer[turret, slot] = 0
+        self.volley[turret, slot] = 0
+        self._spawn_power_up(games)
+
+    def _substep(self, movers, update_timers):
+        games = np.flatnonzero(movers.any(axis=1))
+
+        # Move snakes; a wall death stops the second snake from moving
+        stopped = np.zeros(self.batch_size, dtype=bool)
+        for p in range(2):
+            crashed = self._move(np.flatnonzero(movers[:, p] & ~stopped), p)
+            self.game_over[crashed] = True
+            stopped[crashed] = True
+
+        # Update power-ups
+        if update_timers:
+            for timer in (self.shield, self.speed_boost, self.poop_eater):
+                timer[games] -= timer[games] > 0
+
+        # Check power-up collision, then food
+        for p in range(2):
+            g = np.flatnonzero(movers[:, p])
+            hit = g[(self.power_up[g] >= 0) & (self._head_cells(g, p) == self.power_up[g])]
+            self._collect_power_up(hit, p)
+        for p in range(2):
+            g = np.flatnonzero(movers[:, p])
+            ate = g[self._head_cells(g, p) == self.food[g]]
+            self.grow[ate, p] = True
+            self.score[ate, p] += 1
+            self.apples_eaten[ate, p] += 1
+            self.apples_eaten_this_level[ate] += 1
+            self._spawn_food(ate)
+
+        # Check if level complete
+        self._next_level(games[self.apples_eaten_this_level[games] >= engine.LEVEL_APPLES])
+
+        # Check collisions: own body, other snake, bullets and poop
+        bullet_cells = np.where(
+            self.bullet_alive,
+            self.bullet_y.astype(np.int64) * self.size + self.bullet_x.astype(np.int64),
+            -1)
+        for p in range(2):
+            g = np.flatnonzero(movers[:, p])
+            head = self._head_cells(g, p)
+            dead = self.occupancy[g, p, head] > 1
+            dead |= self.occupancy[g, 1 - p, head] > 0
+            # Snakes are immune to bullets from their own turret
+            on_head = bullet_cells[g] == head[:, None, None, None]
+            on_head[:, CENTER_TURRET + 1 + p] = False
+            dead |= on_head.any(axis=(1, 2, 3))
+            owners = self.poop[g, head]
+            for q in range(2):
+                dead |= ((owners >> q) & 1).astype(bool) & (self.poop_eater[g, q] == 0)
+            self.game_over[g[dead]] = True
+
+    def _flow_distances(self, games, p, goals):
+        """BFS distances to snake p's tail, -1 where unreached.
+
+        Matches FlowField.compute(): obstacles are snakes, poop and turrets,
+        goal cells are entered but not expanded, and the search stops once
+        every goal has been reached.
+        """
+        n, G = len(games), self.size
+        blocked = self._blocked(games).reshape(n, G, G)
+        goals = goals.reshape(n, G, G)
+        enter = ~blocked | goals
+        dist = np.full((n, G, G), -1, dtype=np.int64)
+        frontier = np.zeros((n, G, G), dtype=bool)
+        tail = self._tail_cells(games, p)
+        rows = np.arange(n)
+        dist[rows, tail // G, tail % G] = 0
+        frontier[rows, tail // G, tail % G] = True
+        remaining = goals & (dist < 0)
+        d = 0
+        while remaining.any() and frontier.any():
+            reached = np.zeros_like(frontier)
+            reached[:, :, :-1] |= frontier[:, :, 1:]
+            reached[:, :, 1:] |= frontier[:, :, :-1]
+            reached[:, :-1, :] |= frontier[:, 1:, :]
+            reached[:, 1:, :] |= frontier[:, :-1, :]
+            reached &= (dist < 0) & enter
+            d += 1
+            dist[reached] = d
+            frontier = reached & ~blocked
+            remaining &= ~reached
+        return dist.reshape(n, -1)
+
+    def _move_monsters(self, games):
+        G = self.size
+        alive = self.monster_alive[games]
+        target = self.monster_target[games]
+        x2, y2 = self.monster_x2[games], self.monster_y2[games]
+        aligned = alive & (target >= 0) & (x2 % 2 == 0) & (y2 % 2 == 0)
+        heading = self.monster_heading[games]
+
+        for p in range(2):
+            chasing = aligned & (target == p)
+            rows = np.flatnonzero(chasing.any(axis=1))
+            if len(rows) == 0:
+                continue
+            g = games[rows]
+            r, m = np.nonzero(chasing[rows])
+            cx, cy = x2[rows[r], m] // 2, y2[rows[r], m] // 2
+            cell = cy * G + cx
+            goals = np.zeros((len(rows), self.cells), dtype=bool)
+            goals[r, cell] = True
+            dist = self._flow_distances(g, p, goals)
+
+            # Step to the first neighbour one closer, in FlowField order
+            d = dist[r, cell]
+            step = np.zeros((len(r), 2), dtype=np.int64)
+            found = np.zeros(len(r), dtype=bool)
+            for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+                nx, ny = cx + dx, cy + dy
+                inside = (nx >= 0) & (nx < G) & (ny >= 0) & (ny < G)
+                nd = np.where(inside, dist[r, np.clip(ny, 0, G - 1) * G + np.clip(nx, 0, G - 1)], -2)
+                take = ~found & (d > 0) & (nd == d - 1)
+                step[take] = (dx, dy)
+                found |= take
+
+            # No path known: head straight for the tail
+            tail = self._tail_cells(g, p)[r]
+            tdx, tdy = tail % G - cx, tail // G - cy
+            use_x = np.abs(tdx) > np.abs(tdy)
+            greedy = np.zeros((len(r), 2), dtype=np.int64)
+            greedy[:, 0] = np.where(use_x, np.sign(tdx), 0)
+            greedy[:, 1] = np.where(use_x, 0, np.sign(tdy))
+            step[~found] = greedy[~found]
+            heading[rows[r], m] = step
+
+        moving = alive & (target >= 0)
+        heading[~moving] = 0
+        self.monster_heading[games] = heading
+        x2 = x2 + heading[..., 0]
+        y2 = y2 + heading[..., 1]
+        self.monster_x2[games] = x2
+        self.monster_y2[games] = y2
+
+        # Check if monster caught a snake
+        cells = np.clip(y2 // 2, 0, G - 1) * G + np.clip(x2 // 2, 0, G - 1)
+        rows = np.arange(len(games))[:, None]
+        caught = alive & ((self.occupancy[games, 0][rows, cells] > 0) |
+                          (self.occupancy[games, 1][rows, cells] > 0))
+        self.game_over[games[caught.any(axis=1)]] = True
+
+    def step(self, actions=None):
+        """Advance every game one tick.
+
+        actions is a (batch_size, 2) int array of UP, DOWN, LEFT, RIGHT or
+        NO_ACTION per snake. Returns the mask of games that ended this tick;
+        with auto_reset they have already been restarted.
+        """
+        self.tick += 1
+        if actions is not None:
+            self._apply_actions(actions)
+
+        active = ~self.game_over
+        counting = active & (self.countdown_timer > 0)
+        self.countdown_timer[counting] -= 1
+        active &= ~counting
+        games = np.flatnonzero(active)
+        if len(games) == 0:
+            return np.zeros(self.batch_size, dtype=bool)
+
+        # Retry spawns that failed on a full board
+        self._spawn_food(games[self.food[games] < 0])
+
+        self._update_turrets(games)
+
+        # Snakes on a speed boost move twice per tick
+        movers = np.zeros((self.batch_size, 2), dtype=bool)
+        movers[games] = True
+        boosted = movers & (self.speed_boost > 0)
+        self._substep(movers, update_timers=True)
+        # Games that ended in the first sub-step stop there
+        boosted &= ~self.game_over[:, None]
+        if boosted.any():
+            self._substep(boosted, update_timers=False)
+
+        self._move_monsters(games)
+
+        done = active & self.game_over
+        if self.auto_reset:
+            self.reset(np.flatnonzero(done))
+        return done
+
+    # Read-only views for callers
+
+    def body(self, game, p):
+        """Snake p's segments in one game as (x, y) tuples, head first."""
+        i = (self.head[game, p] + np.arange(self.length[game, p])) % self.capacity
+        return list(zip(self.body_x[game, p, i].tolist(), self.body_y[game, p, i].tolist()))
@@ -0,0 +1,299 @@
+"""Synthetic benchmarks for the simulation and rendering hot paths.
+
+Every scenario builds a GameState that stresses one part of the game:
+very long snakes, hundreds of bullets, a board full of poop, many
+monsters, effect spam and a nearly full board for spawn_food. 'party'
+runs a match with the most players allowed. 'crowd' and 'big_arena' put
+the same mix of entities around the snakes on the standard board and on
+a 1000x1000 one, whose ticks should cost about the same. The snakes play
+in god mode so nothing ends the run early. Ticks are timed one by one
+with GameState.step(). Frames are timed with draw_game() on an
+off-screen surface under SDL's dummy video driver. Results are
+percentiles in milliseconds. They can be written as JSON and compared
+with a stored baseline.
+
+    python benchmark.py --json results.json --baseline baseline.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from engine import (GameState, Turret, PoopMonster, PoopSpot, STINK_PARTICLE,
+                    GRID_COUNT, MAX_PLAYERS, FART, UP, DOWN, LEFT, RIGHT)
+
+SCENARIOS = {}
+
+
+def scenario(name):
+    """Register a setup function returning (state, per-tick inputs or None)."""
+    def register(setup):
+        SCENARIOS[name] = setup
+        return setup
+    return register
+
+
+def immortal(seed, size=GRID_COUNT, players=2):
+    state = GameState(seed, size=size, players=players)
+    state.countdown_timer = 0
+    for snake in state.snakes:
+        snake.god_mode = True
+    return state
+
+
+def serpentine(rows, length):
+    """A body winding back and forth over the given rows, head first."""
+    cells = []
+    for i, y in enumerate(rows):
+        xs = range(GRID_COUNT) if i % 2 else range(GRID_COUNT - 1, -1, -1)
+        cells.extend((x, y) for x in xs)
+    return cells[:length]
+
+
+def add_poop(state, cells):
+    for x, y in cells:
+        state.poop.add(PoopSpot(x, y), state.snake1)
+        state.board.add(x, y)
+
+
+@scenario('long_snakes')
+def long_snakes(seed):
+    state = immortal(seed)
+    state.snake1.body = serpentine(range(0, 30), 1100)
+    state.snake2.body = serpentine(range(30, 40), 380)
+    return state, None
+
+
+@scenario('bullets')
+def bullets(seed):
+    state = immortal(seed)
+    for i in range(1, GRID_COUNT - 1, 2):
+        for x, y in ((i, 0), (i, GRID_COUNT - 1), (0, i), (GRID_COUNT - 1, i)):
+            turret = Turret(x, y)
+            state.add_turret(turret)
+            # Stagger the volleys so the load is steady
+            turret.shoot_timer = len(state.turrets) % 30
+    return state, None
+
+
+@scenario('poop_board')
+def poop_board(seed):
+    state = immortal(seed)
+    rng = random.Random(seed)
+    cells = [(x, y) for x in range(1, GRID_COUNT - 1) for y in range(1, GRID_COUNT - 1)
+             if y != GRID_COUNT // 2]
+    add_poop(state, rng.sample(cells, 700))
+    return state, None
+
+
+@scenario('monsters')
+def monsters(seed):
+    state = immortal(seed)
+    rng = random.Random(seed)
+    for i in range(60):
+        target = state.snakes[i % 2]
+        state.poop_monsters.append(PoopMonster(rng.randint(1, GRID_COUNT - 2),
+                                               rng.randint(1, GRID_COUNT - 2), target))
+    return state, None
+
+
+@scenario('effects')
+def effects(seed):
+    state = immortal(seed)
+    state.snake1.body = serpentine([5], 8)
+    state.snake2.body = serpentine([30], 8)
+    rng = random.Random(seed)
+
+    def inputs(state):
+        for _ in range(40):
+            state.particles.spawn(STINK_PARTICLE, rng.randrange(GRID_COUNT),
+                                  rng.randrange(GRID_COUNT), lifetime=20)
+        return [(0, FART), (1, FART)]
+    return state, inputs
+
+
+@scenario('full_board')
+def full_board(seed):
+    state = immortal(seed)
+    cells = [(x, y) for x in range(1, GRID_COUNT - 1) for y in range(1, GRID_COUNT - 1)
+             if state.board.count(x, y) == 0]
+    add_poop(state, cells[:-12])
+
+    def inputs(state):
+        # Eat and respawn the apple every tick
+        for _ in range(20):
+            state.food = state.spawn_food()
+        return []
+    return state, inputs
+
+
+def circling(state):
+    """Inputs that keep every snake going round an 8-cell square, so the
+    crowd around them stays near on any arena size."""
+    turns = [DOWN, LEFT, UP, RIGHT]
+
+    def inputs(state):
+        if state.tick % 8 == 4:
+            turn = turns[state.tick // 8 % 4]
+            return [(player, turn) for player in range(len(state.snakes))]
+        return []
+    return inputs
+
+
+def add_crowd(state, rng):
+    """Turrets, monsters and poop scattered around every snake."""
+    for snake in state.snakes:
+        hx, hy = snake.body[0]
+        cells = [(x, y) for x in range(hx - 8, hx + 9) for y in range(hy - 12, hy + 13)
+                 if 0 < x < state.size - 1 and 0 < y < state.size - 1 and
+                 y != hy and state.board.count(x, y) == 0]
+        picks = rng.sample(cells, 60)
+        for x, y in picks[:5]:
+            state.add_turret(Turret(x, y))
+        for x, y in picks[5:15]:
+            state.poop_monsters.append(PoopMonster(x, y, snake))
+        add_poop(state, picks[15:])
+
+
+@scenario('crowd')
+def crowd(seed):
+    state = immortal(seed)
+    add_crowd(state, random.Random(seed))
+    return state, circling(state)
+
+
+@scenario('big_arena')
+def big_arena(seed):
+    state = immortal(seed, size=1000)
+    add_crowd(state, random.Random(seed))
+    return state, circling(state)
+
+
+@scenario('party')
+def party(seed):
+    state = immortal(seed, size=120, players=MAX_PLAYERS)
+    rng = random.Random(seed)
+    for i in range(40):
+        snake = state.snakes[i % len(state.snakes)]
+        state.poop_monsters.append(PoopMonster(rng.randint(1, state.size - 2),
+                                               rng.randint(1, state.size - 2), snake))
+    return state, circling(state)
+
+
+def percentiles(samples):
+    """Summary of durations in seconds, as milliseconds."""
+    samples = sorted(samples)
+    n = len(samples)
+
+    def at(q):
+        return samples[min(n - 1, int(q * n))] * 1000
+
+    return {
+        'n': n,
+        'mean': sum(samples) / n * 1000,
+        'p50': at(0.5),
+        'p90': at(0.9),
+        'p99': at(0.99),
+        'max': samples[-1] * 1000,
+    }
+
+
+def time_ticks(state, inputs, ticks, warmup):
+    samples = []
+    clock = time.perf_counter
+    for i in range(warmup + ticks):
+        given = inputs(state) if inputs else ()
+        start = clock()
+        state.step(given)
+        if i >= warmup:
+            samples.append(clock() - start)
+    return samples
+
+
+def time_frames(state, inputs, frames):
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import pygame
+    from game import WINDOW_SIZE, draw_game
+
+    pygame.init()
+    screen = pygame.Surface((WINDOW_SIZE, WINDOW_SIZE))
+    samples = []
+    clock = time.perf_counter
+    for i in range(frames):
+        state.step(inputs(state) if inputs else ())
+        start = clock()
+        draw_game(screen, state, alpha=0.5)
+        samples.append(clock() - start)
+    return samples
+
+
+def run(names=None, ticks=500, frames=100, warmup=60, seed=0, render=True):
+    """Time every named scenario; returns {name: {'tick': ..., 'frame': ...}}."""
+    results = {}
+    for name in names or SCENARIOS:
+        state, inputs = SCENARIOS[name](seed)
+        result = {'tick': percentiles(time_ticks(state, inputs, ticks, warmup))}
+        if render:
+            state, inputs = SCENARIOS[name](seed)
+            result['frame'] = percentiles(time_frames(state, inputs, frames))
+        results[name] = result
+    return results
+
+
+def compare(results, baseline, threshold=0.2):
+    """Regressions against baseline: p50 slower by more than threshold."""
+    regressions = []
+    for name, result in results.items():
+        for kind, stats in result.items():
+            old = baseline.get(name, {}).get(kind)
+            if old and stats['p50'] > old['p50'] * (1 + threshold):
+                regressions.append(f'{name} {kind}: p50 {stats["p50"]:.3f} ms '
+                                   f'vs {old["p50"]:.3f} ms baseline')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark simulation and rendering')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='run only this scenario (repeatable)')
+    parser.add_argument('--ticks', type=int, default=500, help='timed ticks per scenario')
+    parser.add_argument('--frames', type=int, default=100, help='timed frames per scenario')
+    parser.add_argument('--no-render', action='store_true', help='skip frame timings')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='PATH', help='write the results as JSON')
+    parser.add_argument('--baseline', metavar='PATH',
+                        help='fail when slower than these stored results')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed p50 slowdown against the baseline (default: 0.2)')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='write the results to --baseline instead of comparing')
+    args = parser.parse_args(argv)
+    if args.save_baseline and not args.baseline:
+        parser.error('--save-baseline needs --baseline')
+
+    results = run(args.scenario, args.ticks, args.frames, seed=args.seed,
+                  render=not args.no_render)
+    for name, result in results.items():
+        for kind, stats in result.items():
+            print(f'{name:12} {kind:5}  mean {stats["mean"]:7.3f}  p50 {stats["p50"]:7.3f}  '
+                  f'p90 {stats["p90"]:7.3f}  p99 {stats["p99"]:7.3f}  max {stats["max"]:7.3f} ms')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        if args.save_baseline:
+            with open(args.baseline, 'w') as f:
+                json.dump(results, f, indent=2)
+            return 0
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print('REGRESSION', line)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
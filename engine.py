@@ -0,0 +1,1485 @@
+import random
+import math
+from array import array
+from collections import deque
+
+import numpy as np
+
+from profiler import Profiler
+
+# Constants
+WINDOW_SIZE = 800
+GRID_SIZE = 20
+GRID_COUNT = WINDOW_SIZE // GRID_SIZE
+
+# Colors
+BLACK = (0, 0, 0)
+GREEN = (0, 255, 0)
+RED = (255, 0, 0)
+DARK_RED = (139, 0, 0)
+BLUE = (0, 0, 255)
+WHITE = (255, 255, 255)
+BROWN = (139, 69, 19)
+PURPLE = (128, 0, 128)
+YELLOW = (255, 255, 0)
+
+# Snake colors by player index; party modes go up to MAX_PLAYERS
+PLAYER_COLORS = [
+    GREEN, BLUE, (255, 128, 0), (0, 255, 255), (255, 0, 255), (128, 255, 0),
+    (0, 128, 255), (255, 128, 128), (128, 128, 255), (255, 200, 0), (0, 200, 128),
+    (200, 0, 255), (150, 150, 150), (255, 100, 200), (100, 255, 200), (200, 200, 100),
+]
+MAX_PLAYERS = len(PLAYER_COLORS)
+
+SHIELD = 1
+SPEED = 2
+POOP_EATER = 3
+TURRET = 4
+
+# Player actions passed to GameState.step() as (player, action) pairs
+UP = 0
+DOWN = 1
+LEFT = 2
+RIGHT = 3
+FART = 4
+GOD_MODE = 5
+RESTART = 6
+
+# Cells a snake moves per tick while its speed boost is active
+BOOST_MOVES = 2
+
+# Boards up to this many cells keep every empty cell in a list and a
+# precomputed neighbour table; larger arenas build those only on demand
+DENSE_CELLS = 256 * 256
+
+# Most cells one path search visits, so a huge arena costs no more per
+# tick than the standard one, whose playable cells all fit
+FLOW_LIMIT = GRID_COUNT * GRID_COUNT
+
+# Balance knobs, read at run time so a tournament can override them
+SHIELD_TIME = 100
+SPEED_TIME = 100
+POOP_EATER_TIME = 100
+SHOOT_INTERVAL = 30
+LEVEL_APPLES = 4
+
+# Snakes one turret volley aims at; a duel's turrets shoot at both
+TURRET_TARGETS = 2
+
+DIRECTIONS = {
+    UP: [0, -1],
+    DOWN: [0, 1],
+    LEFT: [-1, 0],
+    RIGHT: [1, 0],
+}
+
+# What can kill a snake, None standing for alive
+DEATHS = (None, 'wall', 'self', 'snake', 'bullet', 'poop', 'monster')
+
+# Undo records GameState.restore() replays, newest first: (object, op, ...)
+_ADD = 0
+_REMOVE = 1
+_CLEAR = 2
+_BUILD = 3
+
+# Zobrist keys: fixed random 64-bit words per column and row, the same in
+# every process so peers can compare hashes
+_MASK = (1 << 64) - 1
+_KEY_RNG = random.Random(0x5EED)
+_KEYS_X = []
+_KEYS_Y = []
+
+def cell_key(x, y):
+    """Pseudo-random 64-bit key of a cell for Zobrist hashing."""
+    try:
+        h = (_KEYS_X[x] ^ _KEYS_Y[y]) * 0x9E3779B97F4A7C15 & _MASK
+    except IndexError:
+        while len(_KEYS_X) <= max(x, y):
+            _KEYS_X.append(_KEY_RNG.getrandbits(64))
+            _KEYS_Y.append(_KEY_RNG.getrandbits(64))
+        return cell_key(x, y)
+    return h ^ (h >> 29)
+
+def mix(h, *values):
+    """Fold integers into the 64-bit hash h."""
+    for value in values:
+        h = (h ^ (value & _MASK)) * 0x9E3779B97F4A7C15 & _MASK
+        h ^= h >> 32
+    return h
+
+class OccupancyGrid:
+    """Per-cell object counts for the board, so "is anything here" is O(1).
+
+    Counts rather than flags: in god mode a snake can run over itself and
+    the cell has to stay occupied until every segment on it has left.
+    Cells outside the board always read as empty. cells may be any writable
+    byte buffer of size * size, such as a memoryview of a NumPy plane.
+    While a GameState keeps checkpoints, trail is its undo list and every
+    change appends the record that undo() reverts it with.
+    """
+
+    __slots__ = ('size', 'cells', 'trail')
+
+    def __init__(self, size=GRID_COUNT, cells=None):
+        self.size = size
+        self.cells = cells if cells is not None else bytearray(size * size)
+        self.trail = None
+
+    def add(self, x, y):
+        i = y * self.size + x
+        self.cells[i] += 1
+        if self.trail is not None:
+            self.trail.append((self, _ADD, i))
+
+    def remove(self, x, y):
+        i = y * self.size + x
+        self.cells[i] -= 1
+        if self.trail is not None:
+            self.trail.append((self, _REMOVE, i))
+
+    def count(self, x, y):
+        if 0 <= x < self.size and 0 <= y < self.size:
+            return self.cells[y * self.size + x]
+        return 0
+
+    def clear(self):
+        if self.trail is not None:
+            self.trail.append((self, _CLEAR, bytes(self.cells)))
+        self.cells[:] = bytes(len(self.cells))
+
+    def undo(self, record):
+        op = record[1]
+        if op == _ADD:
+            self.cells[record[2]] -= 1
+        elif op == _REMOVE:
+            self.cells[record[2]] += 1
+        else:
+            self.cells[:] = record[2]
+
+    def __contains__(self, pos):
+        return self.count(pos[0], pos[1]) > 0
+
+class FreeCells(OccupancyGrid):
+    """Occupancy grid that also keeps a dense list of the empty playable cells.
+
+    Every empty cell inside the walls sits in free, and slots maps a cell back
+    to its position there (-1 when occupied or in the wall), so cells move in
+    and out with a swap-remove and a uniform random pick is O(1) no matter
+    how crowded the board is.
+
+    Boards larger than DENSE_CELLS start without the list (free is None) and
+    only count their occupied playable cells. While at least half of them are
+    empty, random_free() draws random cells until it finds an empty one, which
+    takes fewer than two tries on average. The list is built once the board
+    gets more crowded than that.
+    """
+
+    __slots__ = ('margin', 'free', 'slots', 'playable', 'occupied')
+
+    def __init__(self, size=GRID_COUNT, margin=1):
+        super().__init__(size)
+        self.margin = margin
+        self.playable = max(size - 2 * margin, 0) ** 2
+        self.clear()
+
+    def _playable(self, x, y):
+        return (self.margin <= x < self.size - self.margin and
+                self.margin <= y < self.size - self.margin)
+
+    def add(self, x, y):
+        i = y * self.size + x
+        self.cells[i] += 1
+        slot = -1
+        if self.free is None:
+            if self.cells[i] == 1 and self._playable(x, y):
+                self.occupied += 1
+        else:
+            slot = self.slots[i]
+            if slot >= 0:
+                last = self.free.pop()
+                if last != i:
+                    self.free[slot] = last
+                    self.slots[last] = slot
+                self.slots[i] = -1
+        if self.trail is not None:
+            # The slot the cell left, to swap it back exactly
+            self.trail.append((self, _ADD, i, slot))
+
+    def remove(self, x, y):
+        i = y * self.size + x
+        self.cells[i] -= 1
+        if self.trail is not None:
+            self.trail.append((self, _REMOVE, i))
+        if self.cells[i] == 0 and self._playable(x, y):
+            if self.free is None:
+                self.occupied -= 1
+                return
+            self.slots[i] = len(self.free)
+            self.free.append(i)
+
+    def clear(self):
+        if self.trail is not None:
+            self.trail.append((self, _CLEAR, bytes(self.cells), self.free, self.slots,
+                               self.occupied))
+        self.cells[:] = bytes(len(self.cells))
+        self.occupied = 0
+        if self.size * self.size > DENSE_CELLS:
+            self.free = None
+            self.slots = None
+            return
+        self._build_free()
+
+    def _build_free(self):
+        size, margin, cells = self.size, self.margin, self.cells
+        self.free = [i
+                     for y in range(margin, size - margin)
+                     for i in range(y * size + margin, y * size + size - margin)
+                     if not cells[i]]
+        self.slots = array('i', [-1]) * (size * size)
+        for slot, i in enumerate(self.free):
+            self.slots[i] = slot
+
+    def undo(self, record):
+        # Puts free back in the very order it had, so the same generator
+        # state picks the same cells again after a restore
+        op = record[1]
+        if op == _BUILD:
+            self.free = self.slots = None
+            return
+        if op == _CLEAR:
+            self.cells[:], self.free, self.slots, self.occupied = record[2:]
+            return
+        i = record[2]
+        playable = self._playable(i % self.size, i // self.size)
+        if op == _ADD:
+            if self.free is None:
+                if self.cells[i] == 1 and playable:
+                    self.occupied -= 1
+            elif record[3] >= 0:
+                slot, free = record[3], self.free
+                if slot < len(free):
+                    last = free[slot]
+                    self.slots[last] = len(free)
+                    free.append(last)
+                    free[slot] = i
+                else:
+                    free.append(i)
+                self.slots[i] = slot
+            self.cells[i] -= 1
+        else:
+            if self.cells[i] == 0 and playable:
+                if self.free is None:
+                    self.occupied += 1
+                else:
+                    self.free.pop()
+                    self.slots[i] = -1
+            self.cells[i] += 1
+
+    def random_free(self, rng=random):
+        """Uniformly random empty cell as (x, y), or None if the board is full."""
+        if self.free is None:
+            if 2 * self.occupied <= self.playable:
+                low, high = self.margin, self.size - self.margin - 1
+                while True:
+                    x, y = rng.randint(low, high), rng.randint(low, high)
+                    if not self.cells[y * self.size + x]:
+                        return (x, y)
+            if self.trail is not None:
+                self.trail.append((self, _BUILD))
+            self._build_free()
+        if not self.free:
+            return None
+        i = self.free[rng.randrange(len(self.free))]
+        return (i % self.size, i // self.size)
+
+class BulletPool:
+    """Every turret bullet on the board, as parallel NumPy arrays.
+
+    The first count slots are live. All bullets move in one vectorized
+    update, and bullets that leave the board are culled by compacting the
+    survivors to the front, so nothing is removed from the middle of a
+    list. source records which turret fired each bullet, and ids numbers
+    the bullets in the order they were fired, which compaction keeps.
+    steps counts the updates, which skip the ticks the game stands still.
+    """
+
+    def __init__(self, size=GRID_COUNT, capacity=64):
+        self.size = size
+        self.count = 0
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.dx = np.zeros(capacity)
+        self.dy = np.zeros(capacity)
+        self.source = np.zeros(capacity, dtype=np.int32)
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.next_id = 0
+        self.steps = 0
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def spawn(self, x, y, dx, dy, source):
+        if self.count == len(self.x):
+            self._grow()
+        i = self.count
+        self.x[i] = x
+        self.y[i] = y
+        self.dx[i] = dx
+        self.dy[i] = dy
+        self.source[i] = source
+        self.ids[i] = self.next_id
+        self.next_id += 1
+        self.count += 1
+
+    def _grow(self):
+        capacity = 2 * len(self.x)
+        for name in ('x', 'y', 'dx', 'dy', 'source', 'ids'):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def update(self):
+        self.steps += 1
+        n = self.count
+        if n == 0:
+            return
+        x = self.x[:n]
+        y = self.y[:n]
+        x += self.dx[:n]
+        y += self.dy[:n]
+        inside = (x >= 0) & (x < self.size) & (y >= 0) & (y < self.size)
+        keep = np.flatnonzero(inside)
+        if len(keep) < n:
+            for a in (self.x, self.y, self.dx, self.dy, self.source, self.ids):
+                a[:len(keep)] = a[keep]
+            self.count = len(keep)
+
+    def cells(self):
+        """Board cell index (y * size + x) of every live bullet."""
+        n = self.count
+        return self.y[:n].astype(np.intp) * self.size + self.x[:n].astype(np.intp)
+
+    def hit_heads(self, heads, ignore):
+        """Which heads have a bullet on their cell, in one pass over the pool.
+
+        heads is a list of (x, y) cells and ignore the turret source each
+        head is immune to (its own turret), or -1.
+        """
+        hits = [False] * len(heads)
+        if self.count == 0:
+            return hits
+        head_cells = [y * self.size + x for x, y in heads]
+        cells = self.cells()
+        for i in np.flatnonzero(np.isin(cells, head_cells)).tolist():
+            for k, head_cell in enumerate(head_cells):
+                if cells[i] == head_cell and self.source[i] != ignore[k]:
+                    hits[k] = True
+        return hits
+
+    def from_source(self, source):
+        """Bullets fired by one turret, as [x, y, dx, dy] lists."""
+        n = self.count
+        return [[self.x[i], self.y[i], self.dx[i], self.dy[i]]
+                for i in np.flatnonzero(self.source[:n] == source).tolist()]
+
+class Turret:
+    def __init__(self, x, y, pool=None, source=0):
+        self.x = x
+        self.y = y
+        # GameState.add_turret() points this at the shared pool
+        self.pool = pool if pool is not None else BulletPool()
+        self.source = source
+        self.shoot_timer = 0
+
+    @property
+    def bullets(self):
+        return self.pool.from_source(self.source)
+
+    def shoot(self, *snakes):
+        if self.shoot_timer <= 0:
+            # One bullet at each of the nearest snakes, in the order given,
+            # so a party volley is no bigger than a duel's
+            targets = [snake.body[0] for snake in snakes]
+            if len(targets) > TURRET_TARGETS:
+                nearest = sorted(range(len(targets)),
+                                 key=lambda i: (targets[i][0] - self.x) ** 2
+                                 + (targets[i][1] - self.y) ** 2)
+                targets = [targets[i] for i in sorted(nearest[:TURRET_TARGETS])]
+            for target in targets:
+                dx = target[0] - self.x
+                dy = target[1] - self.y
+                length = math.sqrt(dx * dx + dy * dy)
+                if length > 0:
+                    dx = dx / length
+                    dy = dy / length
+                    self.pool.spawn(self.x, self.y, dx, dy, self.source)
+            self.shoot_timer = SHOOT_INTERVAL
+
+    def update(self):
+        self.shoot_timer -= 1
+
+# Particle kinds
+FART_PARTICLE = 0
+STINK_PARTICLE = 1
+
+class ParticleSystem:
+    """Preallocated pool for the short-lived fart, stink and power-up effects.
+
+    Particles are fixed-size records in parallel NumPy arrays. Dead slots go
+    back on a free list and are reused, so a burst of effects allocates
+    nothing; when all capacity slots are alive the oldest particle is
+    evicted. update() ages every particle once per game tick, however often
+    the screen is redrawn.
+    """
+
+    def __init__(self, capacity=512):
+        self.capacity = capacity
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.radius = np.zeros(capacity)
+        self.lifetime = np.zeros(capacity, dtype=np.int32)
+        self.kind = np.zeros(capacity, dtype=np.int8)
+        self.born = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.free = list(range(capacity - 1, -1, -1))
+        self.serial = 0
+
+    def __len__(self):
+        return self.capacity - len(self.free)
+
+    def clear(self):
+        self.alive[:] = False
+        self.free = list(range(self.capacity - 1, -1, -1))
+
+    def spawn(self, kind, x, y, radius=1, lifetime=20):
+        if self.free:
+            slot = self.free.pop()
+        else:
+            # Full: every slot is alive, so evict the oldest one
+            slot = int(np.argmin(self.born))
+        self.x[slot] = x
+        self.y[slot] = y
+        self.radius[slot] = radius
+        self.lifetime[slot] = lifetime
+        self.kind[slot] = kind
+        self.born[slot] = self.serial
+        self.alive[slot] = True
+        self.serial += 1
+
+    def update(self):
+        if len(self.free) == self.capacity:
+            return
+        alive = self.alive
+        np.subtract(self.lifetime, 1, out=self.lifetime, where=alive)
+        np.add(self.radius, 0.5, out=self.radius, where=alive)
+        expired = np.flatnonzero(alive & (self.lifetime <= 0))
+        if len(expired):
+            alive[expired] = False
+            self.free.extend(expired.tolist())
+
+    def live(self):
+        """Slots of the particles currently alive."""
+        return np.flatnonzero(self.alive)
+
+class FlowField:
+    """BFS distances to one target cell, shared by every monster chasing it.
+
+    compute() runs a single breadth-first search from the target over the
+    cells free of obstacles and stops as soon as every goal (the monsters'
+    cells) has been reached; next_step() then reads a monster's move off
+    the distance map in O(1). A generation stamp marks which entries belong
+    to the latest search, so the arrays are never cleared. Boards larger
+    than DENSE_CELLS fill in their neighbour table as the searches reach
+    new cells instead of up front.
+    """
+
+    def __init__(self, size=GRID_COUNT):
+        self.size = size
+        self.dist = array('i', [0]) * (size * size)
+        self.seen = array('i', [0]) * (size * size)
+        self.generation = 0
+        self.neighbors = _Neighbors(size)
+        if size * size <= DENSE_CELLS:
+            self.neighbors = [self.neighbors[i] for i in range(size * size)]
+
+    def compute(self, target, cells, passable=None, goals=(), limit=None):
+        """Distances from target, walking only where cells reads empty.
+
+        cells is a per-cell count (an OccupancyGrid's bytearray); passable
+        maps cell indices to counts that do not block, such as the apple.
+        Goal cells are always entered even when occupied. The search gives
+        up after reaching limit cells; goals beyond that get no step, and
+        the return value says whether that happened.
+        """
+        size = self.size
+        passable = passable or {}
+        budget = limit if limit is not None else size * size
+        self.generation += 1
+        gen = self.generation
+        seen, dist, neighbors = self.seen, self.dist, self.neighbors
+        source = target[1] * size + target[0]
+        remaining = {y * size + x for x, y in goals}
+        remaining.discard(source)
+        seen[source] = gen
+        dist[source] = 0
+        queue = deque([source])
+        while queue and remaining and budget > 0:
+            i = queue.popleft()
+            d = dist[i] + 1
+            for j in neighbors[i]:
+                if seen[j] == gen:
+                    continue
+                count = cells[j]
+                free = not count or count <= passable.get(j, 0)
+                if not free and j not in remaining:
+                    continue
+                seen[j] = gen
+                dist[j] = d
+                budget -= 1
+                remaining.discard(j)
+                if free:
+                    queue.append(j)
+        return bool(remaining and queue and budget <= 0)
+
+    def next_step(self, cell):
+        """The neighbouring cell one step closer to the target, or None."""
+        i = cell[1] * self.size + cell[0]
+        gen = self.generation
+        if self.seen[i] != gen or self.dist[i] == 0:
+            return None
+        d = self.dist[i] - 1
+        for j in self.neighbors[i]:
+            if self.seen[j] == gen and self.dist[j] == d:
+                return (j % self.size, j // self.size)
+        return None
+
+class _Neighbors(dict):
+    """Cell index -> indices of its in-board neighbours, computed on first use."""
+
+    def __init__(self, size):
+        super().__init__()
+        self.size = size
+
+    def __missing__(self, i):
+        size = self.size
+        x, y = i % size, i // size
+        adjacent = self[i] = tuple(
+            ny * size + nx
+            for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1))
+            if 0 <= nx < size and 0 <= ny < size)
+        return adjacent
+
+class PoopMonster:
+    def __init__(self, x, y, target_snake):
+        self.x = x
+        self.y = y
+        self.target_snake = target_snake
+        self.speed = 0.5
+        self.heading = (0, 0)
+
+    def aligned(self):
+        """Whether the monster sits exactly on a cell and can pick a new step."""
+        return self.x == int(self.x) and self.y == int(self.y)
+
+    def move(self, field=None):
+        if self.target_snake:
+            if self.aligned():
+                cell = (int(self.x), int(self.y))
+                step = field.next_step(cell) if field else None
+                if step is None:
+                    # No path known: head straight for the tail
+                    tail = self.target_snake.body[-1]
+                    dx = tail[0] - cell[0]
+                    dy = tail[1] - cell[1]
+                    if abs(dx) > abs(dy):
+                        step = (cell[0] + (1 if dx > 0 else -1), cell[1])
+                    elif dy:
+                        step = (cell[0], cell[1] + (1 if dy > 0 else -1))
+                    else:
+                        step = cell
+                self.heading = (step[0] - cell[0], step[1] - cell[1])
+            self.x += self.heading[0] * self.speed
+            self.y += self.heading[1] * self.speed
+        else:
+            self.heading = (0, 0)
+
+class PoopSpot:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+class PoopIndex:
+    """Every poop spot on the board, keyed by cell, with the snake that left it.
+
+    A cell normally holds one spot, but both snakes can poop on the same
+    cell, so each entry is a list of (spot, owner) pairs. Cells only ever
+    get added until clear(), which bumps generation. hash is the Zobrist
+    hash of the spots and their owners' player numbers.
+    """
+
+    def __init__(self):
+        self.cells = {}
+        self.count = 0
+        self.generation = 0
+        self.hash = 0
+        self.trail = None
+
+    def __len__(self):
+        return self.count
+
+    @staticmethod
+    def _key(poop, owner):
+        return mix(cell_key(poop.x, poop.y), owner.player if owner is not None else -1)
+
+    def add(self, poop, owner):
+        pos = (poop.x, poop.y)
+        self.cells.setdefault(pos, []).append((poop, owner))
+        self.count += 1
+        self.hash ^= self._key(poop, owner)
+        if self.trail is not None:
+            self.trail.append((self, _ADD, pos))
+
+    def owners(self, pos):
+        """Snakes whose poop lies on pos."""
+        return [owner for _, owner in self.cells.get(pos, ())]
+
+    def is_deadly(self, pos):
+        """Whether pos holds poop whose owner cannot eat it right now."""
+        for _, owner in self.cells.get(pos, ()):
+            if not owner.poop_eater:
+                return True
+        return False
+
+    def clear(self):
+        if self.trail is not None:
+            self.trail.append((self, _CLEAR, self.cells, self.count, self.generation,
+                               self.hash))
+        self.cells = {}
+        self.count = 0
+        self.generation += 1
+        self.hash = 0
+
+    def undo(self, record):
+        if record[1] == _CLEAR:
+            self.cells, self.count, self.generation, self.hash = record[2:]
+            return
+        spots = self.cells[record[2]]
+        poop, owner = spots.pop()
+        if not spots:
+            del self.cells[record[2]]
+        self.count -= 1
+        self.hash ^= self._key(poop, owner)
+
+class PowerUp:
+    def __init__(self, x, y, type):
+        self.x = x
+        self.y = y
+        self.type = type
+
+class SnakeBody:
+    """Snake segments, head first, in a ring buffer of x and y int arrays.
+
+    Pushing a head and popping the tail are O(1) and allocate no tuples;
+    the buffer doubles when a growing snake fills it. views() hands out
+    memoryviews over the arrays, so renderers and NumPy (numpy.frombuffer)
+    can read the segments without copying. hash is the Zobrist hash of the
+    cells, updated on every push and pop.
+    """
+
+    __slots__ = ('xs', 'ys', 'start', 'length', 'mask', 'hash', 'trail')
+
+    def __init__(self, segments=(), capacity=64):
+        segments = list(segments)
+        size = 1
+        while size < max(capacity, len(segments)):
+            size *= 2
+        self.xs = array('i', [0]) * size
+        self.ys = array('i', [0]) * size
+        self.mask = size - 1
+        self.start = 0
+        self.length = len(segments)
+        self.hash = 0
+        self.trail = None
+        for i, (x, y) in enumerate(segments):
+            self.xs[i] = x
+            self.ys[i] = y
+            self.hash ^= cell_key(x, y)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.length
+        if not 0 <= i < self.length:
+            raise IndexError('snake body index out of range')
+        j = (self.start + i) & self.mask
+        return (self.xs[j], self.ys[j])
+
+    def __iter__(self):
+        for xs, ys in self.views():
+            yield from zip(xs, ys)
+
+    def without_head(self):
+        """Iterate over every segment except the head."""
+        mask, xs, ys = self.mask, self.xs, self.ys
+        for i in range(self.start + 1, self.start + self.length):
+            yield (xs[i & mask], ys[i & mask])
+
+    def views(self):
+        """The segments as at most two (xs, ys) memoryview pairs, head first."""
+        end = self.start + self.length
+        size = self.mask + 1
+        xs = memoryview(self.xs)
+        ys = memoryview(self.ys)
+        if end <= size:
+            return [(xs[self.start:end], ys[self.start:end])]
+        return [(xs[self.start:], ys[self.start:]),
+                (xs[:end - size], ys[:end - size])]
+
+    def push_head(self, x, y):
+        if self.length > self.mask:
+            self._grow()
+        self.start = (self.start - 1) & self.mask
+        self.xs[self.start] = x
+        self.ys[self.start] = y
+        self.length += 1
+        self.hash ^= cell_key(x, y)
+        if self.trail is not None:
+            self.trail.append((self, _ADD))
+
+    def pop_tail(self):
+        self.length -= 1
+        j = (self.start + self.length) & self.mask
+        x, y = self.xs[j], self.ys[j]
+        self.hash ^= cell_key(x, y)
+        if self.trail is not None:
+            # A later push may reuse the slot, so keep the cell itself
+            self.trail.append((self, _REMOVE, x, y))
+        return (x, y)
+
+    def undo(self, record):
+        if record[1] == _ADD:
+            x, y = self.xs[self.start], self.ys[self.start]
+            self.start = (self.start + 1) & self.mask
+            self.length -= 1
+        else:
+            x, y = record[2], record[3]
+            j = (self.start + self.length) & self.mask
+            self.xs[j] = x
+            self.ys[j] = y
+            self.length += 1
+        self.hash ^= cell_key(x, y)
+
+    def _grow(self):
+        xs = array('i', [0]) * (2 * (self.mask + 1))
+        ys = array('i', [0]) * (2 * (self.mask + 1))
+        i = 0
+        for part_xs, part_ys in self.views():
+            xs[i:i + len(part_xs)] = array('i', part_xs)
+            ys[i:i + len(part_ys)] = array('i', part_ys)
+            i += len(part_xs)
+        self.xs = xs
+        self.ys = ys
+        self.mask = len(xs) - 1
+        self.start = 0
+
+class Snake:
+    def __init__(self, x, y, color, board=None, cells=None, size=GRID_COUNT, bodies=None,
+                 player=0):
+        # Own segments, plus the shared game board and the grid of every
+        # snake's segments when part of a GameState
+        self.size = size
+        self.player = player
+        self.cells = cells if cells is not None else OccupancyGrid(size)
+        self.cells.clear()
+        self.board = board
+        self.bodies = bodies
+        self.trail = None
+        self._body = SnakeBody()
+        self.body = [(x, y)]
+        self.direction = [1, 0]
+        self.color = color
+        self.grow = False
+        self.score = 0
+        self.poop_spots = []
+        self.apples_eaten = 0
+        self.god_mode = False
+        self.shield = 0
+        self.speed_boost = 0
+        self.poop_eater = 0
+        self.extra_turret = None
+        # What killed the snake: 'wall', 'self', 'snake', 'bullet', 'poop' or 'monster'
+        self.death = None
+
+    @property
+    def body(self):
+        return self._body
+
+    @body.setter
+    def body(self, body):
+        for grid in (self.cells, self.board, self.bodies):
+            if grid is not None:
+                for x, y in self._body:
+                    grid.remove(x, y)
+        self._body = SnakeBody(body)
+        self._body.trail = self.trail
+        for x, y in self._body:
+            self.cells.add(x, y)
+            if self.board is not None:
+                self.board.add(x, y)
+            if self.bodies is not None:
+                self.bodies.add(x, y)
+
+    def move(self):
+        head_x, head_y = self._body[0]
+        x = head_x + self.direction[0]
+        y = head_y + self.direction[1]
+        size = self.size
+        if x < 0:
+            if self.god_mode:
+                x = size - 1
+            else:
+                return True
+        elif x >= size:
+            if self.god_mode:
+                x = 0
+            else:
+                return True
+        if y < 0:
+            if self.god_mode:
+                y = size - 1
+            else:
+                return True
+        elif y >= size:
+            if self.god_mode:
+                y = 0
+            else:
+                return True
+        self._body.push_head(x, y)
+        self.cells.add(x, y)
+        if self.board is not None:
+            self.board.add(x, y)
+        if self.bodies is not None:
+            self.bodies.add(x, y)
+        if not self.grow:
+            tail = self._body.pop_tail()
+            self.cells.remove(tail[0], tail[1])
+            if self.board is not None:
+                self.board.remove(tail[0], tail[1])
+            if self.bodies is not None:
+                self.bodies.remove(tail[0], tail[1])
+        self.grow = False
+        return False
+
+    def drop_poop(self):
+        poop_spot = PoopSpot(self.body[-1][0], self.body[-1][1])
+        self.poop_spots.append(poop_spot)
+        self.apples_eaten = 0
+        return poop_spot
+
+    def fart(self, particles, rng=random):
+        if len(self.body) > 1:
+            fart_pos = self.body[-1]
+            for _ in range(3):  # Create multiple fart effects
+                particles.spawn(FART_PARTICLE, fart_pos[0], fart_pos[1],
+                                radius=rng.randint(1, 3))
+
+    def check_collision(self, others, shot=False, poop=None):
+        """What kills this snake this tick: 'self', 'snake', 'bullet', 'poop' or None.
+
+        others is the OccupancyGrid counting every snake's segments, this
+        one's included, or simply the other Snake of a two-snake game.
+        shot says a bullet is on the head; poop is the game's PoopIndex.
+        """
+        head = self.body[0]
+        own = self.cells.count(head[0], head[1])
+        # Self collision: the head itself accounts for one count
+        if own > 1:
+            if not self.god_mode:
+                return 'self'
+        # Other snake collision, including two heads meeting on one cell
+        if isinstance(others, Snake):
+            hit = head in others.cells
+        else:
+            hit = others.count(head[0], head[1]) > own
+        if hit:
+            if not self.god_mode:
+                return 'snake'
+        # Bullet collision
+        if shot:
+            if not self.god_mode:
+                return 'bullet'
+        # Poop collision
+        if poop is not None and poop.is_deadly(head):
+            if not self.god_mode:
+                return 'poop'
+        return None
+
+class _Checkpoint:
+    """What GameState.save() captured; see there."""
+
+    __slots__ = ('mark', 'live', 'scalars', 'rng', 'snakes', 'turrets', 'monsters',
+                 'bullets', 'particles')
+
+class GameState:
+    """All game rules, without any pygame dependency.
+
+    The pygame frontend in game.py feeds key presses into step() and draws
+    the resulting state; bots, balancing runs and tests drive it directly.
+    All randomness comes from a per-game generator seeded with seed, so a
+    seed plus the inputs given to each tick replays a match exactly.
+    snake_cells optionally gives the OccupancyGrids the snakes keep their
+    segments in, so callers can lay them over memory of their own.
+    profiler times the phases of step(); the default one is disabled.
+    size is the arena's width and height in cells, walls included.
+
+    players snakes take part, 2 up to MAX_PLAYERS. A snake that dies leaves
+    the board and the rest play on; the match is over once fewer than two
+    are alive, so in a duel the first death ends it. Every snake moves
+    before any collision is checked, against bodies, the grid counting all
+    snakes' segments, so the outcome never depends on player order: heads
+    meeting on one cell kill both snakes.
+
+    save() and restore() roll the game back for rollback netplay and bots
+    searching ahead, and state_hash() lets peers check they agree.
+    """
+
+    # Attributes a checkpoint keeps as they are; the containers they point
+    # at are replaced rather than changed, or tracked on their own
+    _SAVED = ('tick', 'current_level', 'apples_eaten_this_level', 'countdown_timer',
+              'game_over', '_food', '_power_up', 'snakes', 'flow_fields')
+
+    def __init__(self, seed=None, snake_cells=(None, None), profiler=None, size=GRID_COUNT,
+                 players=2):
+        if not 2 <= players <= MAX_PLAYERS:
+            raise ValueError(f'players must be between 2 and {MAX_PLAYERS}, not {players}')
+        if seed is None:
+            seed = random.randrange(2 ** 63)
+        self.seed = seed
+        self.size = size
+        self.players = players
+        # Undo records behind the live checkpoints, oldest first; trail_base
+        # counts the ones already dropped off the front
+        self.trail = []
+        self.trail_base = 0
+        self.checkpoints = []
+        self.snake_cells = tuple(snake_cells) + (None,) * (players - len(snake_cells))
+        self.profiler = profiler if profiler is not None else Profiler()
+        self.rng = random.Random(seed)
+        self.tick = 0
+        self.current_level = 1
+        self.apples_eaten_this_level = 0
+        self.poop_monsters = []
+        self.flow_fields = {}
+        self.poop = PoopIndex()
+        self.board = FreeCells(size)
+        self.bodies = OccupancyGrid(size)
+        self._power_up = None
+        self._food = None
+        self.snakes = self._new_snakes()
+        self.turrets = []
+        self.bullets = BulletPool(size)
+        self.particles = ParticleSystem()
+        self.add_turret(Turret(size//2, size//2))  # Single turret in center
+        self.food = self.spawn_food()
+        self.power_up = self.spawn_power_up()
+        self.game_over = False
+        self.countdown_timer = 15  # 2 seconds at 30 FPS
+
+    @property
+    def snake1(self):
+        return self.snakes[0]
+
+    @property
+    def snake2(self):
+        return self.snakes[1]
+
+    def start_positions(self):
+        """Where each snake starts: rows spread down the arena, even players
+        on the left and odd ones on the right, all heading right."""
+        size, rows = self.size, (self.players + 1) // 2
+        return [(5 if i % 2 == 0 else size - 6, (i // 2 + 1) * size // (rows + 1))
+                for i in range(self.players)]
+
+    def _new_snakes(self):
+        snakes = [Snake(x, y, PLAYER_COLORS[i], self.board, self.snake_cells[i], self.size,
+                        self.bodies, i)
+                  for i, (x, y) in enumerate(self.start_positions())]
+        if self.checkpoints:
+            for snake in snakes:
+                self._track(snake, self.trail)
+        return snakes
+
+    @staticmethod
+    def _track(snake, trail):
+        snake.trail = snake.cells.trail = snake.body.trail = trail
+
+    def _track_all(self, trail):
+        self.board.trail = self.bodies.trail = self.poop.trail = trail
+        for snake in self.snakes:
+            self._track(snake, trail)
+
+    def save(self):
+        """Checkpoint the game so restore() can roll it back.
+
+        Snake bodies, the grids and the poop are not copied: while any
+        checkpoint is kept they log how to undo each change, so restoring
+        costs as much as what changed since. The rest is small and copied
+        here: the counters, the generator, each snake's, turret's and
+        monster's attributes and the live bullets and particles.
+        """
+        checkpoint = _Checkpoint()
+        if not self.checkpoints:
+            self._track_all(self.trail)
+        checkpoint.mark = self.trail_base + len(self.trail)
+        checkpoint.live = True
+        checkpoint.scalars = [getattr(self, name) for name in self._SAVED]
+        checkpoint.rng = self.rng.getstate()
+        checkpoint.snakes = [(snake, vars(snake).copy(), len(snake.poop_spots))
+                             for snake in self.snakes]
+        checkpoint.turrets = (self.turrets, [vars(turret).copy() for turret in self.turrets])
+        checkpoint.monsters = (self.poop_monsters,
+                               [vars(monster).copy() for monster in self.poop_monsters])
+        bullets, n = self.bullets, self.bullets.count
+        checkpoint.bullets = (n, bullets.next_id, bullets.steps,
+                              [a[:n].copy() for a in (bullets.x, bullets.y, bullets.dx,
+                                                      bullets.dy, bullets.source, bullets.ids)])
+        particles = self.particles
+        checkpoint.particles = (list(particles.free), particles.serial,
+                                [a.copy() for a in (particles.x, particles.y, particles.radius,
+                                                    particles.lifetime, particles.kind,
+                                                    particles.born, particles.alive)])
+        self.checkpoints.append(checkpoint)
+        return checkpoint
+
+    def restore(self, checkpoint):
+        """Roll the game back to checkpoint, exactly, the generator included.
+
+        The checkpoint stays usable, but ones saved after it are dropped.
+        """
+        if not checkpoint.live:
+            raise ValueError('checkpoint was released or rolled back past')
+        trail = self.trail
+        keep = checkpoint.mark - self.trail_base
+        while len(trail) > keep:
+            record = trail.pop()
+            record[0].undo(record)
+        while self.checkpoints[-1] is not checkpoint:
+            self.checkpoints.pop().live = False
+
+        for name, value in zip(self._SAVED, checkpoint.scalars):
+            setattr(self, name, value)
+        self.rng.setstate(checkpoint.rng)
+        for snake, attributes, poop in checkpoint.snakes:
+            vars(snake).update(attributes)
+            del snake.poop_spots[poop:]
+        self.turrets, saved = checkpoint.turrets
+        del self.turrets[len(saved):]
+        for turret, attributes in zip(self.turrets, saved):
+            vars(turret).update(attributes)
+        self.poop_monsters, saved = checkpoint.monsters
+        del self.poop_monsters[len(saved):]
+        for monster, attributes in zip(self.poop_monsters, saved):
+            vars(monster).update(attributes)
+
+        bullets = self.bullets
+        n, bullets.next_id, bullets.steps, arrays = checkpoint.bullets
+        while len(bullets.x) < n:
+            bullets._grow()
+        for a, saved in zip((bullets.x, bullets.y, bullets.dx, bullets.dy, bullets.source,
+                             bullets.ids), arrays):
+            a[:n] = saved
+        bullets.count = n
+        particles = self.particles
+        free, particles.serial, arrays = checkpoint.particles
+        particles.free = list(free)
+        for a, saved in zip((particles.x, particles.y, particles.radius, particles.lifetime,
+                             particles.kind, particles.born, particles.alive), arrays):
+            a[:] = saved
+
+    def release(self, checkpoint):
+        """Forget checkpoint and every older one; with none left the game
+        stops logging its changes."""
+        if not checkpoint.live:
+            raise ValueError('checkpoint was released or rolled back past')
+        while True:
+            oldest = self.checkpoints.pop(0)
+            oldest.live = False
+            if oldest is checkpoint:
+                break
+        if self.checkpoints:
+            drop = self.checkpoints[0].mark - self.trail_base
+        else:
+            drop = len(self.trail)
+            self._track_all(None)
+        del self.trail[:drop]
+        self.trail_base += drop
+
+    def state_hash(self):
+        """64-bit hash of everything that decides how the game plays on.
+
+        Snake bodies and poop keep Zobrist hashes up to date as they
+        change, so this only folds in the counters, the snakes' state and
+        the turrets, monsters and bullets: cheap enough for peers to compare
+        every tick and for bots to key transposition tables with. Particles
+        are cosmetic and left out, and so is the generator, whose state
+        shows in the next apple or power-up anyway.
+        """
+        food = self.food if self.food is not None else (-1, -1)
+        power_up = self.power_up
+        h = mix(self.poop.hash, self.tick, self.current_level, self.apples_eaten_this_level,
+                self.countdown_timer, self.game_over, *food,
+                *((power_up.x, power_up.y, power_up.type) if power_up else (-1,)))
+        for snake in self.snakes:
+            body = snake.body
+            head = body[0] if len(body) else (-1, -1)
+            h = mix(h, snake.player, body.hash, len(body), *head, *snake.direction,
+                    snake.grow, snake.score, snake.apples_eaten, snake.god_mode, snake.shield,
+                    snake.speed_boost, snake.poop_eater,
+                    snake.extra_turret.source if snake.extra_turret else -1,
+                    DEATHS.index(snake.death))
+        for turret in self.turrets:
+            h = mix(h, turret.x, turret.y, turret.shoot_timer)
+        for monster in self.poop_monsters:
+            target = monster.target_snake
+            h = mix(h, int(monster.x * 2), int(monster.y * 2), *monster.heading,
+                    target.player if target is not None else -1)
+        bullets, n = self.bullets, self.bullets.count
+        h = mix(h, n, bullets.next_id, bullets.steps)
+        if n:
+            words = (bullets.x[:n].view(np.uint64) * np.uint64(0x9E3779B97F4A7C15) ^
+                     bullets.y[:n].view(np.uint64) * np.uint64(0xC2B2AE3D27D4EB4F) ^
+                     bullets.ids[:n].view(np.uint64))
+            h = mix(h, int(np.bitwise_xor.reduce(words)))
+        return h
+
+    def alive(self):
+        return [snake for snake in self.snakes if not snake.death]
+
+    @property
+    def food(self):
+        return self._food
+
+    @food.setter
+    def food(self, pos):
+        # Keep the board in sync so nothing else spawns on the apple
+        if self._food is not None:
+            self.board.remove(self._food[0], self._food[1])
+        self._food = pos
+        if pos is not None:
+            self.board.add(pos[0], pos[1])
+
+    @property
+    def power_up(self):
+        return self._power_up
+
+    @power_up.setter
+    def power_up(self, power_up):
+        if self._power_up is not None:
+            self.board.remove(self._power_up.x, self._power_up.y)
+        self._power_up = power_up
+        if power_up is not None:
+            self.board.add(power_up.x, power_up.y)
+
+    def reset(self):
+        """Start a new round, keeping the scores."""
+        scores = [snake.score for snake in self.snakes]
+        self.countdown_timer = 15
+        self.board.clear()
+        self.bodies.clear()
+        self.poop.clear()
+        # Monsters chase the new snakes once they poop again
+        self.flow_fields = {}
+        for monster in self.poop_monsters:
+            monster.target_snake = None
+        self._food = None
+        self._power_up = None
+        size = self.size
+        self.snakes = self._new_snakes()
+        for snake, score in zip(self.snakes, scores):
+            snake.score = score
+        self.turrets = []
+        self.bullets.clear()
+        self.particles.clear()
+        self.add_turret(Turret(size//2, size//2))
+        self.food = self.spawn_food()
+        self.game_over = False
+        self.power_up = self.spawn_power_up()
+
+    def add_turret(self, turret):
+        turret.pool = self.bullets
+        turret.source = len(self.turrets)
+        self.turrets.append(turret)
+        self.board.add(turret.x, turret.y)
+
+    def spawn_food(self):
+        """Pick an empty cell for the apple, or None when the board is full."""
+        return self.board.random_free(self.rng)
+
+    def spawn_power_up(self):
+        """Place a random power-up on an empty cell, or None when the board is full."""
+        power_up_pos = self.board.random_free(self.rng)
+        if power_up_pos is None:
+            return None
+        power_up_type = self.rng.choice([SHIELD, SPEED, POOP_EATER, TURRET])
+        return PowerUp(power_up_pos[0], power_up_pos[1], power_up_type)
+
+    def next_level(self):
+        self.current_level += 1
+        self.apples_eaten_this_level = 0
+
+        # Keep snake positions and directions, just clear poop
+        for pos, spots in self.poop.cells.items():
+            for _ in spots:
+                self.board.remove(pos[0], pos[1])
+        self.poop.clear()
+        for snake in self.snakes:
+            snake.poop_spots = []
+
+        # Add new poop monster that will chase snake that poops
+        if self.current_level > 1:
+            x = self.rng.randint(1, self.size - 2)
+            y = self.rng.randint(1, self.size - 2)
+            self.poop_monsters.append(PoopMonster(x, y, None))  # Target will be set when snake poops
+
+        self.food = self.spawn_food()
+        self.power_up = self.spawn_power_up()
+
+    def handle_input(self, player, action):
+        snake = self.snakes[player]
+        if action in DIRECTIONS:
+            direction = DIRECTIONS[action]
+            # No turning back onto yourself
+            if snake.direction != [-direction[0], -direction[1]]:
+                snake.direction = list(direction)
+        elif action == FART:
+            snake.fart(self.particles, self.rng)
+        elif action == GOD_MODE:
+            for snake in self.snakes:
+                snake.god_mode = not snake.god_mode
+        elif action == RESTART:
+            if self.game_over:
+                self.reset()
+
+    def move_snake(self, snake):
+        if snake.move():
+            return True
+        if snake.apples_eaten >= 2:
+            poop = snake.drop_poop()
+            self.poop.add(poop, snake)
+            self.board.add(poop.x, poop.y)
+            self.particles.spawn(STINK_PARTICLE, poop.x, poop.y, lifetime=20)
+            # Idle monsters chase this snake; ones already after another
+            # living snake stay on it
+            for monster in self.poop_monsters:
+                target = monster.target_snake
+                if target is None or target is snake or target.death:
+                    monster.target_snake = snake
+        return False
+
+    def resolve_deaths(self, dead):
+        """End the match if fewer than two snakes survive, else clear the dead
+        off the board so the others play on."""
+        if len(self.alive()) < 2:
+            self.game_over = True
+            return
+        for snake in dead:
+            snake.body = []
+            for monster in self.poop_monsters:
+                if monster.target_snake is snake:
+                    monster.target_snake = None
+
+    def collect_power_up(self, snake):
+        power_up = self.power_up
+        # Add collection effects
+        if power_up.type == SHIELD:
+            snake.shield = SHIELD_TIME
+            # Add shield effect
+            for i in range(8):
+                angle = i * math.pi / 4
+                self.particles.spawn(FART_PARTICLE, snake.body[0][0] + math.cos(angle), snake.body[0][1] + math.sin(angle),
+                                     radius=2, lifetime=15)
+        elif power_up.type == SPEED:
+            snake.speed_boost = SPEED_TIME
+            # Add speed effect
+            for i in range(5):
+                self.particles.spawn(FART_PARTICLE, snake.body[0][0] - i, snake.body[0][1],
+                                     radius=1, lifetime=10)
+        elif power_up.type == POOP_EATER:
+            snake.poop_eater = POOP_EATER_TIME
+            # Add poop eater effect
+            for i in range(4):
+                self.particles.spawn(FART_PARTICLE, snake.body[0][0], snake.body[0][1],
+                                     radius=3, lifetime=20)
+        elif power_up.type == TURRET:
+            if not snake.extra_turret:
+                snake.extra_turret = Turret(power_up.x, power_up.y)
+                self.add_turret(snake.extra_turret)
+                # Add turret effect
+                for i in range(6):
+                    angle = i * math.pi / 3
+                    self.particles.spawn(FART_PARTICLE, power_up.x + math.cos(angle), power_up.y + math.sin(angle),
+                                         radius=2, lifetime=15)
+        self.power_up = self.spawn_power_up()
+
+    def update_flow_fields(self):
+        """One shared BFS per chased snake, toward its tail.
+
+        Only monsters standing on a cell choose a new step, so a field is
+        computed only for snakes that one of those monsters is chasing.
+        Snake bodies, poop and turrets are obstacles; the apple and the
+        power-up are not.
+        """
+        chasers = {}
+        for monster in self.poop_monsters:
+            target = monster.target_snake
+            if target is not None and monster.aligned():
+                chasers.setdefault(monster.target_snake, []).append(
+                    (int(monster.x), int(monster.y)))
+        if not chasers:
+            return {}
+
+        passable = {}
+        for pos in (self.food, (self.power_up.x, self.power_up.y) if self.power_up else None):
+            if pos is not None:
+                i = pos[1] * self.size + pos[0]
+                passable[i] = passable.get(i, 0) + 1
+        fields = {}
+        for snake, goals in chasers.items():
+            field = self.flow_fields.get(snake)
+            if field is None:
+                field = self.flow_fields[snake] = FlowField(self.size)
+            field.compute(snake.body[-1], self.board.cells, passable, goals, FLOW_LIMIT)
+            fields[snake] = field
+        return fields
+
+    def eat_food(self, snake):
+        snake.grow = True
+        snake.score += 1
+        snake.apples_eaten += 1
+        self.apples_eaten_this_level += 1
+        self.food = self.spawn_food()
+
+    def substep(self, movers, update_timers=True):
+        """Move the given snakes one cell and apply pickups and collisions."""
+        profiler = self.profiler
+        dead = []
+
+        # Move snakes
+        with profiler.scope('move'):
+            for snake in movers:
+                if self.move_snake(snake):
+                    snake.death = 'wall'
+                    dead.append(snake)
+                    # The last survivor doesn't get to move on
+                    if len(self.alive()) < 2:
+                        self.game_over = True
+                        break
+
+        # Update power-ups
+        if update_timers:
+            for snake in self.snakes:
+                if snake.shield > 0:
+                    snake.shield -= 1
+                if snake.speed_boost > 0:
+                    snake.speed_boost -= 1
+                if snake.poop_eater > 0:
+                    snake.poop_eater -= 1
+
+        with profiler.scope('pickups'):
+            # Check power-up collision
+            if self.power_up:
+                for snake in movers:
+                    if snake.body[0] == (self.power_up.x, self.power_up.y):
+                        self.collect_power_up(snake)
+
+            # Check food collision
+            for snake in movers:
+                if snake.body[0] == self.food:
+                    self.eat_food(snake)
+
+            # Check if level complete
+            if self.apples_eaten_this_level >= LEVEL_APPLES:
+                self.next_level()
+
+        # Check collisions
+        # Snakes are immune to bullets from their own turret
+        with profiler.scope('collisions'):
+            shots = self.bullets.hit_heads(
+                [snake.body[0] for snake in movers],
+                [snake.extra_turret.source if snake.extra_turret else -1 for snake in movers])
+            for snake, shot in zip(movers, shots):
+                death = snake.check_collision(self.bodies, shot, self.poop)
+                if death:
+                    if not snake.death:
+                        dead.append(snake)
+                    snake.death = death
+            if dead and not self.game_over:
+                self.resolve_deaths(dead)
+
+    def step(self, inputs=()):
+        """Advance the game by one tick.
+
+        inputs is an iterable of (player, action) pairs, player being the
+        snake's index and action one of UP, DOWN, LEFT, RIGHT, FART, GOD_MODE
+        or RESTART. Inputs for snakes that died are handled like any other;
+        a knocked-out snake has no body left for them to act on.
+        """
+        self.tick += 1
+        profiler = self.profiler
+
+        # Effects age first, so ones spawned this tick are drawn fresh
+        with profiler.scope('particles'):
+            self.particles.update()
+
+        for player, action in inputs:
+            self.handle_input(player, action)
+
+        if self.game_over:
+            return
+        if self.countdown_timer > 0:
+            self.countdown_timer -= 1
+            return
+
+        alive = self.alive()
+
+        # Retry spawns that failed on a full board
+        if self.food is None:
+            self.food = self.spawn_food()
+
+        # Update turrets
+        with profiler.scope('turrets'):
+            self.bullets.update()
+            for turret in self.turrets:
+                turret.update()
+                turret.shoot(*alive)
+
+        # Snakes on a speed boost move twice per tick, in a second sub-step
+        # that runs the same pickup and collision rules as the first
+        moves = [BOOST_MOVES if snake.speed_boost > 0 else 1 for snake in alive]
+        for substep in range(max(moves)):
+            # A finished match must not let a boosted snake keep scoring
+            if self.game_over:
+                break
+            movers = [snake for snake, count in zip(alive, moves)
+                      if count > substep and not snake.death]
+            self.substep(movers, update_timers=substep == 0)
+
+        # Update poop monsters
+        with profiler.scope('monsters'):
+            fields = self.update_flow_fields()
+            for monster in self.poop_monsters:
+                monster.move(fields.get(monster.target_snake))
+                # Check if monster caught a snake
+                monster_pos = (int(monster.x), int(monster.y))
+                if monster_pos in self.bodies:
+                    if not any(snake.god_mode for snake in self.snakes):
+                        caught = [snake for snake in self.snakes if monster_pos in snake.cells]
+                        for snake in caught:
+                            snake.death = 'monster'
+                        self.resolve_deaths(caught)
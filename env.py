@@ -0,0 +1,157 @@
+"""Gym-style environment around GameState for training agents.
+
+Observations are one (CHANNELS, GRID_COUNT, GRID_COUNT) uint8 array seen
+from one player's side. The two body channels are the very memory the
+snakes' OccupancyGrids count their segments in, so bodies are never copied;
+the other channels are patched only where something moved. The same array
+object is returned by every reset() and step(), so copy it to keep history.
+pygame is imported only when render() is first called.
+"""
+import random
+
+import numpy as np
+
+from engine import GameState, OccupancyGrid, GRID_COUNT, DIRECTIONS, FART
+
+# Observation channels
+OWN_BODY = 0
+ENEMY_BODY = 1
+FOOD = 2
+POWER_UP = 3
+POOP = 4
+BULLETS = 5
+MONSTERS = 6
+TURRETS = 7
+CHANNELS = 8
+
+# Actions accepted by step(), besides None for "keep going"
+ACTIONS = tuple(DIRECTIONS) + (FART,)
+
+DEATH_PENALTY = 1.0
+
+
+def default_reward(state, player, score_gain):
+    """One point per apple, minus DEATH_PENALTY when the player's snake died."""
+    reward = float(score_gain)
+    if state.snakes[player].death:
+        reward -= DEATH_PENALTY
+    return reward
+
+
+class SnakeEnv:
+    """reset() / step(action1, action2) over a single two-snake game.
+
+    player picks whose view the observation shows (0 or 1). reward is called
+    as reward(state, player, score_gain) for each player after every step.
+    render_mode is 'human' for a window or 'rgb_array' for pixel arrays.
+    """
+
+    def __init__(self, seed=None, player=0, reward=default_reward, render_mode=None):
+        # Episode seeds, so a seeded env plays the same sequence of games
+        self.seeds = random.Random(seed)
+        self.player = player
+        self.reward = reward
+        self.render_mode = render_mode
+        self.observation = np.zeros((CHANNELS, GRID_COUNT, GRID_COUNT), dtype=np.uint8)
+        own, enemy = (memoryview(self.observation[c].reshape(-1)) for c in (OWN_BODY, ENEMY_BODY))
+        grids = (OccupancyGrid(cells=own), OccupancyGrid(cells=enemy))
+        self.snake_cells = grids if player == 0 else grids[::-1]
+        self.state = None
+        self.screen = None
+        self._scores = [0, 0]
+        self._marks = {}
+        self._versions = {}
+
+    def reset(self, seed=None):
+        """Start a new game and return the first observation."""
+        if seed is None:
+            seed = self.seeds.randrange(2 ** 63)
+        self.state = GameState(seed, self.snake_cells)
+        # Agents act from the first tick, no countdown
+        self.state.countdown_timer = 0
+        self._scores = [0, 0]
+        self.observation[FOOD:] = 0
+        self._marks = {}
+        self._versions = {}
+        self._sync()
+        return self.observation
+
+    def step(self, action1, action2):
+        """Play one tick; returns (observation, (reward1, reward2), done, info)."""
+        state = self.state
+        inputs = [(player, action) for player, action in enumerate((action1, action2))
+                  if action is not None]
+        state.step(inputs)
+        self._sync()
+        rewards = []
+        for player, snake in enumerate(state.snakes):
+            rewards.append(self.reward(state, player, snake.score - self._scores[player]))
+            self._scores[player] = snake.score
+        info = {
+            'tick': state.tick,
+            'level': state.current_level,
+            'scores': tuple(self._scores),
+            'deaths': tuple(snake.death for snake in state.snakes),
+        }
+        return self.observation, tuple(rewards), state.game_over, info
+
+    def _mark(self, channel, cells, value=1):
+        """Point channel at cells, clearing only the cells it marked before."""
+        plane = self.observation[channel]
+        for x, y in self._marks.get(channel, ()):
+            plane[y, x] = 0
+        for x, y in cells:
+            plane[y, x] = value
+        self._marks[channel] = cells
+
+    def _changed(self, name, version):
+        if self._versions.get(name, ()) == version:
+            return False
+        self._versions[name] = version
+        return True
+
+    def _sync(self):
+        state = self.state
+        if self._changed(FOOD, state.food):
+            self._mark(FOOD, [state.food] if state.food is not None else [])
+        power_up = state.power_up
+        if self._changed(POWER_UP, power_up and (power_up.x, power_up.y, power_up.type)):
+            # The power-up channel holds its type rather than just 1
+            if power_up:
+                self._mark(POWER_UP, [(power_up.x, power_up.y)], power_up.type)
+            else:
+                self._mark(POWER_UP, [])
+        if self._changed(POOP, (state.current_level, len(state.poop))):
+            self._mark(POOP, list(state.poop.cells))
+        if self._changed(TURRETS, len(state.turrets)):
+            self._mark(TURRETS, [(turret.x, turret.y) for turret in state.turrets])
+        self._mark(MONSTERS, [(int(m.x), int(m.y)) for m in state.poop_monsters])
+        bullets = self.observation[BULLETS].reshape(-1)
+        bullets[:] = 0
+        bullets[state.bullets.cells()] = 1
+
+    def render(self):
+        """Draw the game; returns an (h, w, 3) array in 'rgb_array' mode."""
+        import pygame
+        from game import WINDOW_SIZE, draw_game
+
+        if self.screen is None:
+            pygame.init()
+            if self.render_mode == 'human':
+                self.screen = pygame.display.set_mode((WINDOW_SIZE, WINDOW_SIZE))
+                pygame.display.set_caption('Snake Battle')
+            else:
+                self.screen = pygame.Surface((WINDOW_SIZE, WINDOW_SIZE))
+        draw_game(self.screen, self.state)
+        if self.render_mode == 'human':
+            pygame.event.pump()
+            pygame.display.flip()
+            return None
+        return pygame.surfarray.array3d(self.screen).swapaxes(0, 1)
+
+    def close(self):
+        if self.screen is not None and self.render_mode == 'human':
+            import pygame
+            # Only the window: game.py keeps fonts that a full quit would free
+            pygame.display.quit()
+        self.screen = None
@@ -1,611 +1,995 @@
-import pygame
-import random
+import argparse
 import math
+import time
+from collections import OrderedDict
+from itertools import repeat
+
+import numpy as np
+import pygame
 from pygame.locals import *
 
-# Initialize Pygame
-pygame.init()
-
-# Constants
-WINDOW_SIZE = 800
-GRID_SIZE = 20
-GRID_COUNT = WINDOW_SIZE // GRID_SIZE
-
-# Colors
-BLACK = (0, 0, 0)
-GREEN = (0, 255, 0)
-RED = (255, 0, 0)
-DARK_RED = (139, 0, 0)
-BLUE = (0, 0, 255)
-WHITE = (255, 255, 255)
-BROWN = (139, 69, 19)
-PURPLE = (128, 0, 128)
-YELLOW = (255, 255, 0)
-
-SHIELD = 1
-SPEED = 2
-POOP_EATER = 3
-TURRET = 4
-
-class Turret:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.bullets = []
-        self.shoot_timer = 0
-
-    def shoot(self, snake1, snake2):
-        if self.shoot_timer <= 0:
-            # Target closest snake
-            targets = [snake1.body[0], snake2.body[0]]
-            for target in targets:
-                dx = target[0] - self.x
-                dy = target[1] - self.y
-                length = math.sqrt(dx * dx + dy * dy)
-                if length > 0:
-                    dx = dx / length
-                    dy = dy / length
-                    self.bullets.append([self.x, self.y, dx, dy])
-            self.shoot_timer = 30
-
-    def update(self):
-        self.shoot_timer -= 1
-        for bullet in self.bullets[:]:
-            bullet[0] += bullet[2]
-            bullet[1] += bullet[3]
-            if not (0 <= bullet[0] < GRID_COUNT and 0 <= bullet[1] < GRID_COUNT):
-                self.bullets.remove(bullet)
-
-class FartEffect:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.lifetime = 20
-        self.radius = 1
-
-class PoopMonster:
-    def __init__(self, x, y, target_snake):
-        self.x = x
-        self.y = y
-        self.target_snake = target_snake
-        self.speed = 0.5
-
-    def move(self):
-        if self.target_snake:
-            # Move towards snake's tail, avoiding head
-            tail = self.target_snake.body[-1]
-            head = self.target_snake.body[0]
-            dx = tail[0] - self.x
-            dy = tail[1] - self.y
-
-            # Avoid head collision
-            head_dx = head[0] - self.x
-            head_dy = head[1] - self.y
-            if abs(head_dx) < GRID_SIZE and abs(head_dy) < GRID_SIZE:
-                dx = -head_dx
-                dy = -head_dy
-
-
-            if abs(dx) > abs(dy):
-                self.x += self.speed if dx > 0 else -self.speed
-            else:
-                self.y += self.speed if dy > 0 else -self.speed
-
-class PoopSpot:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.stink_effects = []
-        self.stink_timer = 0
-
-class PowerUp:
-    def __init__(self, x, y, type):
-        self.x = x
-        self.y = y
-        self.type = type
-
-class Snake:
-    def __init__(self, x, y, color):
-        self.body = [(x, y)]
-        self.direction = [1, 0]
-        self.color = color
-        self.grow = False
-        self.score = 0
-        self.poop_spots = []
-        self.fart_effects = []
-        self.apples_eaten = 0
-        self.god_mode = False
-        self.shield = 0
-        self.speed_boost = 0
-        self.poop_eater = 0
-        self.extra_turret = None
-
-    def move(self):
-        x = self.body[0][0] + self.direction[0]
-        y = self.body[0][1] + self.direction[1]
-        if x < 0:
-            if self.god_mode:
-                x = GRID_COUNT - 1
-            else:
-                return True
-        elif x >= GRID_COUNT:
-            if self.god_mode:
-                x = 0
-            else:
-                return True
-        if y < 0:
-            if self.god_mode:
-                y = GRID_COUNT - 1
-            else:
-                return True
-        elif y >= GRID_COUNT:
-            if self.god_mode:
-                y = 0
-            else:
-                return True
-        self.body.insert(0, (x, y))
-        if not self.grow:
-            self.body.pop()
-        self.grow = False
-
-        if self.apples_eaten >= 2:
-            poop_spot = PoopSpot(self.body[-1][0], self.body[-1][1])
-            poop_spot.stink_timer = 20
-            self.poop_spots.append(poop_spot)
-            self.apples_eaten = 0
-            # Make all nearby monsters chase this snake
-            for monster in poop_monsters:
-                if monster.target_snake != (snake2 if self == snake1 else snake1):
-                    monster.target_snake = self
-        return False
-
-    def check_collision(self, other_snake, turrets):
-        head = self.body[0]
-        # Self collision
-        if head in self.body[1:]:
-            if not self.god_mode:
-                return True
-        # Other snake collision
-        if head in other_snake.body:
-            if not self.god_mode:
-                return True
-        # Bullet collision
-        for turret in turrets:
-            for bullet in turret.bullets:
-                if int(bullet[0]) == head[0] and int(bullet[1]) == head[1]:
-                    if not self.god_mode:
-                        return True
-        # Poop collision
-        for snake in [self, other_snake]:
-            for poop in snake.poop_spots:
-                if head[0] == poop.x and head[1] == poop.y and not snake.poop_eater:
-                    if not self.god_mode:
-                        return True
-        return False
-
-def spawn_food():
-    while True:
-        x = random.randint(1, GRID_COUNT - 2)  # Avoid walls
-        y = random.randint(1, GRID_COUNT - 2)  # Avoid walls
-        food_pos = (x, y)
-        # Check if not in snakes, turret position, or power-up position
-        if (food_pos not in snake1.body and 
-            food_pos not in snake2.body and 
-            not any(food_pos == (t.x, t.y) for t in turrets) and
-            food_pos != (power_up.x, power_up.y) if power_up else True):
-            return food_pos
-
-
-def spawn_power_up():
-    while True:
-        x = random.randint(1, GRID_COUNT - 2)
-        y = random.randint(1, GRID_COUNT - 2)
-        power_up_pos = (x, y)
-        if (power_up_pos not in snake1.body and
-                power_up_pos not in snake2.body and
-                not any(power_up_pos == (t.x, t.y) for t in turrets) and
-                power_up_pos != food):
-            power_up_type = random.choice([SHIELD, SPEED, POOP_EATER, TURRET])
-            return PowerUp(x, y, power_up_type)
-
-def draw_background():
+from engine import (
+    WINDOW_SIZE, GRID_SIZE, GRID_COUNT,
+    BLACK, GREEN, RED, DARK_RED, BLUE, WHITE, BROWN, PURPLE, YELLOW,
+    SHIELD, SPEED, POOP_EATER, TURRET,
+    UP, DOWN, LEFT, RIGHT, FART, GOD_MODE, RESTART,
+    STINK_PARTICLE,
+    GameState, SnakeBody, MAX_PLAYERS,
+)
+from replay import Recorder
+from netplay import NetClient, RemoteState
+from ai import SnakeAI
+from profiler import Profiler
+
+# Keyboard layout: key -> (player, action)
+KEY_BINDINGS = {
+    # Player 1 controls (WASD)
+    K_w: (0, UP),
+    K_s: (0, DOWN),
+    K_a: (0, LEFT),
+    K_d: (0, RIGHT),
+    K_e: (0, FART),  # Green snake farts with 'E' key
+    # Player 2 controls (Arrows)
+    K_UP: (1, UP),
+    K_DOWN: (1, DOWN),
+    K_LEFT: (1, LEFT),
+    K_RIGHT: (1, RIGHT),
+    K_1: (1, FART),  # Blue snake farts with '1' key
+    K_KP1: (1, FART),
+    K_g: (0, GOD_MODE),
+}
+
+HELP_TEXTS = [
+    "Power-ups Guide:",
+    "Blue Shield: Temporary invincibility",
+    "Yellow Lightning: Speed boost",
+    "Brown Circle: Eat poop without dying",
+    "Purple Square: Place your own turret",
+    "",
+    "Controls:",
+    "Player 1: WASD + E(fart)",
+    "Player 2: Arrows + 1(fart)",
+    "G: Toggle God Mode",
+    "H: Show/Hide Help",
+    "F3: Show/Hide Profiler"
+]
+
+# Pre-rendered checkerboard and walls, keyed by (window size, grid size)
+_background_cache = {}
+
+def draw_background(surface, width, height):
+    surface.fill(BLACK)
     # Draw checkerboard pattern
-    for i in range(GRID_COUNT):
-        for j in range(GRID_COUNT):
+    for i in range(width // GRID_SIZE):
+        for j in range(height // GRID_SIZE):
             if (i + j) % 2 == 0:
-                pygame.draw.rect(screen, (30, 30, 30), 
+                pygame.draw.rect(surface, (30, 30, 30),
                                (i * GRID_SIZE, j * GRID_SIZE, GRID_SIZE, GRID_SIZE))
 
-def reset_game():
-    global snake1, snake2, food, game_over, turrets, countdown_timer, poop_monsters, power_up
-    score1 = snake1.score if 'snake1' in globals() else 0
-    score2 = snake2.score if 'snake2' in globals() else 0
-    countdown_timer = 15  # 2 seconds at 30 FPS
-    snake1 = Snake(5, GRID_COUNT//2, GREEN)
-    snake2 = Snake(GRID_COUNT-6, GRID_COUNT//2, BLUE)
-    snake1.score = score1
-    snake2.score = score2
-    snake1.poop_spots = []
-    snake2.poop_spots = []
-    snake1.fart_effects = []
-    snake2.fart_effects = []
-    food = spawn_food()
-    game_over = False
-    turrets = [
-        Turret(GRID_COUNT//2, GRID_COUNT//2)  # Single turret in center
-    ]
-    power_up = spawn_power_up()
-
-
-def draw_scores():
-    font = pygame.font.Font(None, 36)
-    score1 = font.render(f'Player 1: {snake1.score}', True, GREEN)
-    score2 = font.render(f'Player 2: {snake2.score}', True, BLUE)
-    screen.blit(score1, (10, 10))
-    screen.blit(score2, (WINDOW_SIZE - 150, 10))
-
-# Initialize game
-screen = pygame.display.set_mode((WINDOW_SIZE, WINDOW_SIZE))
-pygame.display.set_caption('Snake Battle')
-clock = pygame.time.Clock()
-
-current_level = 1
-apples_eaten_this_level = 0
-poop_monsters = []
-countdown_timer = 15  # 2 seconds at 30 FPS
-
-power_up = None
-snake1 = Snake(5, GRID_COUNT // 2, GREEN)
-snake2 = Snake(GRID_COUNT - 6, GRID_COUNT // 2, BLUE)
-turrets = [
-    Turret(GRID_COUNT//2, GRID_COUNT//2)
-]
-food = spawn_food()
-power_up = spawn_power_up()
-game_over = False
-
-def next_level():
-    global current_level, apples_eaten_this_level, food, poop_monsters, power_up
-    current_level += 1
-    apples_eaten_this_level = 0
-
-    # Keep snake positions and directions, just clear poop
-    snake1.poop_spots = []
-    snake2.poop_spots = []
-
-    # Add new poop monster that will chase snake that poops
-    if current_level > 1:
-        x = random.randint(1, GRID_COUNT - 2)
-        y = random.randint(1, GRID_COUNT - 2)
-        poop_monsters.append(PoopMonster(x, y, None))  # Target will be set when snake poops
-
-    food = spawn_food()
-    power_up = spawn_power_up()
-
-game_paused = False #added for pause functionality
-
-while True:
-    for event in pygame.event.get():
-        if event.type == QUIT:
-            pygame.quit()
-            exit()
-        elif event.type == KEYDOWN:
-            if game_over and event.key == K_r:
-                reset_game()
-                continue
-            # Player 1 controls (WASD)
-            if event.key == K_w and snake1.direction != [0, 1]:
-                snake1.direction = [0, -1]
-            elif event.key == K_s and snake1.direction != [0, -1]:
-                snake1.direction = [0, 1]
-            elif event.key == K_a and snake1.direction != [1, 0]:
-                snake1.direction = [-1, 0]
-            elif event.key == K_d and snake1.direction != [-1, 0]:
-                snake1.direction = [1, 0]
-            # Player 2 controls (Arrows)
-            elif event.key == K_UP and snake2.direction[1] != 1:
-                snake2.direction = [0, -1]
-            elif event.key == K_DOWN and snake2.direction[1] != -1:
-                snake2.direction = [0, 1]
-            elif event.key == K_LEFT and snake2.direction[0] != 1:
-                snake2.direction = [-1, 0]
-            elif event.key == K_RIGHT and snake2.direction[0] != -1:
-                snake2.direction = [1, 0]
-            # Fart controls
-            elif event.key == K_e:  # Green snake farts with 'E' key
-                if len(snake1.body) > 1:
-                    fart_pos = snake1.body[-1]
-                    for _ in range(3):  # Create multiple fart effects
-                        effect = FartEffect(fart_pos[0], fart_pos[1])
-                        effect.radius = random.randint(1, 3)
-                        snake1.fart_effects.append(effect)
-            elif event.key == K_1 or event.key == K_KP1:  # Blue snake farts with '1' key
-                if len(snake2.body) > 1:
-                    fart_pos = snake2.body[-1]
-                    for _ in range(3):  # Create multiple fart effects
-                        effect = FartEffect(fart_pos[0], fart_pos[1])
-                        effect.radius = random.randint(1, 3)
-                        snake2.fart_effects.append(effect)
-            elif event.key == K_g:
-                snake1.god_mode = not snake1.god_mode
-                snake2.god_mode = not snake2.god_mode
-            elif event.key == K_h: #toggle help menu
-                game_paused = not game_paused
-
-
-    # Draw everything
-    screen.fill(BLACK)
-    draw_background()
-
-    # Check for help menu
-    show_help = pygame.key.get_pressed()[K_h]
-
-    if not game_paused and not game_over and countdown_timer <= 0:
-        # Update turrets
-        for turret in turrets:
-            turret.update()
-            turret.shoot(snake1, snake2)
-
-        # Move snakes
-        if snake1.move() or snake2.move():
-            game_over = True
-
-        # Update power-ups
-        for snake in [snake1, snake2]:
-            if snake.shield > 0:
-                snake.shield -= 1
-            if snake.speed_boost > 0:
-                snake.speed_boost -= 1
-            if snake.poop_eater > 0:
-                snake.poop_eater -= 1
-
-        # Check power-up collision
-        if power_up:
-            for snake in [snake1, snake2]:
-                if snake.body[0] == (power_up.x, power_up.y):
-                    # Add collection effects
-                    if power_up.type == SHIELD:
-                        snake.shield = 100
-                        # Add shield effect
-                        for i in range(8):
-                            angle = i * math.pi / 4
-                            effect = FartEffect(snake.body[0][0] + math.cos(angle), snake.body[0][1] + math.sin(angle))
-                            effect.radius = 2
-                            effect.lifetime = 15
-                            snake.fart_effects.append(effect)
-                    elif power_up.type == SPEED:
-                        snake.speed_boost = 100
-                        # Add speed effect
-                        for i in range(5):
-                            effect = FartEffect(snake.body[0][0] - i, snake.body[0][1])
-                            effect.radius = 1
-                            effect.lifetime = 10
-                            snake.fart_effects.append(effect)
-                    elif power_up.type == POOP_EATER:
-                        snake.poop_eater = 100
-                        # Add poop eater effect
-                        for i in range(4):
-                            effect = FartEffect(snake.body[0][0], snake.body[0][1])
-                            effect.radius = 3
-                            effect.lifetime = 20
-                            snake.fart_effects.append(effect)
-                    elif power_up.type == TURRET:
-                        if not snake.extra_turret:
-                            snake.extra_turret = Turret(power_up.x, power_up.y)
-                            turrets.append(snake.extra_turret)
-                            # Add turret effect
-                            for i in range(6):
-                                angle = i * math.pi / 3
-                                effect = FartEffect(power_up.x + math.cos(angle), power_up.y + math.sin(angle))
-                                effect.radius = 2
-                                effect.lifetime = 15
-                                snake.fart_effects.append(effect)
-                    power_up = spawn_power_up()
-
-        # Check food collision
-        if snake1.body[0] == food:
-            snake1.grow = True
-            snake1.score += 1
-            snake1.apples_eaten += 1
-            apples_eaten_this_level += 1
-            food = spawn_food()
-        if snake2.body[0] == food:
-            snake2.grow = True
-            snake2.score += 1
-            snake2.apples_eaten += 1
-            apples_eaten_this_level += 1
-            food = spawn_food()
-
-        # Check if level complete
-        if apples_eaten_this_level >= 4:
-            next_level()
-
-        # Update poop monsters
-        for monster in poop_monsters:
-            monster.move()
-            # Check if monster caught a snake
-            monster_x = int(monster.x)
-            monster_y = int(monster.y)
-            if (monster_x, monster_y) in snake1.body or (monster_x, monster_y) in snake2.body:
-                if not snake1.god_mode and not snake2.god_mode:
-                    game_over = True
-
-        # Check collisions
-        if (snake1.check_collision(snake2, [t for t in turrets if t != snake1.extra_turret]) or 
-            snake2.check_collision(snake1, [t for t in turrets if t != snake2.extra_turret])):
-            game_over = True
-
-    # Draw everything
-    screen.fill(BLACK)
-    draw_background()
-
     # Draw walls
-    pygame.draw.rect(screen, DARK_RED, (0, 0, WINDOW_SIZE, GRID_SIZE))  # Top
-    pygame.draw.rect(screen, DARK_RED, (0, WINDOW_SIZE-GRID_SIZE, WINDOW_SIZE, GRID_SIZE))  # Bottom
-    pygame.draw.rect(screen, DARK_RED, (0, 0, GRID_SIZE, WINDOW_SIZE))  # Left
-    pygame.draw.rect(screen, DARK_RED, (WINDOW_SIZE-GRID_SIZE, 0, GRID_SIZE, WINDOW_SIZE))  # Right
-
-    # Draw poop spots and stink effects
-    for snake in [snake1, snake2]:
-        for poop in snake.poop_spots:
-            # Draw poop
-            pygame.draw.rect(screen, BROWN, (poop.x * GRID_SIZE, poop.y * GRID_SIZE,
-                                         GRID_SIZE - 1, GRID_SIZE - 1))
-            # Draw stink waves
-            if poop.stink_timer > 0:
-                for i in range(3):
-                    radius = (20 - poop.stink_timer + i * 5) * 2
-                    pygame.draw.circle(screen, (139, 69, 19, 50), 
-                                     (poop.x * GRID_SIZE + GRID_SIZE//2, 
-                                      poop.y * GRID_SIZE + GRID_SIZE//2), 
-                                     radius, 1)
-                poop.stink_timer -= 1
-
-        # Draw fart effects
-        for fart in snake.fart_effects[:]:
-            if fart.lifetime > 0:
-                pygame.draw.circle(screen, (0, 255, 0, 50),
-                                 (fart.x * GRID_SIZE + GRID_SIZE//2,
-                                  fart.y * GRID_SIZE + GRID_SIZE//2),
-                                 fart.radius * 3, 1)
-                fart.lifetime -= 1
-                fart.radius += 0.5
-            else:
-                snake.fart_effects.remove(fart)
-
-    # Draw turrets and bullets
-    for turret in turrets:
-        pygame.draw.rect(screen, PURPLE, (turret.x * GRID_SIZE, turret.y * GRID_SIZE,
-                                        GRID_SIZE - 1, GRID_SIZE - 1))
-        for bullet in turret.bullets:
-            pygame.draw.rect(screen, YELLOW, (bullet[0] * GRID_SIZE, bullet[1] * GRID_SIZE,
-                                            GRID_SIZE/2, GRID_SIZE/2))
-
-    # Draw food
-    pygame.draw.rect(screen, RED, (food[0] * GRID_SIZE, food[1] * GRID_SIZE,
-                                 GRID_SIZE - 1, GRID_SIZE - 1))
-
-    # Draw Power-up with animation
-    if power_up:
-        # Calculate floating animation
-        float_offset = math.sin(pygame.time.get_ticks() * 0.005) * 5
-        power_up_y = power_up.y * GRID_SIZE + float_offset
-
-        if power_up.type == SHIELD:
-            pygame.draw.circle(screen, (0, 0, 255), (power_up.x * GRID_SIZE + GRID_SIZE // 2, power_up_y + GRID_SIZE // 2), GRID_SIZE // 2)
+    pygame.draw.rect(surface, DARK_RED, (0, 0, width, GRID_SIZE))  # Top
+    pygame.draw.rect(surface, DARK_RED, (0, height-GRID_SIZE, width, GRID_SIZE))  # Bottom
+    pygame.draw.rect(surface, DARK_RED, (0, 0, GRID_SIZE, height))  # Left
+    pygame.draw.rect(surface, DARK_RED, (width-GRID_SIZE, 0, GRID_SIZE, height))  # Right
+
+def get_background(size):
+    """The static board layer for a window of the given size, built once."""
+    key = (tuple(size), GRID_SIZE)
+    background = _background_cache.get(key)
+    if background is None:
+        background = pygame.Surface(key[0])
+        draw_background(background, *key[0])
+        if pygame.display.get_surface() is not None:
+            background = background.convert()
+        # Only the current window size is ever needed again
+        _background_cache.clear()
+        _background_cache[key] = background
+    return background
+
+# Cells around the view in which an effect's rings can still reach into it
+PARTICLE_REACH = 4
+
+# Cells per side of a background chunk, and how many chunks stay cached
+CHUNK_CELLS = 32
+MAX_CHUNKS = 256
+_chunk_cache = OrderedDict()
+# The composed background of the last camera view
+_view_cache = {}
+
+def get_checker(cell):
+    """A CHUNK_CELLS square of checkerboard; chunks start on even cells, so
+    every one of them shares it."""
+    key = ('checker', cell)
+    checker = _chunk_cache.get(key)
+    if checker is None:
+        checker = pygame.Surface((CHUNK_CELLS * cell, CHUNK_CELLS * cell))
+        checker.fill(BLACK)
+        for i in range(CHUNK_CELLS):
+            for j in range(i % 2, CHUNK_CELLS, 2):
+                checker.fill((30, 30, 30), (i * cell, j * cell, cell, cell))
+        _chunk_cache[key] = checker
+    return checker
+
+def get_chunk(cx, cy, cell, arena):
+    """Checkerboard and wall cells of one CHUNK_CELLS square at cell pixels per cell."""
+    key = (cx, cy, cell, arena)
+    chunk = _chunk_cache.get(key)
+    if chunk is not None:
+        _chunk_cache.move_to_end(key)
+        return chunk
+    x0, y0 = cx * CHUNK_CELLS, cy * CHUNK_CELLS
+    width = min(CHUNK_CELLS, arena - x0) * cell
+    height = min(CHUNK_CELLS, arena - y0) * cell
+    chunk = pygame.Surface((width, height))
+    chunk.blit(get_checker(cell), (0, 0))
+    # Walls along the arena's edges
+    if x0 == 0:
+        chunk.fill(DARK_RED, (0, 0, cell, height))
+    if y0 == 0:
+        chunk.fill(DARK_RED, (0, 0, width, cell))
+    if x0 + CHUNK_CELLS >= arena:
+        chunk.fill(DARK_RED, (width - cell, 0, cell, height))
+    if y0 + CHUNK_CELLS >= arena:
+        chunk.fill(DARK_RED, (0, height - cell, width, cell))
+    if pygame.display.get_surface() is not None:
+        chunk = chunk.convert()
+    _chunk_cache[key] = chunk
+    if len(_chunk_cache) > MAX_CHUNKS:
+        _chunk_cache.popitem(last=False)
+    return chunk
+
+def get_view_background(size, camera, arena):
+    """The board layer for what the camera shows, built from cached chunks.
+
+    An arena that exactly fills the window uses the single pre-rendered
+    background; otherwise only the chunks inside the view are blitted, and
+    the result is kept while the camera stays put.
+    """
+    size = tuple(size)
+    if camera.shows_whole(arena, size):
+        return get_background(size)
+    key = (size, camera.x, camera.y, camera.cell, arena)
+    background = _view_cache.get(key)
+    if background is None:
+        background = pygame.Surface(size)
+        background.fill(BLACK)
+        cell, span = camera.cell, CHUNK_CELLS * camera.cell
+        x0, y0, x1, y1 = camera.visible(arena)
+        for cy in range(y0 // CHUNK_CELLS, (y1 - 1) // CHUNK_CELLS + 1):
+            for cx in range(x0 // CHUNK_CELLS, (x1 - 1) // CHUNK_CELLS + 1):
+                background.blit(get_chunk(cx, cy, cell, arena),
+                                (cx * span - camera.x, cy * span - camera.y))
+        _view_cache.clear()
+        _view_cache[key] = background
+    return background
+
+# Pre-rendered tiles, keyed by (kind, color, cell)
+_sprite_cache = {}
+# Destinations of the layer being blitted, refilled for every layer
+_blit_batch = []
+# Cell array of the poop on the board, rebuilt when the poop changes
+_poop_cache = {'key': None, 'cells': None}
+
+def get_sprite(kind, color, cell):
+    """A tile drawn once and blitted for every entity of its kind.
+
+    'tile' is a cell with a one-pixel gap to its neighbours, as snake
+    segments, poop, turrets and the apple are drawn; 'bullet' is a quarter
+    cell and 'monster' a tile with two red eyes.
+    """
+    key = (kind, color, cell)
+    sprite = _sprite_cache.get(key)
+    if sprite is None:
+        side = cell // 2 if kind == 'bullet' else cell - 1
+        sprite = pygame.Surface((side, side))
+        sprite.fill(color)
+        if kind == 'monster':
+            eye_size = cell // 4
+            for left in (eye_size, cell - 2 * eye_size):
+                sprite.fill(RED, (left, eye_size, eye_size, eye_size))
+        if pygame.display.get_surface() is not None:
+            sprite = sprite.convert()
+        _sprite_cache[key] = sprite
+    return sprite
+
+def blit_layer(screen, sprite, positions, track):
+    """Blit sprite at every (x, y) pixel row of positions in one call.
+
+    sprite may also be a list with one sprite per row. Returns the rects
+    covered when track is set, else None.
+    """
+    sprites = sprite if isinstance(sprite, list) else repeat(sprite)
+    _blit_batch[:] = zip(sprites, positions.tolist())
+    return screen.blits(_blit_batch, track)
+
+def body_array(body):
+    """A snake's segments, head first, as an (n, 2) array of cells."""
+    if isinstance(body, SnakeBody):
+        cells = np.empty((len(body), 2), dtype=np.intc)
+        i = 0
+        for xs, ys in body.views():
+            cells[i:i + len(xs), 0] = xs
+            cells[i:i + len(xs), 1] = ys
+            i += len(xs)
+        return cells
+    return np.array(body, dtype=np.intc).reshape(-1, 2)
+
+def poop_array(poop):
+    """The cells holding poop as an (n, 2) array, cached until poop changes."""
+    key = (id(poop), poop.generation, len(poop), poop.hash)
+    if _poop_cache['key'] != key:
+        cells = np.array(list(poop.cells), dtype=np.intc).reshape(-1, 2)
+        _poop_cache.update(key=key, cells=cells)
+    return _poop_cache['cells']
+
+def in_view(cells, x0, y0, x1, y1):
+    """Mask of the rows of an (n, 2) cell array inside [x0, x1) x [y0, y1)."""
+    xs, ys = cells[:, 0], cells[:, 1]
+    return (xs >= x0) & (xs < x1) & (ys >= y0) & (ys < y1)
+
+class Camera:
+    """Which part of the arena the window shows, and at what zoom.
+
+    follow is the player whose head stays centred at full zoom, or None to
+    fit all snakes: the view zooms out as far as needed to keep every head
+    on screen with FIT_MARGIN cells around them, down to MIN_CELL pixels per
+    cell, but never further than showing the whole arena. A followed snake
+    that was knocked out falls back to fitting the rest. x and y are the
+    pixel position of the window's top-left corner on the zoomed arena; an
+    arena smaller than the window is centred.
+    """
+
+    FIT_MARGIN = 6
+    MIN_CELL = 2
+
+    def __init__(self, view=(WINDOW_SIZE, WINDOW_SIZE), follow=None):
+        self.width, self.height = view
+        self.follow = follow
+        self.cell = GRID_SIZE
+        self.x = self.y = 0
+
+    def update(self, state, alpha=1.0, prev=None):
+        """Move to the snakes' positions as drawn this frame."""
+        lag = 1.0 - alpha
+        heads = {}
+        for i, snake in enumerate(state.snakes):
+            # Snakes knocked out of a party match have no body left
+            if not snake.body:
+                continue
+            x, y = snake.body[0]
+            before = prev.get(snake) if prev and lag else None
+            if before is not None and len(before):
+                old_x, old_y = before[0].tolist()
+                if abs(x - old_x) <= 2 and abs(y - old_y) <= 2:
+                    x -= (x - old_x) * lag
+                    y -= (y - old_y) * lag
+            heads[i] = (x, y)
+        arena = state.size
+        view = min(self.width, self.height)
+        if not heads:
+            heads[-1] = ((arena - 1) / 2, (arena - 1) / 2)
+        if self.follow is None or self.follow not in heads:
+            xs = [x for x, _ in heads.values()]
+            ys = [y for _, y in heads.values()]
+            span = max(max(xs) - min(xs), max(ys) - min(ys)) + 1 + 2 * self.FIT_MARGIN
+            cell = max(view // span, self.MIN_CELL, view // arena)
+            self.cell = min(cell, GRID_SIZE)
+            center = ((min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2)
+        else:
+            self.cell = GRID_SIZE
+            center = heads[self.follow]
+        self.x = self._clamp(center[0], self.width, arena)
+        self.y = self._clamp(center[1], self.height, arena)
+
+    def _clamp(self, center, view, arena):
+        world = arena * self.cell
+        if world <= view:
+            return (world - view) // 2
+        return min(max(int((center + 0.5) * self.cell) - view // 2, 0), world - view)
+
+    def visible(self, arena):
+        """Cell range (x0, y0, x1, y1), end exclusive, that intersects the view."""
+        cell = self.cell
+        return (max(self.x // cell, 0), max(self.y // cell, 0),
+                min(-(-(self.x + self.width) // cell), arena),
+                min(-(-(self.y + self.height) // cell), arena))
+
+    def shows_whole(self, arena, size):
+        """Whether the view is exactly the arena at standard zoom."""
+        return (self.cell == GRID_SIZE and self.x == 0 and self.y == 0 and
+                tuple(size) == (arena * GRID_SIZE, arena * GRID_SIZE))
+
+    def key(self):
+        return (self.x, self.y, self.cell)
+
+class TextCache:
+    """Fonts loaded once and rendered text memoized by (text, size, color).
+
+    Font construction and glyph rasterization are the expensive part of
+    drawing text, and the HUD redraws the same few strings every frame.
+    The least recently used surfaces are dropped past max_entries.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+
+    def font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            font = self.fonts[size] = pygame.font.Font(None, size)
+        return font
+
+    def render(self, text, size, color):
+        key = (text, size, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+        surface = self.font(size).render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+        return surface
+
+text_cache = TextCache()
+
+# Frames per power-up cycle, the period of its bobbing; the glow, speed
+# lines, waves and turret barrel go round twice in it
+POWER_UP_FRAMES = 64
+POWER_UP_CYCLE_MS = 2 * math.pi / 0.005
+# Frames per game tick for the growing stink and fart rings
+EFFECT_STEPS = 4
+
+class EffectAtlas:
+    """Animation frames baked once and looked up by (effect, phase, cell).
+
+    effect is a power-up type, 'stink' or 'fart'. The first time a phase is
+    shown at a cell size, the power-up with its glow, speed lines, waves or
+    turret barrel, or the effect's rings, is drawn into a small colour-keyed
+    surface, so later frames cost a lookup and one blit instead of
+    trigonometry and circle rasterization. frame() returns the surface and
+    the offset of its anchor: a power-up's cell corner or a ring's centre.
+    The least recently used frames are dropped past max_entries.
+    """
+
+    TRANSPARENT = (255, 0, 255)
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.frames = OrderedDict()
+
+    def frame(self, effect, phase, cell):
+        key = (effect, phase, cell)
+        frame = self.frames.get(key)
+        if frame is not None:
+            self.frames.move_to_end(key)
+            return frame
+        scale = cell / GRID_SIZE
+        if effect == 'stink':
+            age = phase / EFFECT_STEPS
+            surface, anchor = self._rings([(age + i * 5) * 2 * scale for i in range(3)],
+                                          (139, 69, 19))
+        elif effect == 'fart':
+            surface, anchor = self._rings([phase / EFFECT_STEPS * 3 * scale], (0, 255, 0))
+        else:
+            surface, anchor = self._power_up(effect, phase * POWER_UP_CYCLE_MS / POWER_UP_FRAMES,
+                                             cell, scale)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        surface.set_colorkey(self.TRANSPARENT, RLEACCEL)
+        frame = self.frames[key] = (surface, anchor)
+        if len(self.frames) > self.max_entries:
+            self.frames.popitem(last=False)
+        return frame
+
+    def _canvas(self, width, height):
+        surface = pygame.Surface((width, height))
+        surface.fill(self.TRANSPARENT)
+        return surface
+
+    def _rings(self, radii, color):
+        outer = int(max(radii)) + 1
+        surface = self._canvas(2 * outer + 1, 2 * outer + 1)
+        for radius in radii:
+            pygame.draw.circle(surface, color, (outer, outer), radius, 1)
+        return surface, (outer, outer)
+
+    def _power_up(self, type, ticks, cell, scale):
+        """The power-up as it looks ticks milliseconds into its cycle."""
+        # Room for the bobbing and for glows, waves and lines past the cell
+        pad = int(20 * scale) + 2
+        screen = self._canvas(cell + 2 * pad, cell + 2 * pad)
+        left = pad
+        float_offset = math.sin(ticks * 0.005) * 5 * scale
+        power_up_y = pad + float_offset
+        center = (left + cell // 2, power_up_y + cell // 2)
+
+        if type == SHIELD:
+            pygame.draw.circle(screen, (0, 0, 255), center, cell // 2)
             # Add shield glow
-            glow_size = math.sin(pygame.time.get_ticks() * 0.01) * 3 + 3
-            pygame.draw.circle(screen, (100, 100, 255), (power_up.x * GRID_SIZE + GRID_SIZE // 2, power_up_y + GRID_SIZE // 2), GRID_SIZE // 2 + glow_size, 2)
-        elif power_up.type == SPEED:
-            pygame.draw.rect(screen, (255, 255, 0), (power_up.x * GRID_SIZE, power_up_y, GRID_SIZE, GRID_SIZE))
+            glow_size = (math.sin(ticks * 0.01) * 3 + 3) * scale
+            pygame.draw.circle(screen, (100, 100, 255), center, cell // 2 + glow_size, 2)
+        elif type == SPEED:
+            pygame.draw.rect(screen, (255, 255, 0), (left, power_up_y, cell, cell))
             # Add speed lines
             for i in range(3):
-                offset = math.sin(pygame.time.get_ticks() * 0.01 + i) * 5
-                pygame.draw.line(screen, (255, 255, 100), 
-                               (power_up.x * GRID_SIZE - offset, power_up_y),
-                               (power_up.x * GRID_SIZE - offset - 5, power_up_y + GRID_SIZE), 2)
-        elif power_up.type == POOP_EATER:
-            pygame.draw.circle(screen, (139, 69, 19), (power_up.x * GRID_SIZE + GRID_SIZE // 2, power_up_y + GRID_SIZE // 2), GRID_SIZE // 2)
+                offset = math.sin(ticks * 0.01 + i) * 5 * scale
+                pygame.draw.line(screen, (255, 255, 100),
+                                 (left - offset, power_up_y),
+                                 (left - offset - 5 * scale, power_up_y + cell), 2)
+        elif type == POOP_EATER:
+            pygame.draw.circle(screen, (139, 69, 19), center, cell // 2)
             # Add stink waves
             for i in range(2):
-                wave_size = math.sin(pygame.time.get_ticks() * 0.01 + i * math.pi) * 5 + 10
-                pygame.draw.circle(screen, (139, 69, 19), (power_up.x * GRID_SIZE + GRID_SIZE // 2, power_up_y + GRID_SIZE // 2), GRID_SIZE // 2 + wave_size, 1)
-        elif power_up.type == TURRET:
-            pygame.draw.rect(screen, (128, 0, 128), (power_up.x * GRID_SIZE, power_up_y, GRID_SIZE, GRID_SIZE))
+                wave_size = (math.sin(ticks * 0.01 + i * math.pi) * 5 + 10) * scale
+                pygame.draw.circle(screen, (139, 69, 19), center, cell // 2 + wave_size, 1)
+        elif type == TURRET:
+            pygame.draw.rect(screen, (128, 0, 128), (left, power_up_y, cell, cell))
             # Add rotating turret animation
-            angle = pygame.time.get_ticks() * 0.01
-            end_x = power_up.x * GRID_SIZE + GRID_SIZE//2 + math.cos(angle) * GRID_SIZE//2
-            end_y = power_up_y + GRID_SIZE//2 + math.sin(angle) * GRID_SIZE//2
-            pygame.draw.line(screen, (200, 0, 200),
-                           (power_up.x * GRID_SIZE + GRID_SIZE//2, power_up_y + GRID_SIZE//2),
-                           (end_x, end_y), 3)
-
-
-    # Draw snakes
-    for segment in snake1.body:
-        pygame.draw.rect(screen, snake1.color,
-                        (segment[0] * GRID_SIZE, segment[1] * GRID_SIZE,
-                         GRID_SIZE - 1, GRID_SIZE - 1))
-    for segment in snake2.body:
-        pygame.draw.rect(screen, snake2.color,
-                        (segment[0] * GRID_SIZE, segment[1] * GRID_SIZE,
-                         GRID_SIZE - 1, GRID_SIZE - 1))
-
-    # Draw poop monsters
-    for monster in poop_monsters:
-        pygame.draw.rect(screen, BROWN, 
-                        (int(monster.x * GRID_SIZE), int(monster.y * GRID_SIZE),
-                         GRID_SIZE - 1, GRID_SIZE - 1))
-        # Draw monster eyes
-        eye_color = RED
-        eye_size = GRID_SIZE // 4
-        pygame.draw.rect(screen, eye_color,
-                        (int(monster.x * GRID_SIZE) + eye_size,
-                         int(monster.y * GRID_SIZE) + eye_size,
-                         eye_size, eye_size))
-        pygame.draw.rect(screen, eye_color,
-                        (int(monster.x * GRID_SIZE) + GRID_SIZE - 2*eye_size,
-                         int(monster.y * GRID_SIZE) + eye_size,
-                         eye_size, eye_size))
-
-    # Draw scores and level
-    draw_scores()
-    font = pygame.font.Font(None, 36)
-    level_text = font.render(f'Level: {current_level}', True, WHITE)
-    screen.blit(level_text, (WINDOW_SIZE // 2 - 50, 10))
-
-    # Draw god mode status
-    if snake1.god_mode or snake2.god_mode:
-        god_text = font.render('GOD MODE: ON', True, YELLOW)
-        screen.blit(god_text, (WINDOW_SIZE // 2 - 70, 40))
-
-    # Draw countdown
-    if countdown_timer > 0:
-        countdown_font = pygame.font.Font(None, 74)
-        countdown_text = countdown_font.render(str((countdown_timer // 30) + 1), True, WHITE)
-        screen.blit(countdown_text, (WINDOW_SIZE // 2 - 20, WINDOW_SIZE // 2 - 50))
-        countdown_timer -= 1
-
-    if game_over:
-        font = pygame.font.Font(None, 74)
-        text = font.render('Game Over!', True, RED)
-        restart_text = font.render('Press R to Restart', True, WHITE)
-        screen.blit(text, (WINDOW_SIZE // 4, WINDOW_SIZE // 2))
-        screen.blit(restart_text, (WINDOW_SIZE // 4, WINDOW_SIZE // 2 + 80))
-
-    # Draw help menu if H is pressed
-    if show_help or game_paused:
+            angle = ticks * 0.01
+            end_x = center[0] + math.cos(angle) * cell//2
+            end_y = center[1] + math.sin(angle) * cell//2
+            pygame.draw.line(screen, (200, 0, 200), center, (end_x, end_y), 3)
+        return screen, (pad, pad)
+
+effect_atlas = EffectAtlas()
+
+# Pre-built help overlay and panel, keyed by window size
+_help_cache = {}
+
+def get_help_layers(size):
+    size = tuple(size)
+    layers = _help_cache.get(size)
+    if layers is None:
+        width, height = size
         # Semi-transparent background
-        overlay = pygame.Surface((WINDOW_SIZE, WINDOW_SIZE))
+        overlay = pygame.Surface(size)
         overlay.fill((0, 0, 0))
         overlay.set_alpha(230)  # Increased darkness to 90%
-        screen.blit(overlay, (0, 0))
 
-        help_surface = pygame.Surface((WINDOW_SIZE - 100, WINDOW_SIZE - 100))
+        help_surface = pygame.Surface((width - 100, height - 100))
         help_surface.fill((50, 50, 50))
-        help_font = pygame.font.Font(None, 32)
-
-        help_texts = [
-            "Power-ups Guide:",
-            "Blue Shield: Temporary invincibility",
-            "Yellow Lightning: Speed boost",
-            "Brown Circle: Eat poop without dying",
-            "Purple Square: Place your own turret",
-            "",
-            "Controls:",
-            "Player 1: WASD + E(fart)",
-            "Player 2: Arrows + 1(fart)",
-            "G: Toggle God Mode",
-            "H: Show/Hide Help"
-        ]
-
         y_offset = 20
-        for text in help_texts:
-            text_surface = help_font.render(text, True, WHITE)
-            help_surface.blit(text_surface, (20, y_offset))
+        for text in HELP_TEXTS:
+            help_surface.blit(text_cache.render(text, 32, WHITE), (20, y_offset))
             y_offset += 40
+        if pygame.display.get_surface() is not None:
+            help_surface = help_surface.convert()
+
+        _help_cache.clear()
+        layers = _help_cache[size] = (overlay, help_surface)
+    return layers
+
+def draw_scores(screen, state, touched):
+    if len(state.snakes) == 2:
+        text1 = f'Player 1: {state.snake1.score}'
+        text2 = f'Player 2: {state.snake2.score}'
+        score1 = text_cache.render(text1, 36, GREEN)
+        score2 = text_cache.render(text2, 36, BLUE)
+        touched.append((screen.blit(score1, (10, 10)), text1))
+        touched.append((screen.blit(score2, (WINDOW_SIZE - 150, 10)), text2))
+        return
+    # Party matches list every player down the left edge in their colour
+    for i, snake in enumerate(state.snakes):
+        text = f'P{i + 1}: {snake.score}' + (' x' if snake.death else '')
+        score = text_cache.render(text, 24, snake.color)
+        touched.append((screen.blit(score, (10, 10 + 18 * i)), text))
+
+def draw_power_up(screen, power_up, camera):
+    """Draw the bobbing power-up and return the area it covered."""
+    cell = camera.cell
+    phase = int(pygame.time.get_ticks() * POWER_UP_FRAMES / POWER_UP_CYCLE_MS) % POWER_UP_FRAMES
+    frame, (ax, ay) = effect_atlas.frame(power_up.type, phase, cell)
+    return screen.blit(frame, (power_up.x * cell - camera.x - ax,
+                               power_up.y * cell - camera.y - ay))
+
+def capture_positions(state):
+    """Snake bodies before a tick, as body_array()s, for interpolating the
+    frames after it."""
+    return {snake: body_array(snake.body) for snake in state.snakes}
+
+def draw_world(screen, state, alpha=1.0, prev=None, camera=None, track=True):
+    """Draw everything on top of the background.
+
+    alpha is how far the display is between the previous tick (0) and the
+    current one (1); moving things are drawn in between, with prev holding
+    the snake bodies from capture_positions() before the last step.
+    camera picks the part of the arena to draw; anything outside it is
+    skipped. Without one, the whole standard arena is shown.
+
+    Snakes, poop, turrets, bullets and monsters are pre-rendered tiles, and
+    effects frames from effect_atlas, blitted one layer at a time with the
+    positions worked out by NumPy, so the number of draw calls doesn't grow
+    with the snakes.
+
+    Returns (rect, tag) for every entity drawn. The tag says what was drawn
+    there, so the dirty-rect renderer can tell an unchanged cell from a
+    changed one; None marks animations that change every frame. track=False
+    skips collecting them and returns an empty list.
+    """
+    touched = []
+    touch = touched.append if track else (lambda item: None)
+    calls = 0
+    lag = 1.0 - alpha
+    profiler = state.profiler
+    if camera is None:
+        camera = Camera(screen.get_size())
+        camera.update(state, alpha, prev)
+    cell, ox, oy = camera.cell, camera.x, camera.y
+    offset = np.array([ox, oy])
+    # Visible cells, one more around for things drawn between two cells
+    x0, y0, x1, y1 = camera.visible(state.size)
+    x0, y0, x1, y1 = x0 - 1, y0 - 1, x1 + 1, y1 + 1
+
+    def pixels(cells):
+        # Cells may be fractional; pygame would truncate toward zero too
+        return (cells * cell - offset).astype(np.intp)
+
+    def layer(sprite, positions, tag):
+        nonlocal calls
+        if not len(positions):
+            return
+        rects = blit_layer(screen, sprite, positions, track)
+        calls += 1
+        if track:
+            touched.extend(zip(rects, repeat(tag)))
+
+    # Draw poop spots
+    with profiler.scope('draw_poop'):
+        cells = poop_array(state.poop)
+        layer(get_sprite('tile', BROWN, cell), pixels(cells[in_view(cells, x0, y0, x1, y1)]),
+              BROWN)
+
+    # Draw stink waves and fart effects
+    with profiler.scope('draw_effects'):
+        particles = state.particles
+        live = particles.live()
+        cells = np.column_stack((particles.x[live], particles.y[live]))
+        reach = PARTICLE_REACH
+        visible = in_view(cells, x0 - reach, y0 - reach, x1 + reach, y1 + reach)
+        live = live[visible]
+        # A stink wave's phase is its age, a fart's its ring's radius
+        stink = particles.kind[live] == STINK_PARTICLE
+        phases = np.where(stink, 20 - (particles.lifetime[live] + lag),
+                          particles.radius[live] - 0.5 * lag)
+        frames, anchors = [], []
+        for is_stink, phase in zip(stink.tolist(),
+                                   np.rint(phases * EFFECT_STEPS).astype(int).tolist()):
+            frame, anchor = effect_atlas.frame('stink' if is_stink else 'fart', phase, cell)
+            frames.append(frame)
+            anchors.append(anchor)
+        centers = pixels(cells[visible]) + cell // 2
+        layer(frames, centers - np.array(anchors, dtype=np.intp).reshape(-1, 2), None)
 
-        screen.blit(help_surface, (50, 50))
+    # Draw turrets and bullets
+    with profiler.scope('draw_turrets'):
+        cells = np.array([(turret.x, turret.y) for turret in state.turrets],
+                         dtype=np.intc).reshape(-1, 2)
+        layer(get_sprite('tile', PURPLE, cell), pixels(cells[in_view(cells, x0, y0, x1, y1)]),
+              PURPLE)
+        bullets = state.bullets
+        n = bullets.count
+        cells = np.column_stack((bullets.x[:n] - bullets.dx[:n] * lag,
+                                 bullets.y[:n] - bullets.dy[:n] * lag))
+        layer(get_sprite('bullet', YELLOW, cell), pixels(cells[in_view(cells, x0, y0, x1, y1)]),
+              YELLOW)
+
+    # Draw food (none while the board is full)
+    with profiler.scope('draw_pickups'):
+        food = state.food
+        if food and x0 <= food[0] < x1 and y0 <= food[1] < y1:
+            touch((screen.blit(get_sprite('tile', RED, cell),
+                               (food[0] * cell - ox, food[1] * cell - oy)), RED))
+            calls += 1
+
+        # Draw Power-up with animation
+        power_up = state.power_up
+        if power_up and x0 <= power_up.x < x1 and y0 <= power_up.y < y1:
+            touch((draw_power_up(screen, power_up, camera), None))
+            calls += 1
+
+    # Draw snakes, all in one layer with a sprite per segment
+    with profiler.scope('draw_snakes'):
+        parts, steps, sprites, colors = [], [], [], []
+        for snake in state.snakes:
+            cells = body_array(snake.body)
+            if not len(cells):
+                continue
+            parts.append(cells)
+            step = np.zeros(cells.shape)
+            before = prev.get(snake) if prev and lag else None
+            if before is not None and len(before):
+                m = min(len(before), len(cells))
+                step[:m] = cells[:m] - before[:m]
+                # Segments that wrapped around the board jump instead
+                step[(np.abs(step) > 2).any(axis=1)] = 0
+            steps.append(step)
+            sprites += [get_sprite('tile', snake.color, cell)] * len(cells)
+            colors += [snake.color] * len(cells)
+        if parts:
+            cells = np.concatenate(parts)
+            visible = in_view(cells, x0, y0, x1, y1)
+            positions = pixels(cells[visible] - np.concatenate(steps)[visible] * lag)
+            if not visible.all():
+                keep = np.flatnonzero(visible).tolist()
+                sprites = [sprites[i] for i in keep]
+                colors = [colors[i] for i in keep]
+            rects = blit_layer(screen, sprites, positions, track)
+            calls += 1
+            if track:
+                touched.extend(zip(rects, colors))
+
+    # Draw poop monsters
+    with profiler.scope('draw_monsters'):
+        cells = np.array([(monster.x - monster.heading[0] * monster.speed * lag,
+                           monster.y - monster.heading[1] * monster.speed * lag)
+                          for monster in state.poop_monsters
+                          if x0 <= monster.x < x1 and y0 <= monster.y < y1]).reshape(-1, 2)
+        # Monsters snap to whole pixels before the camera offset
+        layer(get_sprite('monster', BROWN, cell),
+              (cells * cell).astype(np.intp) - offset, 'monster')
 
-    pygame.display.flip()
-    clock.tick(10)
+    # Draw scores and level
+    with profiler.scope('draw_text'):
+        text = []
+        draw_scores(screen, state, text)
+        level = f'Level: {state.current_level}'
+        level_text = text_cache.render(level, 36, WHITE)
+        text.append((screen.blit(level_text, (WINDOW_SIZE // 2 - 50, 10)), level))
+
+        # Draw god mode status
+        if any(snake.god_mode for snake in state.snakes):
+            god_text = text_cache.render('GOD MODE: ON', 36, YELLOW)
+            text.append((screen.blit(god_text, (WINDOW_SIZE // 2 - 70, 40)), 'GOD MODE: ON'))
+
+        # Draw countdown
+        if state.countdown_timer > 0:
+            countdown = str((state.countdown_timer // 30) + 1)
+            countdown_text = text_cache.render(countdown, 74, WHITE)
+            text.append((screen.blit(countdown_text, (WINDOW_SIZE // 2 - 20, WINDOW_SIZE // 2 - 50)), countdown))
+        calls += len(text)
+        if track:
+            touched += text
+
+    profiler.count('draw_calls', calls)
+    return touched
+
+def draw_game_over(screen):
+    text = text_cache.render('Game Over!', 74, RED)
+    restart_text = text_cache.render('Press R to Restart', 74, WHITE)
+    screen.blit(text, (WINDOW_SIZE // 4, WINDOW_SIZE // 2))
+    screen.blit(restart_text, (WINDOW_SIZE // 4, WINDOW_SIZE // 2 + 80))
+
+def draw_game(screen, state, alpha=1.0, prev=None, camera=None):
+    if camera is None:
+        camera = Camera(screen.get_size())
+        camera.update(state, alpha, prev)
+    # Static checkerboard and walls in a single blit
+    with state.profiler.scope('draw_background'):
+        screen.blit(get_view_background(screen.get_size(), camera, state.size), (0, 0))
+    draw_world(screen, state, alpha, prev, camera, track=False)
+    if state.game_over:
+        draw_game_over(screen)
+
+def draw_help(screen):
+    overlay, help_surface = get_help_layers(screen.get_size())
+    screen.blit(overlay, (0, 0))
+    screen.blit(help_surface, (50, 50))
+
+# Profiler overlay text, rebuilt every PROFILE_REFRESH frames so numbers
+# that change each frame don't flood the text cache
+PROFILE_REFRESH = 15
+_profile_overlay = {'frame': None, 'lines': [], 'histogram': []}
+
+def count_entities(profiler, state):
+    """Set the per-frame entity counters shown next to the phase timings."""
+    if not profiler.enabled:
+        return
+    profiler.count('bullets', state.bullets.count)
+    profiler.count('particles', len(state.particles))
+    profiler.count('poop', len(state.poop))
+    profiler.count('monsters', len(state.poop_monsters))
+    profiler.count('turrets', len(state.turrets))
+    for i, snake in enumerate(state.snakes):
+        profiler.count(f'length{i + 1}', len(snake.body))
+
+def draw_profiler(screen, profiler):
+    """Draw frame times, the slowest phases, counters and the frame-time
+    histogram in a panel; returns the area covered."""
+    overlay = _profile_overlay
+    if overlay['frame'] is None or profiler.frames - overlay['frame'] >= PROFILE_REFRESH:
+        summary = profiler.summary()
+        frame = summary['frame']
+        lines = [f"frame p50 {frame['p50']:.1f}  p99 {frame['p99']:.1f}  max {frame['max']:.1f} ms"]
+        phases = sorted(summary['phases'].items(), key=lambda item: -item[1]['mean'])
+        lines += [f"{name}: {stats['mean']:.2f} avg  {stats['max']:.2f} max"
+                  for name, stats in phases[:10]]
+        counters = [f'{name} {value}' for name, value in summary['counters'].items()]
+        lines += ['  '.join(counters[i:i + 4]) for i in range(0, len(counters), 4)]
+        overlay.update(frame=profiler.frames, lines=lines,
+                       histogram=list(summary['histogram'].values()))
+
+    line_height = 18
+    width, bars = 320, 40
+    height = len(overlay['lines']) * line_height + bars + 15
+    rect = pygame.draw.rect(screen, BLACK, (10, 80, width, height))
+    for i, line in enumerate(overlay['lines']):
+        screen.blit(text_cache.render(line, 20, WHITE), (15, 85 + i * line_height))
+    counts = overlay['histogram']
+    peak = max(counts, default=0) or 1
+    bar_width = (width - 10) // max(len(counts), 1)
+    bottom = 80 + height - 5
+    for i, count in enumerate(counts):
+        bar = bars * count // peak
+        # Buckets of frames too slow for 30 FPS in red
+        color = GREEN if i < 3 else YELLOW if i < 4 else RED
+        pygame.draw.rect(screen, color, (15 + i * bar_width, bottom - bar, bar_width - 2, bar))
+    return rect
+
+def changed_rects(before, after):
+    """Rects from two draw_world() results whose content differs."""
+    old = {(tuple(rect), tag) for rect, tag in before}
+    new = {(tuple(rect), tag) for rect, tag in after}
+    dirty = [rect for rect, tag in after if tag is None or (tuple(rect), tag) not in old]
+    dirty += [rect for rect, tag in before if tag is None or (tuple(rect), tag) not in new]
+    return dirty
+
+class FlipRenderer:
+    """Redraws the whole window and flips it every frame."""
+
+    def __init__(self, screen, camera=None):
+        self.screen = screen
+        self.camera = camera or Camera(screen.get_size())
+
+    def render(self, state, show_help=False, alpha=1.0, prev=None, show_profile=False):
+        self.camera.update(state, alpha, prev)
+        draw_game(self.screen, state, alpha, prev, self.camera)
+        if show_help:
+            draw_help(self.screen)
+        if show_profile:
+            draw_profiler(self.screen, state.profiler)
+        with state.profiler.scope('present'):
+            pygame.display.flip()
+
+class DirtyRectRenderer:
+    """Pushes only the parts of the window that changed since the last frame.
+
+    The areas drawn last frame are restored from the cached background, the
+    world is drawn again and pygame.display.update() gets just the rects
+    whose content differs. Help and game-over overlays cover the window, so
+    those frames and the first one after them fall back to a full flip, as
+    do frames where the camera moved.
+    """
+
+    def __init__(self, screen, camera=None):
+        self.screen = screen
+        self.camera = camera or Camera(screen.get_size())
+        self.last = []
+        self.last_view = None
+        self.full_redraw = True
+
+    def render(self, state, show_help=False, alpha=1.0, prev=None, show_profile=False):
+        screen, camera = self.screen, self.camera
+        profiler = state.profiler
+        camera.update(state, alpha, prev)
+        background = get_view_background(screen.get_size(), camera, state.size)
+        overlay = show_help or state.game_over
+        moved = camera.key() != self.last_view
+        self.last_view = camera.key()
+        if overlay or self.full_redraw or moved:
+            with profiler.scope('draw_background'):
+                screen.blit(background, (0, 0))
+            touched = draw_world(screen, state, alpha, prev, camera)
+            if state.game_over:
+                draw_game_over(screen)
+            if show_help:
+                draw_help(screen)
+            if show_profile:
+                touched.append((draw_profiler(screen, profiler), None))
+            with profiler.scope('present'):
+                pygame.display.flip()
+            self.full_redraw = overlay
+            self.last = touched
+            return
+
+        with profiler.scope('draw_background'):
+            for rect, _ in self.last:
+                screen.blit(background, rect, rect)
+        touched = draw_world(screen, state, alpha, prev, camera)
+        # The overlay changes every frame, like the animations
+        if show_profile:
+            touched.append((draw_profiler(screen, profiler), None))
+        with profiler.scope('present'):
+            pygame.display.update(changed_rects(self.last, touched))
+        self.last = touched
+
+def play_online(args, screen, clock, renderer, profiler):
+    """Play on a netplay server: keys go to the server as this client's
+    actions, and the window shows the snapshots that come back."""
+    host, _, port = args.connect.rpartition(':')
+    client = NetClient(host or 'localhost', int(port), args.match)
+    pygame.display.set_caption(f'Snake Battle - {args.match}, player {client.player + 1}')
+    state = RemoteState(client.size, client.players, profiler)
+    tick_time = 1.0 / client.tick_rate
+    show_profile = args.profile
+    show_help = False
+    prev = None
+    received = frame_start = time.perf_counter()
+
+    while not client.closed:
+        for event in pygame.event.get():
+            if event.type == QUIT:
+                client.close()
+                break
+            elif event.type == KEYDOWN:
+                if state.game_over and event.key == K_r:
+                    client.send([RESTART])
+                elif event.key == K_h:
+                    show_help = not show_help
+                elif event.key == K_F3:
+                    show_profile = not show_profile
+                    profiler.enabled = show_profile or bool(args.profile_log)
+                elif event.key in KEY_BINDINGS:
+                    # Either set of keys steers this client's own snake
+                    _, action = KEY_BINDINGS[event.key]
+                    if action != GOD_MODE:
+                        client.send([action])
+
+        with profiler.scope('network'):
+            snapshot = client.poll()
+        now = time.perf_counter()
+        if snapshot:
+            prev = capture_positions(state)
+            state.apply(snapshot)
+            received = now
+
+        # Moving things glide from the last snapshot towards the newest one
+        alpha = min((now - received) / tick_time, 1.0)
+        count_entities(profiler, state)
+        renderer.render(state, show_help, alpha, prev, show_profile)
+        with profiler.scope('idle'):
+            clock.tick(args.fps)
+        now = time.perf_counter()
+        profiler.end_frame(now - frame_start)
+        frame_start = now
+
+    if args.profile_log:
+        profiler.export()
+    pygame.quit()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Snake Battle')
+    parser.add_argument('--dirty-rects', action='store_true',
+                        help='only push changed regions to the display '
+                             '(faster on software-rendered SDL)')
+    parser.add_argument('--tick-rate', type=float, default=10,
+                        help='game ticks per second (default: 10)')
+    parser.add_argument('--fps', type=int, default=60,
+                        help='frame rate cap for drawing (default: 60)')
+    parser.add_argument('--vsync', action='store_true',
+                        help='sync frames to the display refresh')
+    parser.add_argument('--seed', type=int,
+                        help='random seed, to play the same match again')
+    parser.add_argument('--record', metavar='PATH',
+                        help='write an input log for replay.py')
+    parser.add_argument('--players', type=int, default=2,
+                        help=f'snakes in the match, 2 to {MAX_PLAYERS}; players past the '
+                             f'second are played by the computer (default: 2)')
+    parser.add_argument('--ai', type=int, action='append', default=[], metavar='PLAYER',
+                        help='let the computer play this snake (repeatable)')
+    parser.add_argument('--arena', type=int, default=GRID_COUNT,
+                        help=f'arena width and height in cells (default: {GRID_COUNT})')
+    parser.add_argument('--camera', default='fit', metavar='fit|PLAYER',
+                        help='follow one snake, or zoom to fit them all (default: fit)')
+    parser.add_argument('--connect', metavar='HOST:PORT',
+                        help='play on a netplay.py server; the server picks the rules')
+    parser.add_argument('--match', default='default',
+                        help='name of the online match to join (default: default)')
+    parser.add_argument('--profile', action='store_true',
+                        help='time update and render phases and show the overlay (F3 toggles it)')
+    parser.add_argument('--profile-log', metavar='PATH',
+                        help='append profiler summaries to PATH (.csv, otherwise JSON lines)')
+    parser.add_argument('--profile-interval', type=float, default=5.0,
+                        help='seconds between profiler log entries (default: 5)')
+    args = parser.parse_args(argv)
+    if args.arena < 12:
+        parser.error('--arena needs at least 12 cells')
+    if not 2 <= args.players <= MAX_PLAYERS:
+        parser.error(f'--players must be between 2 and {MAX_PLAYERS}')
+    if any(not 1 <= player <= args.players for player in args.ai):
+        parser.error(f'--ai takes a player from 1 to {args.players}')
+    if args.camera != 'fit' and args.camera not in map(str, range(1, args.players + 1)):
+        parser.error(f'--camera takes fit or a player from 1 to {args.players}')
+
+    # Initialize Pygame
+    pygame.init()
+    if args.vsync:
+        screen = pygame.display.set_mode((WINDOW_SIZE, WINDOW_SIZE), SCALED, vsync=1)
+    else:
+        screen = pygame.display.set_mode((WINDOW_SIZE, WINDOW_SIZE))
+    pygame.display.set_caption('Snake Battle')
+    clock = pygame.time.Clock()
+    camera = Camera(screen.get_size(), None if args.camera == 'fit' else int(args.camera) - 1)
+    renderer = (DirtyRectRenderer if args.dirty_rects else FlipRenderer)(screen, camera)
+
+    profiler = Profiler(enabled=args.profile or bool(args.profile_log),
+                        export_path=args.profile_log, export_interval=args.profile_interval)
+    if args.connect:
+        return play_online(args, screen, clock, renderer, profiler)
+    show_profile = args.profile
+    state = GameState(args.seed, profiler=profiler, size=args.arena, players=args.players)
+    recorder = (Recorder(open(args.record, 'wb'), state.seed, state.size, args.players)
+                if args.record else None)
+    game_paused = False #added for pause functionality
+    # Only two players have keys; the rest of a party is always computer-played
+    computer = set(args.ai) | set(range(3, args.players + 1))
+    bots = [SnakeAI(player - 1, state.size) for player in sorted(computer)]
+
+    # Fixed-timestep loop: the game advances in whole ticks of tick_time
+    # seconds while frames are drawn as often as the display allows,
+    # interpolated between the last two ticks
+    tick_time = 1.0 / args.tick_rate
+    accumulator = 0.0
+    last_time = time.perf_counter()
+    inputs = []
+    prev = None
+    frame_start = last_time
+
+    while True:
+        for event in pygame.event.get():
+            if event.type == QUIT:
+                if recorder:
+                    recorder.close(state.tick)
+                    recorder.stream.close()
+                if args.profile_log:
+                    profiler.export()
+                pygame.quit()
+                return
+            elif event.type == KEYDOWN:
+                if state.game_over and event.key == K_r:
+                    inputs.append((0, RESTART))
+                    continue
+                if event.key == K_h: #toggle help menu
+                    game_paused = not game_paused
+                elif event.key == K_F3:
+                    show_profile = not show_profile
+                    # Timings start with the overlay and keep going for the log
+                    profiler.enabled = show_profile or bool(args.profile_log)
+                elif event.key in KEY_BINDINGS and not game_paused:
+                    inputs.append(KEY_BINDINGS[event.key])
+
+        # Check for help menu
+        show_help = pygame.key.get_pressed()[K_h]
+
+        now = time.perf_counter()
+        # Don't try to catch up on more than a few ticks after a stall
+        accumulator = min(accumulator + now - last_time, 5 * tick_time)
+        last_time = now
+        while accumulator >= tick_time:
+            accumulator -= tick_time
+            if not game_paused:
+                prev = capture_positions(state)
+                with profiler.scope('ai'):
+                    for bot in bots:
+                        action = bot.decide(state)
+                        if action is not None:
+                            inputs.append((bot.player, action))
+                if recorder:
+                    recorder.record(state.tick, inputs)
+                state.step(inputs)
+                inputs = []
+
+        # Draw everything, with the help menu if H is pressed
+        alpha = 1.0 if game_paused else accumulator / tick_time
+        count_entities(profiler, state)
+        renderer.render(state, show_help or game_paused, alpha, prev, show_profile)
+        with profiler.scope('idle'):
+            clock.tick(args.fps)
+        now = time.perf_counter()
+        profiler.end_frame(now - frame_start)
+        frame_start = now
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,859 @@
+"""Online matches: an authoritative asyncio server and a socket client.
+
+The server runs the rules for any number of matches in one process. Each
+match ticks at a fixed rate once its human player slots are filled and
+sends every client a snapshot after each tick. Clients only send their
+inputs, together with the tick of the newest snapshot they have, and draw
+what the snapshots say.
+
+Messages are length-prefixed little-endian binary, never pickles. A
+snapshot is either a keyframe or a delta against the tick the client
+acknowledged last:
+
+- snake bodies send only the cells added at the head and how many cells
+  left at the tail;
+- bullets send the indices of the ones that went away, the ones fired
+  since and how many times they moved; the client moves the rest along
+  their velocity itself;
+- poop sends only the cells added, until a level change clears it;
+- particles send only the new ones, which the client ages itself;
+- turrets are sent when they change; monsters, food, power-up and scores
+  every time.
+
+SnapshotEncoder and SnapshotDecoder do no I/O, so they can be tested and
+reused on their own. RemoteState rebuilds a GameState look-alike from
+snapshots that game.py's renderer draws unchanged.
+
+    python netplay.py --port 5555 --players 4 --bots 2
+    python game.py --connect localhost:5555 --match friday
+"""
+import argparse
+import asyncio
+import socket
+import struct
+import time
+from itertools import islice, repeat
+
+import numpy as np
+
+from ai import SnakeAI
+from engine import (GameState, BulletPool, ParticleSystem, PoopIndex, PoopSpot, PoopMonster,
+                    PowerUp, Turret, GRID_COUNT, MAX_PLAYERS, PLAYER_COLORS, BOOST_MOVES,
+                    DEATHS, UP, DOWN, LEFT, RIGHT, FART, RESTART)
+from profiler import Profiler
+
+PROTOCOL = 1
+
+# Message header: payload length, then kind
+MESSAGE = struct.Struct('<IB')
+HELLO, WELCOME, INPUT, SNAPSHOT, ERROR = range(1, 6)
+MAX_MESSAGE = 1 << 24
+
+# HELLO: protocol and wanted player (ANY_PLAYER for the first free slot),
+# followed by the match name in UTF-8
+HELLO_HEADER = struct.Struct('<HB')
+ANY_PLAYER = 255
+# WELCOME: player, players, arena size, ticks per second
+WELCOME_HEADER = struct.Struct('<BBHf')
+# INPUT: newest snapshot tick the client holds, followed by one byte per action
+ACK = struct.Struct('<I')
+NO_TICK = 0xFFFFFFFF
+
+# Actions a remote player may send; god mode stays a local cheat
+REMOTE_ACTIONS = frozenset((UP, DOWN, LEFT, RIGHT, FART, RESTART))
+
+# Snapshot layout
+SNAP_HEADER = struct.Struct('<IIBHHB')  # tick, base tick, flags, level, countdown, players
+GAME_OVER = 1
+NEW_ROUND = 2
+CELL = struct.Struct('<HH')
+NO_CELL = 0xFFFF
+POWER = struct.Struct('<HHB')  # x, y, type (0 for none)
+SNAKE = struct.Struct('<IBBB')  # score, death, status flags, body mode
+BODY_DELTA, BODY_FULL = 0, 1
+BODY_MOVES = struct.Struct('<II')  # cells added at the head, cells dropped at the tail
+COUNT = struct.Struct('<I')
+SMALL_COUNT = struct.Struct('<H')
+FLAG = struct.Struct('<B')
+BULLETS = struct.Struct('<HHH')  # removed, new, updates since the base
+MONSTER = struct.Struct('<HHB')  # x and y in half cells, heading
+PARTICLE = np.dtype([('kind', 'u1'), ('lifetime', 'u1'),
+                     ('x', '<f4'), ('y', '<f4'), ('radius', '<f4')])
+
+DEATH_CODES = {death: code for code, death in enumerate(DEATHS)}
+GOD, SHIELDED, BOOSTED, POOP_EATING = 1, 2, 4, 8
+
+# Ticks of snapshots kept to serve as delta bases
+HISTORY = 64
+# Snapshots to a client are skipped while this many bytes are still queued
+SEND_BUFFER_LIMIT = 256 * 1024
+
+
+def _pack_cells(cells):
+    flat = [v for cell in cells for v in cell]
+    return struct.pack(f'<{len(flat)}H', *flat)
+
+
+def _unpack_cells(data, offset, n):
+    flat = struct.unpack_from(f'<{2 * n}H', data, offset)
+    return list(zip(flat[::2], flat[1::2])), offset + 4 * n
+
+
+def _status(snake):
+    return ((GOD if snake.god_mode else 0) | (SHIELDED if snake.shield else 0) |
+            (BOOSTED if snake.speed_boost else 0) | (POOP_EATING if snake.poop_eater else 0))
+
+
+class _Record:
+    """What a snapshot at one tick contained, as far as deltas need to know."""
+
+    __slots__ = ('tick', 'round', 'snakes', 'bullet_ids', 'next_bullet', 'bullet_steps',
+                 'particle_serial', 'poop', 'turrets')
+
+
+class SnapshotEncoder:
+    """Encodes a running GameState as keyframes or deltas.
+
+    record() must see the state after every tick, so body continuity can be
+    followed from one tick to the next: a snake body that is the same
+    object and whose old head is one of its first few cells has only gained
+    cells at the head and lost some at the tail. Anything else (a new round,
+    a knocked-out snake) starts a new epoch, whose first delta sends the
+    whole body. Records of the last history ticks are kept as delta bases.
+    """
+
+    def __init__(self, history=HISTORY):
+        self.history = history
+        self.records = {}
+        self._epoch = 0
+        self._round = 0
+        self._snake_list = None
+        self._tracks = []
+        self._cache = {}
+
+    def _moves(self, track, body):
+        """Cells pushed at the head since the last record, or None if the
+        body changed some other way."""
+        old_head = track[3]
+        if old_head is None:
+            return 0 if not len(body) else None
+        for k in range(min(len(body), BOOST_MOVES + 1)):
+            if body[k] == old_head:
+                return k
+        return None
+
+    def record(self, state):
+        """Remember the state at its current tick; call after every step()."""
+        if state.snakes is not self._snake_list:
+            self._snake_list = state.snakes
+            self._round += 1
+            self._tracks = [None] * len(state.snakes)
+        snakes = []
+        for i, snake in enumerate(state.snakes):
+            body = snake.body
+            track = self._tracks[i]
+            moves = self._moves(track, body) if track and track[0] is body else None
+            if moves is None:
+                self._epoch += 1
+                track = self._tracks[i] = [body, self._epoch, 0, None]
+            else:
+                track[2] += moves
+            track[3] = body[0] if len(body) else None
+            snakes.append((track[1], track[2], len(body)))
+
+        record = _Record()
+        record.tick = state.tick
+        record.round = self._round
+        record.snakes = snakes
+        pool = state.bullets
+        record.bullet_ids = pool.ids[:pool.count].copy()
+        record.next_bullet = pool.next_id
+        record.bullet_steps = pool.steps
+        record.particle_serial = state.particles.serial
+        record.poop = (state.poop.generation, len(state.poop.cells))
+        record.turrets = tuple((turret.x, turret.y) for turret in state.turrets)
+        self.records[state.tick] = record
+        self.records.pop(state.tick - self.history, None)
+        self._cache.clear()
+
+    def encode(self, state, base_tick=None):
+        """The snapshot of the recorded current tick, as a delta against
+        base_tick when that is still known, otherwise as a keyframe."""
+        base = self.records.get(base_tick) if base_tick is not None else None
+        key = base.tick if base is not None else None
+        data = self._cache.get(key)
+        if data is None:
+            data = self._cache[key] = self._encode(state, self.records[state.tick], base)
+        return data
+
+    def _encode(self, state, current, base):
+        new_round = base is None or base.round != current.round
+        flags = (GAME_OVER if state.game_over else 0) | (NEW_ROUND if new_round else 0)
+        out = [SNAP_HEADER.pack(state.tick, NO_TICK if base is None else base.tick, flags,
+                                state.current_level, max(state.countdown_timer, 0),
+                                len(state.snakes))]
+
+        food = state.food
+        out.append(CELL.pack(*food) if food else CELL.pack(NO_CELL, NO_CELL))
+        power_up = state.power_up
+        out.append(POWER.pack(power_up.x, power_up.y, power_up.type) if power_up
+                   else POWER.pack(0, 0, 0))
+
+        old_snakes = base.snakes if base is not None else repeat(None)
+        for snake, (epoch, pushes, length), old in zip(state.snakes, current.snakes, old_snakes):
+            header = (snake.score, DEATH_CODES[snake.death], _status(snake))
+            body = snake.body
+            if old is not None and old[0] == epoch:
+                added = pushes - old[1]
+                dropped = old[2] + added - length
+                if added <= length and 0 <= dropped <= old[2]:
+                    out.append(SNAKE.pack(*header, BODY_DELTA))
+                    out.append(BODY_MOVES.pack(added, dropped))
+                    out.append(_pack_cells([body[i] for i in range(added)]))
+                    continue
+            out.append(SNAKE.pack(*header, BODY_FULL))
+            out.append(COUNT.pack(length))
+            out.append(_pack_cells(body))
+
+        if base is not None and base.turrets == current.turrets:
+            out.append(FLAG.pack(0))
+        else:
+            out.append(FLAG.pack(1) + SMALL_COUNT.pack(len(current.turrets)))
+            out.append(_pack_cells(current.turrets))
+
+        pool = state.bullets
+        n = pool.count
+        if base is None:
+            removed = np.zeros(0, dtype=np.intp)
+            start = steps = 0
+        else:
+            removed = np.flatnonzero(~np.isin(base.bullet_ids, current.bullet_ids))
+            start = int(np.searchsorted(current.bullet_ids, base.next_bullet))
+            steps = current.bullet_steps - base.bullet_steps
+        out.append(BULLETS.pack(len(removed), n - start, min(steps, 0xFFFF)))
+        out.append(removed.astype('<u2').tobytes())
+        out.append(np.stack([pool.x[start:n], pool.y[start:n],
+                             pool.dx[start:n], pool.dy[start:n]], axis=1).astype('<f4').tobytes())
+
+        generation, keys = current.poop
+        if base is None or base.poop[0] != generation:
+            out.append(FLAG.pack(1))
+            start = 0
+        else:
+            out.append(FLAG.pack(0))
+            start = base.poop[1]
+        cells = list(islice(state.poop.cells, start, keys))
+        out.append(COUNT.pack(len(cells)))
+        out.append(_pack_cells(cells))
+
+        monsters = state.poop_monsters
+        out.append(SMALL_COUNT.pack(len(monsters)))
+        for monster in monsters:
+            hx, hy = monster.heading
+            out.append(MONSTER.pack(round(monster.x * 2), round(monster.y * 2),
+                                    (hx + 1) * 3 + hy + 1))
+
+        particles = state.particles
+        slots = particles.live()
+        if not new_round:
+            slots = slots[particles.born[slots] >= base.particle_serial]
+        packed = np.zeros(len(slots), dtype=PARTICLE)
+        packed['kind'] = particles.kind[slots]
+        packed['lifetime'] = np.clip(particles.lifetime[slots], 0, 255)
+        packed['x'] = particles.x[slots]
+        packed['y'] = particles.y[slots]
+        packed['radius'] = particles.radius[slots]
+        out.append(SMALL_COUNT.pack(len(packed)))
+        out.append(packed.tobytes())
+        return b''.join(out)
+
+
+class Snapshot:
+    """One decoded tick of a match, in plain Python and NumPy values.
+
+    snakes holds (body, score, death, status flags) per player, bullets an
+    (n, 4) array of x, y, dx, dy and particles an (n, 5) array of kind, x,
+    y, radius and lifetime. monsters are (x, y, heading) tuples.
+    """
+
+    __slots__ = ('tick', 'game_over', 'level', 'countdown', 'food', 'power_up', 'snakes',
+                 'turrets', 'bullets', 'poop', 'monsters', 'particles')
+
+
+class SnapshotDecoder:
+    """Rebuilds Snapshots from encoded messages, keeping the last history
+    ticks as bases for the deltas that follow."""
+
+    def __init__(self, history=HISTORY):
+        self.history = history
+        self.snapshots = {}
+
+    def decode(self, data):
+        tick, base_tick, flags, level, countdown, players = SNAP_HEADER.unpack_from(data, 0)
+        offset = SNAP_HEADER.size
+        base = None
+        if base_tick != NO_TICK:
+            base = self.snapshots.get(base_tick)
+            if base is None:
+                raise ValueError(f'snapshot {tick} is a delta against unknown tick {base_tick}')
+        snap = Snapshot()
+        snap.tick = tick
+        snap.game_over = bool(flags & GAME_OVER)
+        snap.level = level
+        snap.countdown = countdown
+
+        x, y = CELL.unpack_from(data, offset)
+        offset += CELL.size
+        snap.food = None if x == NO_CELL else (x, y)
+        x, y, kind = POWER.unpack_from(data, offset)
+        offset += POWER.size
+        snap.power_up = (x, y, kind) if kind else None
+
+        snakes = []
+        old_snakes = base.snakes if base is not None else [None] * players
+        for old in old_snakes:
+            score, death, status, mode = SNAKE.unpack_from(data, offset)
+            offset += SNAKE.size
+            if mode == BODY_DELTA:
+                added, dropped = BODY_MOVES.unpack_from(data, offset)
+                heads, offset = _unpack_cells(data, offset + BODY_MOVES.size, added)
+                old_body = old[0]
+                body = heads + old_body[:len(old_body) - dropped]
+            else:
+                length, = COUNT.unpack_from(data, offset)
+                body, offset = _unpack_cells(data, offset + COUNT.size, length)
+            snakes.append((body, score, DEATHS[death], status))
+        snap.snakes = snakes
+        return self._decode_rest(snap, data, offset, base, flags)
+
+    def _decode_rest(self, snap, data, offset, base, flags):
+        changed, = FLAG.unpack_from(data, offset)
+        offset += FLAG.size
+        if changed:
+            n, = SMALL_COUNT.unpack_from(data, offset)
+            snap.turrets, offset = _unpack_cells(data, offset + SMALL_COUNT.size, n)
+        else:
+            snap.turrets = base.turrets
+
+        removed, new, steps = BULLETS.unpack_from(data, offset)
+        offset += BULLETS.size
+        gone = np.frombuffer(data, '<u2', removed, offset)
+        offset += 2 * removed
+        fired = np.frombuffer(data, '<f4', 4 * new, offset).reshape(new, 4).astype(float)
+        offset += 16 * new
+        if base is None:
+            snap.bullets = fired
+        else:
+            # Bullets fly in straight lines, so the rest are where their
+            # velocity took them in the updates since the base tick
+            kept = np.delete(base.bullets, gone, axis=0)
+            kept[:, :2] += kept[:, 2:] * steps
+            snap.bullets = np.concatenate([kept, fired])
+
+        reset, = FLAG.unpack_from(data, offset)
+        n, = COUNT.unpack_from(data, offset + FLAG.size)
+        cells, offset = _unpack_cells(data, offset + FLAG.size + COUNT.size, n)
+        snap.poop = cells if reset else base.poop + cells
+
+        n, = SMALL_COUNT.unpack_from(data, offset)
+        offset += SMALL_COUNT.size
+        monsters = []
+        for _ in range(n):
+            x2, y2, heading = MONSTER.unpack_from(data, offset)
+            offset += MONSTER.size
+            monsters.append((x2 / 2, y2 / 2, (heading // 3 - 1, heading % 3 - 1)))
+        snap.monsters = monsters
+
+        n, = SMALL_COUNT.unpack_from(data, offset)
+        offset += SMALL_COUNT.size
+        packed = np.frombuffer(data, PARTICLE, n, offset)
+        fresh = np.stack([packed['kind'], packed['x'], packed['y'], packed['radius'],
+                          packed['lifetime']], axis=1).astype(float)
+        if flags & NEW_ROUND:
+            snap.particles = fresh
+        else:
+            # Age the base tick's particles the way ParticleSystem.update() does
+            ticks = snap.tick - base.tick
+            aged = base.particles.copy()
+            aged[:, 3] += 0.5 * ticks
+            aged[:, 4] -= ticks
+            snap.particles = np.concatenate([aged[aged[:, 4] > 0], fresh])
+
+        self.snapshots[snap.tick] = snap
+        self.snapshots.pop(snap.tick - self.history, None)
+        return snap
+
+
+class RemoteSnake:
+    """What a client knows about one snake."""
+
+    def __init__(self, color):
+        self.color = color
+        self.body = []
+        self.score = 0
+        self.death = None
+        self.god_mode = False
+        self.shield = 0
+        self.speed_boost = 0
+        self.poop_eater = 0
+
+
+class RemoteState:
+    """The parts of a GameState that game.py draws, filled from snapshots.
+
+    The snake objects stay the same from one snapshot to the next, so
+    game.capture_positions() can interpolate between them.
+    """
+
+    def __init__(self, size=GRID_COUNT, players=2, profiler=None):
+        self.size = size
+        self.players = players
+        self.profiler = profiler if profiler is not None else Profiler()
+        self.snakes = [RemoteSnake(PLAYER_COLORS[i]) for i in range(players)]
+        self.tick = 0
+        self.current_level = 1
+        self.countdown_timer = 0
+        self.game_over = False
+        self.food = None
+        self.power_up = None
+        self.turrets = []
+        self.bullets = BulletPool(size)
+        self.particles = ParticleSystem()
+        self.poop = PoopIndex()
+        self.poop_monsters = []
+        self._turret_cells = None
+
+    @property
+    def snake1(self):
+        return self.snakes[0]
+
+    @property
+    def snake2(self):
+        return self.snakes[1]
+
+    def apply(self, snap):
+        self.tick = snap.tick
+        self.current_level = snap.level
+        self.countdown_timer = snap.countdown
+        self.game_over = snap.game_over
+        self.food = snap.food
+        self.power_up = PowerUp(*snap.power_up) if snap.power_up else None
+        for snake, (body, score, death, status) in zip(self.snakes, snap.snakes):
+            snake.body = body
+            snake.score = score
+            snake.death = death
+            snake.god_mode = bool(status & GOD)
+            snake.shield = int(bool(status & SHIELDED))
+            snake.speed_boost = int(bool(status & BOOSTED))
+            snake.poop_eater = int(bool(status & POOP_EATING))
+
+        if snap.turrets is not self._turret_cells:
+            self._turret_cells = snap.turrets
+            self.turrets = [Turret(x, y, self.bullets, i) for i, (x, y) in enumerate(snap.turrets)]
+        self.bullets.clear()
+        for x, y, dx, dy in snap.bullets.tolist():
+            self.bullets.spawn(x, y, dx, dy, 0)
+        self.particles.clear()
+        for kind, x, y, radius, lifetime in snap.particles.tolist():
+            self.particles.spawn(int(kind), x, y, radius, int(lifetime))
+        self.poop.clear()
+        for x, y in snap.poop:
+            self.poop.add(PoopSpot(x, y), None)
+        monsters = []
+        for x, y, heading in snap.monsters:
+            monster = PoopMonster(x, y, None)
+            monster.heading = heading
+            monsters.append(monster)
+        self.poop_monsters = monsters
+
+
+class _Client:
+    """A connected player and what has been sent to it."""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.player = None
+        self.ack = None
+        self.joined = time.perf_counter()
+        self.bytes_sent = 0
+        self.snapshots = 0
+        self.keyframes = 0
+        self.skipped = 0
+
+    def send(self, kind, payload):
+        message = MESSAGE.pack(len(payload), kind) + payload
+        self.writer.write(message)
+        self.bytes_sent += len(message)
+
+    def stats(self):
+        elapsed = max(time.perf_counter() - self.joined, 1e-9)
+        return {
+            'player': self.player + 1,
+            'bytes': self.bytes_sent,
+            'kbps': self.bytes_sent * 8 / 1000 / elapsed,
+            'snapshots': self.snapshots,
+            'keyframes': self.keyframes,
+            'skipped': self.skipped,
+            'bytes_per_snapshot': self.bytes_sent / self.snapshots if self.snapshots else 0.0,
+        }
+
+
+class Match:
+    """One authoritative game and the clients playing it.
+
+    The last bots player slots are played by SnakeAI on the server; the
+    rest wait for clients. The match profiler times the engine phases plus
+    the bots, encode and send phases of every tick.
+    """
+
+    def __init__(self, name, players=2, size=GRID_COUNT, seed=None, bots=0, history=HISTORY):
+        if not 0 <= bots < players:
+            raise ValueError(f'a match of {players} needs at least one human player')
+        self.name = name
+        self.profiler = Profiler(enabled=True)
+        self.state = GameState(seed, profiler=self.profiler, size=size, players=players)
+        self.encoder = SnapshotEncoder(history)
+        self.encoder.record(self.state)
+        self.humans = players - bots
+        self.clients = [None] * self.humans
+        self.bots = [SnakeAI(player, size) for player in range(self.humans, players)]
+        self.inputs = []
+        self.task = None
+
+    @property
+    def ready(self):
+        return all(self.clients)
+
+    @property
+    def empty(self):
+        return not any(self.clients)
+
+    def join(self, client, player=None):
+        """Seat the client, in the given slot or the first free one."""
+        if player is None:
+            player = next((i for i, seated in enumerate(self.clients) if seated is None), None)
+        if player is None or not 0 <= player < self.humans or self.clients[player]:
+            return False
+        self.clients[player] = client
+        client.player = player
+        return True
+
+    def leave(self, client):
+        if client.player is not None and self.clients[client.player] is client:
+            self.clients[client.player] = None
+
+    def push_input(self, player, action):
+        if action in REMOTE_ACTIONS:
+            self.inputs.append((player, action))
+
+    def tick(self):
+        profiler = self.profiler
+        start = time.perf_counter()
+        with profiler.scope('bots'):
+            for bot in self.bots:
+                action = bot.decide(self.state)
+                if action is not None:
+                    self.inputs.append((bot.player, action))
+        self.state.step(self.inputs)
+        self.inputs = []
+        with profiler.scope('encode'):
+            self.encoder.record(self.state)
+        for client in self.clients:
+            if client:
+                self.send_snapshot(client)
+        profiler.end_frame(time.perf_counter() - start)
+
+    def send_snapshot(self, client):
+        transport = client.writer.transport
+        if transport is not None and transport.get_write_buffer_size() > SEND_BUFFER_LIMIT:
+            # A slow client catches up from its last acknowledged tick later
+            client.skipped += 1
+            return
+        with self.profiler.scope('encode'):
+            base = client.ack if client.ack in self.encoder.records else None
+            data = self.encoder.encode(self.state, base)
+        with self.profiler.scope('send'):
+            client.send(SNAPSHOT, data)
+        client.snapshots += 1
+        if base is None:
+            client.keyframes += 1
+
+    def stats(self):
+        summary = self.profiler.summary()
+        return {
+            'tick': self.state.tick,
+            'players': self.state.players,
+            'tick_ms': summary['frame'],
+            'phases_ms': {name: stats['mean'] for name, stats in summary['phases'].items()},
+            'clients': [client.stats() for client in self.clients if client],
+        }
+
+
+async def _read_message(reader):
+    length, kind = MESSAGE.unpack(await reader.readexactly(MESSAGE.size))
+    if length > MAX_MESSAGE:
+        raise ConnectionError(f'message of {length} bytes is too large')
+    return kind, await reader.readexactly(length)
+
+
+class Server:
+    """Hosts matches by name; a client joining an unknown name starts one
+    with the server's settings."""
+
+    def __init__(self, players=2, size=GRID_COUNT, tick_rate=10.0, bots=0, history=HISTORY):
+        self.players = players
+        self.size = size
+        self.tick_rate = tick_rate
+        self.bots = bots
+        self.history = history
+        self.matches = {}
+        self.server = None
+        self.port = None
+        self._writers = set()
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Start listening; returns the port, which port=0 lets the OS pick."""
+        self.server = await asyncio.start_server(self._handle, host, port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def close(self):
+        for match in self.matches.values():
+            if match.task:
+                match.task.cancel()
+        for writer in list(self._writers):
+            writer.close()
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+    def match(self, name):
+        match = self.matches.get(name)
+        if match is None:
+            match = self.matches[name] = Match(name, self.players, self.size,
+                                               bots=self.bots, history=self.history)
+        return match
+
+    async def _handle(self, reader, writer):
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._writers.add(writer)
+        client = _Client(writer)
+        match = None
+        try:
+            kind, payload = await _read_message(reader)
+            if kind != HELLO:
+                return
+            protocol, wanted = HELLO_HEADER.unpack_from(payload)
+            if protocol != PROTOCOL:
+                client.send(ERROR, f'protocol {protocol} is not supported'.encode())
+                return
+            name = payload[HELLO_HEADER.size:].decode('utf-8', 'replace') or 'default'
+            candidate = self.match(name)
+            if not candidate.join(client, None if wanted == ANY_PLAYER else wanted):
+                client.send(ERROR, f'match {name} is full'.encode())
+                if candidate.empty and candidate.task is None:
+                    del self.matches[name]
+                return
+            match = candidate
+            client.send(WELCOME, WELCOME_HEADER.pack(client.player, match.state.players,
+                                                     match.state.size, self.tick_rate))
+            match.send_snapshot(client)
+            if match.ready and match.task is None:
+                match.task = asyncio.create_task(self._run(match))
+
+            while True:
+                kind, payload = await _read_message(reader)
+                if kind != INPUT:
+                    continue
+                ack, = ACK.unpack_from(payload)
+                if ack != NO_TICK:
+                    client.ack = ack
+                for action in payload[ACK.size:]:
+                    match.push_input(client.player, action)
+        except (asyncio.IncompleteReadError, ConnectionError, struct.error):
+            pass
+        finally:
+            self._writers.discard(writer)
+            if match is not None:
+                match.leave(client)
+                if match.empty:
+                    if match.task:
+                        match.task.cancel()
+                    if self.matches.get(match.name) is match:
+                        del self.matches[match.name]
+            writer.close()
+
+    async def _run(self, match):
+        """Tick the match at the server's rate; a late tick shifts the
+        schedule instead of being followed by a burst of catch-up ticks."""
+        loop = asyncio.get_running_loop()
+        interval = 1.0 / self.tick_rate
+        deadline = loop.time()
+        while True:
+            match.tick()
+            deadline += interval
+            delay = deadline - loop.time()
+            if delay < 0:
+                deadline -= delay
+            await asyncio.sleep(max(delay, 0))
+
+    def report(self):
+        """Per-match tick cost and per-client bandwidth."""
+        return {name: match.stats() for name, match in self.matches.items()}
+
+
+def format_report(report, tick_rate):
+    lines = []
+    budget = 1000.0 / tick_rate
+    load = sum(stats['tick_ms']['mean'] for stats in report.values()) / budget
+    lines.append(f'{len(report)} matches, {load:.1%} of one core')
+    for name, stats in report.items():
+        tick = stats['tick_ms']
+        phases = ', '.join(f'{phase} {ms:.3f}' for phase, ms in
+                           sorted(stats['phases_ms'].items(), key=lambda item: -item[1])[:4])
+        lines.append(f'  {name}: tick {stats["tick"]}, mean {tick["mean"]:.3f} ms, '
+                     f'p99 {tick["p99"]:.3f} ms ({phases})')
+        for client in stats['clients']:
+            lines.append(f'    player {client["player"]}: {client["kbps"]:.1f} kbit/s, '
+                         f'{client["bytes_per_snapshot"]:.0f} B/snapshot, '
+                         f'{client["keyframes"]} keyframes, {client["skipped"]} skipped')
+    return lines
+
+
+class NetClient:
+    """A blocking-socket client for game loops that poll once per frame.
+
+    The constructor joins a match and waits for the welcome. poll() then
+    reads whatever arrived without blocking and returns the newest
+    Snapshot, or None; send() forwards actions for this client's snake.
+    Every message to the server acknowledges the newest snapshot, which the
+    next deltas are built against.
+    """
+
+    def __init__(self, host, port, match='default', player=None, timeout=5.0):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.buffer = bytearray()
+        self.closed = False
+        self.bytes_received = 0
+        self.tick = NO_TICK
+        self._send(HELLO, HELLO_HEADER.pack(PROTOCOL, ANY_PLAYER if player is None else player)
+                   + match.encode('utf-8'))
+        kind, payload = self._wait_message()
+        if kind != WELCOME:
+            self.sock.close()
+            raise ConnectionError(payload.decode('utf-8', 'replace'))
+        self.player, self.players, self.size, self.tick_rate = WELCOME_HEADER.unpack(payload)
+        self.sock.setblocking(False)
+        self.decoder = SnapshotDecoder()
+
+    def _send(self, kind, payload):
+        try:
+            self.sock.sendall(MESSAGE.pack(len(payload), kind) + payload)
+        except OSError:
+            self.closed = True
+
+    def _message(self):
+        """Take one complete message off the buffer, or None."""
+        if len(self.buffer) < MESSAGE.size:
+            return None
+        length, kind = MESSAGE.unpack_from(self.buffer)
+        end = MESSAGE.size + length
+        if len(self.buffer) < end:
+            return None
+        payload = bytes(self.buffer[MESSAGE.size:end])
+        del self.buffer[:end]
+        return kind, payload
+
+    def _wait_message(self):
+        while True:
+            message = self._message()
+            if message:
+                return message
+            data = self.sock.recv(65536)
+            if not data:
+                raise ConnectionError('server closed the connection')
+            self.buffer += data
+
+    def poll(self):
+        try:
+            while True:
+                data = self.sock.recv(65536)
+                if not data:
+                    self.closed = True
+                    break
+                self.bytes_received += len(data)
+                self.buffer += data
+        except BlockingIOError:
+            pass
+        except OSError:
+            self.closed = True
+        latest = None
+        while True:
+            message = self._message()
+            if message is None:
+                break
+            kind, payload = message
+            if kind == SNAPSHOT:
+                latest = self.decoder.decode(payload)
+            elif kind == ERROR:
+                self.closed = True
+        if latest is not None:
+            self.tick = latest.tick
+            self._send(INPUT, ACK.pack(self.tick))
+        return latest
+
+    def send(self, actions):
+        self._send(INPUT, ACK.pack(self.tick) + bytes(actions))
+
+    def close(self):
+        self.sock.close()
+        self.closed = True
+
+
+async def serve(args):
+    server = Server(args.players, args.arena, args.tick_rate, args.bots)
+    port = await server.start(args.host, args.port)
+    print(f'serving on {args.host}:{port}')
+    try:
+        while True:
+            await asyncio.sleep(args.report_interval)
+            if server.matches:
+                for line in format_report(server.report(), args.tick_rate):
+                    print(line)
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Host online Snake Battle matches')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=5555)
+    parser.add_argument('--players', type=int, default=2,
+                        help=f'snakes per match, 2 to {MAX_PLAYERS} (default: 2)')
+    parser.add_argument('--bots', type=int, default=0,
+                        help='player slots the server plays itself (default: 0)')
+    parser.add_argument('--arena', type=int, default=GRID_COUNT,
+                        help=f'arena width and height in cells (default: {GRID_COUNT})')
+    parser.add_argument('--tick-rate', type=float, default=10,
+                        help='game ticks per second (default: 10)')
+    parser.add_argument('--report-interval', type=float, default=10,
+                        help='seconds between bandwidth and CPU reports (default: 10)')
+    args = parser.parse_args(argv)
+    if not 2 <= args.players <= MAX_PLAYERS:
+        parser.error(f'--players must be between 2 and {MAX_PLAYERS}')
+    if not 0 <= args.bots < args.players:
+        parser.error('--bots must leave at least one player slot for a client')
+    if args.arena < 12:
+        parser.error('--arena needs at least 12 cells')
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
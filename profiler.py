@@ -0,0 +1,172 @@
+"""Low-overhead timing of the update and render phases.
+
+Code wraps each phase in a named scope:
+
+    with profiler.scope('turrets'):
+        ...
+
+and sets counters such as the number of bullets with count(). end_frame()
+closes a frame. It keeps the last few hundred frame times and per-phase
+totals, and a breakdown of every frame slower than spike_ms. summary()
+turns those into percentiles and a frame-time histogram. export() appends
+the summary to a JSON-lines or CSV log, depending on the file extension.
+Given an export_path, end_frame() exports every export_interval seconds
+on its own.
+
+A disabled profiler hands out one shared no-op scope and ignores counters,
+so leaving the calls in the game loop costs a method call each.
+"""
+import csv
+import json
+import os
+import time
+from collections import deque
+from contextlib import nullcontext
+
+# Upper edges of the frame-time histogram buckets, in milliseconds;
+# a last bucket takes everything slower
+HISTOGRAM_EDGES = (4, 8, 16, 33, 50, 100)
+
+_NO_SCOPE = nullcontext()
+
+
+class _Scope:
+    """Adds the time spent inside a with block to one phase of the frame."""
+
+    __slots__ = ('totals', 'name', 'start')
+
+    def __init__(self, totals, name):
+        self.totals = totals
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        totals = self.totals
+        totals[self.name] = totals.get(self.name, 0.0) + time.perf_counter() - self.start
+
+
+def _stats(samples):
+    """mean, p50, p99 and max of durations in seconds, as milliseconds."""
+    if not samples:
+        return {'mean': 0.0, 'p50': 0.0, 'p99': 0.0, 'max': 0.0}
+    ordered = sorted(samples)
+    n = len(ordered)
+    return {
+        'mean': sum(ordered) / n * 1000,
+        'p50': ordered[n // 2] * 1000,
+        'p99': ordered[min(n - 1, int(0.99 * n))] * 1000,
+        'max': ordered[-1] * 1000,
+    }
+
+
+class Profiler:
+    def __init__(self, enabled=False, window=600, spike_ms=50.0,
+                 export_path=None, export_interval=5.0):
+        self.enabled = enabled
+        self.window = window
+        self.spike_ms = spike_ms
+        self.export_path = export_path
+        self.export_interval = export_interval
+        self.last_export = time.perf_counter()
+        self.frames = 0
+        self.frame_times = deque(maxlen=window)
+        # Per-phase seconds of the frame in progress, and of past frames
+        self.current = {}
+        self.phases = {}
+        self.counters = {}
+        self.spikes = deque(maxlen=20)
+        self._scopes = {}
+
+    def scope(self, name):
+        """A context manager timing one phase; a no-op while disabled."""
+        if not self.enabled:
+            return _NO_SCOPE
+        scope = self._scopes.get(name)
+        if scope is None:
+            scope = self._scopes[name] = _Scope(self.current, name)
+        return scope
+
+    def count(self, name, value):
+        if self.enabled:
+            self.counters[name] = value
+
+    def end_frame(self, seconds):
+        """Close the frame that took the given wall time."""
+        if not self.enabled:
+            return
+        self.frames += 1
+        self.frame_times.append(seconds)
+        current = self.current
+        for name, history in self.phases.items():
+            history.append(current.pop(name, 0.0))
+        for name, spent in current.items():
+            # A phase seen for the first time had zero cost in earlier frames
+            self.phases[name] = deque([spent], maxlen=self.window)
+        if seconds * 1000 >= self.spike_ms:
+            self.spikes.append({
+                'frame': self.frames,
+                'time': time.time(),
+                'frame_ms': seconds * 1000,
+                'phases_ms': {name: history[-1] * 1000 for name, history in self.phases.items()},
+                'counters': dict(self.counters),
+            })
+        current.clear()
+
+        if self.export_path and time.perf_counter() - self.last_export >= self.export_interval:
+            self.export()
+
+    def histogram(self):
+        """(label, frames) for each frame-time bucket over the window."""
+        counts = [0] * (len(HISTOGRAM_EDGES) + 1)
+        for seconds in self.frame_times:
+            ms = seconds * 1000
+            bucket = 0
+            while bucket < len(HISTOGRAM_EDGES) and ms >= HISTOGRAM_EDGES[bucket]:
+                bucket += 1
+            counts[bucket] += 1
+        labels = [f'<{edge}ms' for edge in HISTOGRAM_EDGES] + [f'>={HISTOGRAM_EDGES[-1]}ms']
+        return list(zip(labels, counts))
+
+    def summary(self):
+        return {
+            'time': time.time(),
+            'frames': self.frames,
+            'frame': _stats(self.frame_times),
+            'histogram': dict(self.histogram()),
+            'phases': {name: _stats(history) for name, history in self.phases.items()},
+            'counters': dict(self.counters),
+            'spikes': list(self.spikes),
+        }
+
+    def export(self, path=None):
+        """Append the current summary to a .csv file or a JSON-lines log."""
+        path = path or self.export_path
+        summary = self.summary()
+        if path.endswith('.csv'):
+            row = {'time': summary['time'], 'frames': summary['frames'],
+                   'spikes': len(summary['spikes'])}
+            row.update((f'frame_{key}', value) for key, value in summary['frame'].items())
+            row.update((f'hist_{label}', count) for label, count in summary['histogram'].items())
+            for name, stats in summary['phases'].items():
+                row.update((f'{name}_{key}', value) for key, value in stats.items())
+            row.update((f'count_{name}', value) for name, value in summary['counters'].items())
+            new = not os.path.exists(path) or os.path.getsize(path) == 0
+            with open(path, 'a', newline='') as f:
+                if new:
+                    columns = list(row)
+                else:
+                    with open(path, newline='') as existing:
+                        columns = next(csv.reader(existing))
+                writer = csv.DictWriter(f, columns, restval='', extrasaction='ignore')
+                if new:
+                    writer.writeheader()
+                writer.writerow(row)
+        else:
+            with open(path, 'a') as f:
+                f.write(json.dumps(summary) + '\n')
+        # Each spike is logged once
+        self.spikes.clear()
+        self.last_export = time.perf_counter()
@@ -0,0 +1,143 @@
+"""Record matches as input logs and replay them headless.
+
+A log is the game seed followed by every (tick, player, action) input, so
+re-simulating it with the same rules reproduces the match exactly. The
+format is little-endian binary: a header of magic, version, seed, arena
+size and player count, then 6-byte events, ending with an END event that
+carries the final tick. Version 2 logs have no player count and were all
+two-player matches; version 1 logs also lack the arena size and were all
+played on the standard board.
+"""
+import argparse
+import copy
+import struct
+
+from engine import GameState, GRID_COUNT
+
+MAGIC = b'PK26'
+VERSION = 3
+HEADER = struct.Struct('<4sHq')
+ARENA = struct.Struct('<H')
+ARENA_PLAYERS = struct.Struct('<HB')
+EVENT = struct.Struct('<IBB')
+
+# Action code of the closing event; its tick is the length of the match
+END = 255
+
+
+class Recorder:
+    """Writes the inputs of a running game to a binary stream."""
+
+    def __init__(self, stream, seed, size=GRID_COUNT, players=2):
+        self.stream = stream
+        self.stream.write(HEADER.pack(MAGIC, VERSION, seed))
+        self.stream.write(ARENA_PLAYERS.pack(size, players))
+
+    def record(self, tick, inputs):
+        """Log the inputs passed to GameState.step() while at tick."""
+        for player, action in inputs:
+            self.stream.write(EVENT.pack(tick, player, action))
+
+    def close(self, tick):
+        self.stream.write(EVENT.pack(tick, 0, END))
+        self.stream.flush()
+
+
+def read_header(stream):
+    """Read the start of a log as (seed, arena size, players)."""
+    magic, version, seed = HEADER.unpack(stream.read(HEADER.size))
+    if magic != MAGIC or version not in (1, 2, VERSION):
+        raise ValueError('not a pipka26 replay log')
+    if version == 1:
+        return seed, GRID_COUNT, 2
+    if version == 2:
+        size, = ARENA.unpack(stream.read(ARENA.size))
+        return seed, size, 2
+    return (seed,) + ARENA_PLAYERS.unpack(stream.read(ARENA_PLAYERS.size))
+
+
+def read_events(stream):
+    """Read the rest of a log as ({tick: [(player, action), ...]}, end_tick)."""
+    events = {}
+    end_tick = 0
+    data = stream.read()
+    usable = len(data) - len(data) % EVENT.size
+    for tick, player, action in EVENT.iter_unpack(data[:usable]):
+        end_tick = max(end_tick, tick)
+        if action == END:
+            break
+        events.setdefault(tick, []).append((player, action))
+    return events, end_tick
+
+
+def load(stream):
+    """Read a log back as (seed, {tick: [(player, action), ...]}, end_tick)."""
+    seed, _, _ = read_header(stream)
+    return (seed,) + read_events(stream)
+
+
+class Replayer:
+    """Re-simulates a recorded match as fast as the CPU allows.
+
+    A deep copy of the state is kept every keyframe_interval ticks while the
+    replay runs, so seek() only ever simulates less than one interval from
+    the nearest keyframe before the requested tick.
+    """
+
+    def __init__(self, seed, events, end_tick, keyframe_interval=500, size=GRID_COUNT,
+                 players=2):
+        self.seed = seed
+        self.size = size
+        self.players = players
+        self.events = events
+        self.end_tick = end_tick
+        self.keyframe_interval = keyframe_interval
+        self.keyframes = {}
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        with open(path, 'rb') as stream:
+            seed, size, players = read_header(stream)
+            return cls(seed, *read_events(stream), size=size, players=players, **kwargs)
+
+    def _advance(self, state, tick):
+        while state.tick < tick:
+            if state.tick % self.keyframe_interval == 0 and state.tick not in self.keyframes:
+                self.keyframes[state.tick] = copy.deepcopy(state)
+            state.step(self.events.get(state.tick, ()))
+        return state
+
+    def run(self):
+        """Play the whole log and return the final state."""
+        state = GameState(self.seed, size=self.size, players=self.players)
+        return self._advance(state, self.end_tick)
+
+    def seek(self, tick):
+        """The state after tick ticks, starting from the nearest keyframe."""
+        tick = min(tick, self.end_tick)
+        start = tick - tick % self.keyframe_interval
+        while start > 0 and start not in self.keyframes:
+            start -= self.keyframe_interval
+        if start in self.keyframes:
+            state = copy.deepcopy(self.keyframes[start])
+        else:
+            state = GameState(self.seed, size=self.size, players=self.players)
+        return self._advance(state, tick)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay a recorded match headless')
+    parser.add_argument('log', help='replay log written by game.py --record')
+    parser.add_argument('--tick', type=int, help='stop at this tick instead of the end')
+    args = parser.parse_args(argv)
+
+    replayer = Replayer.from_file(args.log)
+    state = replayer.run() if args.tick is None else replayer.seek(args.tick)
+    print(f'seed {replayer.seed}, tick {state.tick}/{replayer.end_tick}, '
+          f'level {state.current_level}, '
+          f'score {":".join(str(snake.score) for snake in state.snakes)}, '
+          f'game over: {state.game_over}')
+
+
+if __name__ == '__main__':
+    main()
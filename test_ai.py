@@ -0,0 +1,76 @@
+import time
+import unittest
+
+from ai import SnakeAI
+from engine import GameState, GRID_COUNT, UP, DOWN
+
+
+class TestSnakeAI(unittest.TestCase):
+    def setUp(self):
+        self.state = GameState(seed=3)
+        self.state.countdown_timer = 0
+        self.state.turrets = []
+        self.bot = SnakeAI(0)
+
+    def test_heads_for_food(self):
+        """Бот идёт к яблоку по кратчайшему пути"""
+        x, y = self.state.snake1.body[0]
+        self.state.food = (x, y - 5)
+        self.assertEqual(self.bot.decide(self.state), UP)
+
+    def test_turns_away_from_wall(self):
+        """У стены бот поворачивает, а не врезается"""
+        self.state.snake1.body = [(GRID_COUNT - 1, 10), (GRID_COUNT - 2, 10)]
+        self.assertIn(self.bot.decide(self.state), (UP, DOWN))
+
+    def test_avoids_bullet_path(self):
+        """Бот не выходит на клетку, через которую летит пуля"""
+        x, y = self.state.snake1.body[0]
+        self.state.food = (x + 5, y)
+        # A bullet one tick away from the cell straight ahead
+        self.state.bullets.spawn(x + 1, y - 1, 0.0, 1.0, source=7)
+        self.assertIn(self.bot.decide(self.state), (UP, DOWN))
+
+    def test_prefers_room_when_boxed_in(self):
+        """В тупике бот выбирает сторону, где больше места"""
+        state = self.state
+        state.food = None
+        x, y = 10, 10
+        state.snake1.body = [(x, y), (x - 1, y)]
+        # Snake 2's body closes off a small pocket above
+        state.snake2.body = [(x + 1, y), (x + 1, y - 1), (x + 1, y - 2), (x, y - 2),
+                             (x - 1, y - 2), (x - 2, y - 2), (x - 2, y - 1)]
+        self.assertEqual(self.bot.decide(state), DOWN)
+
+    def test_heads_for_distant_food_on_large_arena(self):
+        """На большой арене бот идёт к далёкому яблоку напрямую"""
+        state = GameState(seed=3, size=400)
+        state.countdown_timer = 0
+        state.turrets = []
+        state.power_up = None
+        x, y = state.snake1.body[0]
+        state.food = (x + 5, y + 150)
+        self.assertEqual(SnakeAI(0, state.size).decide(state), DOWN)
+
+    def test_plays_whole_matches_fast(self):
+        """Решение в среднем занимает заметно меньше миллисекунды"""
+        state = GameState(seed=11)
+        state.countdown_timer = 0
+        bots = [SnakeAI(0), SnakeAI(1)]
+        spent = decisions = 0
+        while not state.game_over and state.tick < 2000:
+            inputs = []
+            for bot in bots:
+                start = time.perf_counter()
+                action = bot.decide(state)
+                spent += time.perf_counter() - start
+                decisions += 1
+                if action is not None:
+                    inputs.append((bot.player, action))
+            state.step(inputs)
+        self.assertGreater(state.tick, 50)
+        self.assertLess(spent / decisions, 0.001)
+
+
+if __name__ == '__main__':
+    unittest.main()
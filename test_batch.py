@@ -0,0 +1,231 @@
+import random
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+import engine
+from batch import BatchEngine, NO_ACTION
+from engine import GameState, PowerUp, GRID_COUNT, UP, DOWN, LEFT, RIGHT, SHIELD, SPEED, POOP_EATER, TURRET
+
+POWER_UP_CYCLE = [TURRET, SPEED, POOP_EATER, SHIELD]
+
+
+class FirstPick:
+    """Заменитель random.Random: всегда крайнее допустимое значение"""
+
+    def randint(self, a, b):
+        return b
+
+    def choice(self, seq):
+        return seq[0]
+
+
+class FixedSpawnState(GameState):
+    """Эталонная игра, в которой еда и бонусы появляются в первой свободной клетке"""
+
+    def __init__(self):
+        self.power_ups_spawned = 0
+        super().__init__(seed=0)
+        self.rng = FirstPick()
+
+    def _first_free(self):
+        if not self.board.free:
+            return None
+        i = min(self.board.free)
+        return (i % GRID_COUNT, i // GRID_COUNT)
+
+    def spawn_food(self):
+        return self._first_free()
+
+    def spawn_power_up(self):
+        pos = self._first_free()
+        if pos is None:
+            return None
+        power_up_type = POWER_UP_CYCLE[self.power_ups_spawned % len(POWER_UP_CYCLE)]
+        self.power_ups_spawned += 1
+        return PowerUp(pos[0], pos[1], power_up_type)
+
+
+class FixedSpawnBatch(BatchEngine):
+    """Пакетный движок с теми же детерминированными появлениями"""
+
+    def __init__(self, batch_size, **kwargs):
+        self.power_ups_spawned = np.zeros(batch_size, dtype=np.int64)
+        super().__init__(batch_size, **kwargs)
+
+    def _pick_cells(self, free):
+        picks = free.argmax(axis=1)
+        picks[~free.any(axis=1)] = -1
+        return picks
+
+    def _pick_power_up_types(self, games):
+        types = np.array(POWER_UP_CYCLE)[self.power_ups_spawned[games] % len(POWER_UP_CYCLE)]
+        self.power_ups_spawned[games] += 1
+        return types
+
+    def _pick_monster_cells(self, games):
+        return np.full(len(games), (GRID_COUNT - 2) * GRID_COUNT + GRID_COUNT - 2)
+
+
+def choose_action(state, player, keys):
+    """Простая политика: к еде или бонусу, не врезаясь в стены и змей"""
+    snake = state.snakes[player]
+    head = snake.body[0]
+    target = state.food if keys.random() < 0.7 or not state.power_up else (
+        state.power_up.x, state.power_up.y)
+    target = target or head
+    moves = {RIGHT: (1, 0), LEFT: (-1, 0), DOWN: (0, 1), UP: (0, -1)}
+    order = sorted(moves, key=lambda a: (abs(head[0] + moves[a][0] - target[0]) +
+                                         abs(head[1] + moves[a][1] - target[1]),
+                                         keys.random()))
+    steps = 2 if snake.speed_boost else 1
+    for action in order:
+        dx, dy = moves[action]
+        if [dx, dy] == [-d for d in snake.direction]:
+            continue
+        # Stay off the walls, the snakes and poop for every cell moved this tick
+        cells = [(head[0] + dx * i, head[1] + dy * i) for i in range(1, steps + 1)]
+        if all(1 <= x < GRID_COUNT - 1 and 1 <= y < GRID_COUNT - 1 and
+               (x, y) not in state.poop.cells and
+               not any((x, y) in other.cells for other in state.snakes)
+               for x, y in cells):
+            return action
+    return NO_ACTION
+
+
+def snapshot(state):
+    power_up = state.power_up
+    return {
+        'bodies': [list(snake.body) for snake in state.snakes],
+        'scores': [snake.score for snake in state.snakes],
+        'timers': [(s.shield, s.speed_boost, s.poop_eater) for s in state.snakes],
+        'food': state.food,
+        'power_up': (power_up.x, power_up.y, power_up.type) if power_up else None,
+        'level': state.current_level,
+        'game_over': state.game_over,
+        'bullets': sorted((round(x, 9), round(y, 9)) for x, y in
+                          zip(state.bullets.x[:state.bullets.count],
+                              state.bullets.y[:state.bullets.count])),
+        'monsters': sorted((int(m.x * 2), int(m.y * 2)) for m in state.poop_monsters),
+        'poop': sorted(state.poop.cells),
+    }
+
+
+def batch_snapshot(batch, b):
+    G = batch.size
+    food = int(batch.food[b])
+    power_up = int(batch.power_up[b])
+    alive = batch.bullet_alive[b]
+    monsters = batch.monster_alive[b]
+    return {
+        'bodies': [batch.body(b, p) for p in range(2)],
+        'scores': batch.score[b].tolist(),
+        'timers': [(int(batch.shield[b, p]), int(batch.speed_boost[b, p]),
+                    int(batch.poop_eater[b, p])) for p in range(2)],
+        'food': (food % G, food // G) if food >= 0 else None,
+        'power_up': ((power_up % G, power_up // G, int(batch.power_up_type[b]))
+                     if power_up >= 0 else None),
+        'level': int(batch.level[b]),
+        'game_over': bool(batch.game_over[b]),
+        'bullets': sorted((round(x, 9), round(y, 9)) for x, y in
+                          zip(batch.bullet_x[b][alive].tolist(), batch.bullet_y[b][alive].tolist())),
+        'monsters': sorted(zip(batch.monster_x2[b][monsters].tolist(),
+                               batch.monster_y2[b][monsters].tolist())),
+        'poop': sorted((int(i) % G, int(i) // G) for i in np.flatnonzero(batch.poop[b])),
+    }
+
+
+class TestBatchParity(unittest.TestCase):
+    def test_matches_reference_games(self):
+        """Пакет из нескольких игр повторяет эталонный GameState тик в тик"""
+        games = 24
+        batch = FixedSpawnBatch(games, auto_reset=False)
+        states = [FixedSpawnState() for _ in range(games)]
+        keys = [random.Random(b) for b in range(games)]
+        for b in range(games):
+            self.assertEqual(batch_snapshot(batch, b), snapshot(states[b]))
+
+        for tick in range(1500):
+            actions = np.full((games, 2), NO_ACTION)
+            for b, state in enumerate(states):
+                if state.game_over:
+                    continue
+                for player in range(2):
+                    actions[b, player] = choose_action(state, player, keys[b])
+                state.step([(p, int(a)) for p, a in enumerate(actions[b]) if a != NO_ACTION])
+            batch.step(actions)
+            for b, state in enumerate(states):
+                self.assertEqual(batch_snapshot(batch, b), snapshot(state),
+                                 f'game {b} diverged at tick {tick + 1}')
+            if all(state.game_over for state in states):
+                break
+        self.assertTrue(all(state.game_over for state in states))
+        # The run should have exercised levels, monsters and poop
+        self.assertGreater(max(state.current_level for state in states), 2)
+
+    def test_boost_stops_when_game_ends(self):
+        """Ускоренная змейка в обоих движках замирает, как только игра кончилась"""
+        bodies = [[(10, 10)], [(12, 10), (13, 10)]]
+        directions = [(1, 0), (-1, 0)]
+        batch = FixedSpawnBatch(1, auto_reset=False)
+        state = FixedSpawnState()
+        state.turrets = []
+        batch.turret_active[:] = False
+        state.countdown_timer = 0
+        batch.countdown_timer[:] = 0
+        for p, snake in enumerate(state.snakes):
+            snake.body = bodies[p]
+            snake.direction = list(directions[p])
+            batch.occupancy[0, p] = 0
+            batch.length[0, p] = 0
+            for x, y in reversed(bodies[p]):
+                batch._push_head(np.array([0]), p, x, y)
+            batch.direction[0, p] = directions[p]
+        state.snake2.speed_boost = 10
+        batch.speed_boost[0, 1] = 10
+        state.food = (10, 10)
+        batch.food[0] = 10 * GRID_COUNT + 10
+        self.assertEqual(batch_snapshot(batch, 0), snapshot(state))
+
+        state.step()
+        batch.step()
+        self.assertTrue(batch.game_over[0])
+        self.assertEqual(batch.score[0].tolist(), [0, 0])
+        self.assertEqual(batch_snapshot(batch, 0), snapshot(state))
+
+
+class TestBatchEngine(unittest.TestCase):
+    def test_auto_reset(self):
+        """Закончившиеся игры сразу начинаются заново"""
+        batch = BatchEngine(16, seed=1)
+        finished = np.zeros(16, dtype=bool)
+        for _ in range(200):
+            done = batch.step(np.full((16, 2), UP))
+            finished |= done
+        self.assertTrue(finished.all())
+        self.assertFalse(batch.game_over.any())
+        for b in np.flatnonzero(batch.tick < 10):
+            self.assertEqual(batch.level[b], 1)
+            self.assertEqual(batch.score[b].tolist(), [0, 0])
+            self.assertEqual(batch.body(b, 0), [(5, GRID_COUNT // 2)])
+
+    def test_reads_balance_overrides(self):
+        """Переопределённые в engine параметры баланса действуют и в пакете"""
+        batch = BatchEngine(1, seed=0)
+        batch.countdown_timer[:] = 0
+        batch.turret_active[:] = False
+        batch.food[0] = (GRID_COUNT // 2) * GRID_COUNT + 6
+        with patch.object(engine, 'LEVEL_APPLES', 1):
+            batch.step()
+        self.assertEqual(batch.level[0], 2)
+
+    def test_spawns_on_empty_cells(self):
+        """Еда и бонус появляются только на свободных клетках внутри стен"""
+        batch = BatchEngine(64, seed=3)
+        blocked = batch._blocked(np.arange(64))
+        rows = np.arange(64)
+        self.assertFalse(blocked[rows, batch.food].any())
+        self.assertFalse(blocked[rows, batch.power_up].any())
+        self.assertTrue(batch.interior[batch.food].all())
+        self.assertTrue((batch.food != batch.power_up).all())
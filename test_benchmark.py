@@ -0,0 +1,46 @@
+import contextlib
+import io
+import os
+import unittest
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import benchmark
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_runs_every_scenario(self):
+        """Каждый сценарий отрабатывает и даёт перцентили тиков и кадров"""
+        results = benchmark.run(ticks=5, frames=2, warmup=2)
+        self.assertEqual(set(results), set(benchmark.SCENARIOS))
+        for result in results.values():
+            self.assertEqual(result['tick']['n'], 5)
+            self.assertEqual(result['frame']['n'], 2)
+            self.assertLessEqual(result['tick']['p50'], result['tick']['max'])
+
+    def test_scenarios_stay_alive(self):
+        """Змейки в сценариях не погибают, нагрузка не пропадает"""
+        for name, setup in benchmark.SCENARIOS.items():
+            state, inputs = setup(0)
+            for _ in range(50):
+                state.step(inputs(state) if inputs else ())
+            self.assertFalse(state.game_over, name)
+
+    def test_compare_flags_regressions(self):
+        """Замедление сверх порога считается регрессией"""
+        baseline = {'bullets': {'tick': {'p50': 1.0}}}
+        slow = {'bullets': {'tick': {'p50': 1.3}}}
+        fast = {'bullets': {'tick': {'p50': 1.1}}, 'new': {'tick': {'p50': 9.0}}}
+        self.assertEqual(len(benchmark.compare(slow, baseline, threshold=0.2)), 1)
+        self.assertEqual(benchmark.compare(fast, baseline, threshold=0.2), [])
+
+    def test_save_baseline_needs_path(self):
+        """--save-baseline без --baseline отвергается до запуска замеров"""
+        with contextlib.redirect_stderr(io.StringIO()):
+            with self.assertRaises(SystemExit) as raised:
+                benchmark.main(['--save-baseline'])
+        self.assertEqual(raised.exception.code, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import random
+import subprocess
+import sys
+import unittest
+
+import numpy as np
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from engine import GRID_COUNT, UP, DOWN, LEFT, RIGHT, FART
+from env import (SnakeEnv, CHANNELS, OWN_BODY, ENEMY_BODY, FOOD, POWER_UP, POOP,
+                 BULLETS, MONSTERS, TURRETS)
+
+
+def rebuild(state, player):
+    """Наблюдение, собранное заново из объектов игры"""
+    obs = np.zeros((CHANNELS, GRID_COUNT, GRID_COUNT), dtype=np.uint8)
+    own, enemy = state.snakes[player], state.snakes[1 - player]
+    for channel, snake in ((OWN_BODY, own), (ENEMY_BODY, enemy)):
+        for x, y in snake.body:
+            obs[channel, y, x] += 1
+    if state.food is not None:
+        obs[FOOD, state.food[1], state.food[0]] = 1
+    if state.power_up:
+        obs[POWER_UP, state.power_up.y, state.power_up.x] = state.power_up.type
+    for x, y in state.poop.cells:
+        obs[POOP, y, x] = 1
+    for cell in state.bullets.cells():
+        obs[BULLETS].flat[cell] = 1
+    for monster in state.poop_monsters:
+        obs[MONSTERS, int(monster.y), int(monster.x)] = 1
+    for turret in state.turrets:
+        obs[TURRETS, turret.y, turret.x] = 1
+    return obs
+
+
+class TestSnakeEnv(unittest.TestCase):
+    def test_observation_tracks_game(self):
+        """Наблюдение совпадает с заново собранным на протяжении многих эпизодов"""
+        env = SnakeEnv(seed=5)
+        keys = random.Random(5)
+        obs = env.reset()
+        episodes = 0
+        for _ in range(2000):
+            actions = [keys.choice([UP, DOWN, LEFT, RIGHT, FART, None]) for _ in range(2)]
+            result, rewards, done, info = env.step(*actions)
+            self.assertIs(result, obs)
+            np.testing.assert_array_equal(obs, rebuild(env.state, 0))
+            if done:
+                episodes += 1
+                self.assertIs(env.reset(), obs)
+                np.testing.assert_array_equal(obs, rebuild(env.state, 0))
+        self.assertGreater(episodes, 5)
+
+    def test_bodies_are_engine_memory(self):
+        """Каналы тел и есть сетки змей, без копирования"""
+        env = SnakeEnv(seed=1, player=1)
+        obs = env.reset()
+        state = env.state
+        self.assertIs(state.snake2.cells, env.snake_cells[1])
+        state.snake2.cells.add(3, 4)
+        self.assertEqual(obs[OWN_BODY, 4, 3], 1)
+        state.snake1.cells.add(7, 8)
+        self.assertEqual(obs[ENEMY_BODY, 8, 7], 1)
+
+    def test_rewards(self):
+        """Яблоко даёт очко, смерть отнимает"""
+        env = SnakeEnv(seed=2)
+        env.reset()
+        x, y = env.state.snake1.body[0]
+        env.state.food = (x + 1, y)
+        _, rewards, done, info = env.step(None, None)
+        self.assertEqual(rewards[0], 1.0)
+        self.assertEqual(info['scores'], (1, 0))
+        self.assertFalse(done)
+
+        # Snake 2 heads right into the wall first
+        for _ in range(GRID_COUNT):
+            _, rewards, done, info = env.step(None, None)
+            if done:
+                break
+        self.assertTrue(done)
+        self.assertEqual(info['deaths'], (None, 'wall'))
+        self.assertEqual(rewards, (0.0, -1.0))
+
+    def test_seeded_episodes_repeat(self):
+        """Одинаковый сид среды даёт одинаковые эпизоды"""
+        first, second = SnakeEnv(seed=9), SnakeEnv(seed=9)
+        for _ in range(3):
+            np.testing.assert_array_equal(first.reset(), second.reset())
+
+    def test_render_is_lazy(self):
+        """Среда не тянет pygame, пока её не попросят нарисовать"""
+        check = "import sys, env; env.SnakeEnv(seed=1).reset(); assert 'pygame' not in sys.modules"
+        subprocess.run([sys.executable, '-c', check], check=True,
+                       cwd=os.path.dirname(os.path.abspath(__file__)))
+        env = SnakeEnv(seed=1, render_mode='rgb_array')
+        env.reset()
+        frame = env.render()
+        self.assertEqual(frame.shape[2], 3)
+        self.assertEqual(frame.shape[:2], (GRID_COUNT * 20, GRID_COUNT * 20))
+        env.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,49 +1,11 @@
+import os
+import random
 import unittest
-import math
 from unittest.mock import MagicMock
 
-class Snake:
-    def __init__(self, x, y, color):
-        self.body = [(x, y)]
-        self.direction = [1, 0]
-        self.color = color
-        self.grow = False
-
-    def move(self):
-        x = self.body[0][0] + self.direction[0]
-        y = self.body[0][1] + self.direction[1]
-        self.body.insert(0, (x, y))
-        if not self.grow:
-            self.body.pop()
-        self.grow = False
-
-class Turret:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.bullets = []
-        self.shoot_timer = 0
-
-    def shoot(self, snake1, snake2):
-        if self.shoot_timer <= 0:
-            targets = [snake1.body[0], snake2.body[0]]
-            for target in targets:
-                dx = target[0] - self.x
-                dy = target[1] - self.y
-                length = math.sqrt(dx * dx + dy * dy)
-                if length > 0:
-                    dx = dx / length
-                    dy = dy / length
-                    self.bullets.append([self.x, self.y, dx, dy])
-            self.shoot_timer = 30
-
-    def update(self):
-        self.shoot_timer -= 1
-        for bullet in self.bullets[:]:
-            bullet[0] += bullet[2]
-            bullet[1] += bullet[3]
-            if not (0 <= bullet[0] < 40 and 0 <= bullet[1] < 40):  # MOCK_GRID_COUNT
-                self.bullets.remove(bullet)
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from engine import Snake, SnakeBody, Turret, BulletPool, ParticleSystem, FART_PARTICLE, STINK_PARTICLE, SHIELD, FlowField, PoopMonster, PoopIndex, PoopSpot, GameState, OccupancyGrid, FreeCells, GRID_COUNT, MAX_PLAYERS, TURRET_TARGETS, UP, DOWN, LEFT, RIGHT, FART, RESTART
 
 class TestSnakeMovement(unittest.TestCase):
     def setUp(self):
@@ -64,6 +26,137 @@ class TestSnakeMovement(unittest.TestCase):
         self.snake.move()
         self.assertEqual(len(self.snake.body), old_length + 1)
 
+class TestSnakeBody(unittest.TestCase):
+    def test_push_and_pop(self):
+        """Голова добавляется спереди, хвост снимается сзади"""
+        body = SnakeBody([(5,5), (4,5)])
+        body.push_head(6, 5)
+        self.assertEqual(list(body), [(6,5), (5,5), (4,5)])
+        self.assertEqual(body.pop_tail(), (4,5))
+        self.assertEqual(body[0], (6,5))
+        self.assertEqual(body[-1], (5,5))
+        self.assertEqual(list(body.without_head()), [(5,5)])
+
+    def test_wraps_and_grows(self):
+        """Кольцевой буфер переживает переход через край и расширение"""
+        body = SnakeBody([(0, 0)], capacity=4)
+        for i in range(1, 10):
+            body.push_head(i, 0)
+            if i % 3:
+                body.pop_tail()
+        expected = [(i, 0) for i in range(9, 9 - len(body), -1)]
+        self.assertEqual(list(body), expected)
+        for i in range(10, 30):
+            body.push_head(i, 0)
+        self.assertEqual(len(body), len(expected) + 20)
+        self.assertEqual(body[0], (29, 0))
+        self.assertEqual(body[-1], expected[-1])
+
+    def test_views_share_memory(self):
+        """Представления смотрят в те же массивы без копирования"""
+        body = SnakeBody([(1, 2), (3, 4)], capacity=2)
+        body.pop_tail()
+        body.push_head(5, 6)
+        views = body.views()
+        self.assertEqual(len(views), 2)
+        self.assertEqual([(x, y) for xs, ys in views for x, y in zip(xs, ys)],
+                         [(5, 6), (1, 2)])
+        body.xs[body.start] = 7
+        self.assertEqual(views[0][0][0], 7)
+
+class TestOccupancyGrid(unittest.TestCase):
+    def test_grid_follows_body(self):
+        """Сетка занятости обновляется при движении змейки"""
+        snake = Snake(5, 5, 'GREEN')
+        snake.body = [(5,5), (4,5)]
+        snake.move()
+        self.assertIn((6,5), snake.cells)
+        self.assertIn((5,5), snake.cells)
+        self.assertNotIn((4,5), snake.cells)
+
+    def test_counts_overlapping_segments(self):
+        """Клетка остаётся занятой, пока на ней есть хоть один сегмент"""
+        grid = OccupancyGrid()
+        grid.add(3, 3)
+        grid.add(3, 3)
+        grid.remove(3, 3)
+        self.assertIn((3, 3), grid)
+        grid.remove(3, 3)
+        self.assertNotIn((3, 3), grid)
+
+    def test_outside_board_is_empty(self):
+        """Клетки за пределами поля всегда пустые"""
+        grid = OccupancyGrid()
+        self.assertNotIn((-1, 0), grid)
+        self.assertNotIn((0, GRID_COUNT), grid)
+
+    def test_self_collision(self):
+        """Голова на собственном теле — столкновение"""
+        snake = Snake(5, 5, 'GREEN')
+        snake.body = [(5,5), (5,6), (4,6), (4,5), (5,5)]
+        other = Snake(20, 20, 'BLUE')
+        self.assertTrue(snake.check_collision(other))
+        snake.body = [(5,5), (5,6), (4,6)]
+        self.assertFalse(snake.check_collision(other))
+
+class TestFreeCells(unittest.TestCase):
+    def test_walls_are_not_free(self):
+        """Свободными считаются только клетки внутри стен"""
+        cells = FreeCells()
+        self.assertEqual(len(cells.free), (GRID_COUNT - 2) ** 2)
+        for _ in range(200):
+            x, y = cells.random_free()
+            self.assertTrue(1 <= x <= GRID_COUNT - 2)
+            self.assertTrue(1 <= y <= GRID_COUNT - 2)
+
+    def test_occupied_cells_are_never_picked(self):
+        """Занятые клетки не выдаются, освобождённые возвращаются в выборку"""
+        cells = FreeCells()
+        for y in range(1, GRID_COUNT - 1):
+            for x in range(1, GRID_COUNT - 1):
+                if (x, y) != (7, 9):
+                    cells.add(x, y)
+        self.assertEqual(cells.random_free(), (7, 9))
+        cells.add(7, 9)
+        cells.remove(3, 4)
+        self.assertEqual(cells.random_free(), (3, 4))
+
+    def test_large_board_builds_list_when_crowded(self):
+        """Большое поле обходится без списка, пока не заполнится наполовину"""
+        cells = FreeCells(300)
+        self.assertIsNone(cells.free)
+        for _ in range(200):
+            x, y = cells.random_free()
+            self.assertTrue(1 <= x <= 298 and 1 <= y <= 298)
+        for y in range(1, 299):
+            for x in range(1, 299):
+                if (x, y) != (7, 9):
+                    cells.add(x, y)
+        self.assertEqual(cells.random_free(), (7, 9))
+        self.assertEqual(cells.free, [9 * 300 + 7])
+        cells.clear()
+        self.assertIsNone(cells.free)
+
+    def test_full_board(self):
+        """На заполненном поле спавн сообщает об этом, а не зависает"""
+        state = GameState()
+        for y in range(1, GRID_COUNT - 1):
+            for x in range(1, GRID_COUNT - 1):
+                if (x, y) not in state.board:
+                    state.board.add(x, y)
+        self.assertIsNone(state.spawn_food())
+        self.assertIsNone(state.spawn_power_up())
+
+    def test_food_avoids_snakes_and_power_up(self):
+        """Яблоко не появляется на змейках, турелях и бонусе"""
+        state = GameState()
+        state.snake1.body = [(x, 5) for x in range(1, GRID_COUNT - 1)]
+        for _ in range(200):
+            food = state.spawn_food()
+            self.assertNotIn(food, state.snake1.cells)
+            self.assertNotEqual(food, (state.power_up.x, state.power_up.y))
+            self.assertNotEqual(food, (GRID_COUNT // 2, GRID_COUNT // 2))
+
 class TestTurretShooting(unittest.TestCase):
     def setUp(self):
         self.turret = Turret(20, 20)
@@ -86,6 +179,672 @@ class TestTurretShooting(unittest.TestCase):
         self.assertAlmostEqual(bullet[2], expected_dx)
         self.assertAlmostEqual(bullet[3], expected_dy)
 
+    def test_party_volley_aims_at_nearest(self):
+        """В большой партии залп летит только в ближайшие змейки"""
+        far = MagicMock()
+        far.body = [(20, 35)]
+        near = MagicMock()
+        near.body = [(20, 22)]
+        self.turret.shoot(far, self.mock_snake1, near, self.mock_snake2)
+        self.assertEqual(len(self.turret.bullets), TURRET_TARGETS)
+        directions = [(b[2], b[3]) for b in self.turret.bullets]
+        self.assertEqual(directions, [(1, 0), (0, 1)])
+
+class TestBulletPool(unittest.TestCase):
+    def test_bullets_leave_the_board(self):
+        """Снаряд за пределами поля удаляется, остальные сохраняются"""
+        pool = BulletPool()
+        pool.spawn(GRID_COUNT - 1, 20, 1, 0, 0)
+        pool.spawn(20, 20, 0, 1, 0)
+        pool.update()
+        self.assertEqual(len(pool), 1)
+        self.assertEqual((pool.x[0], pool.y[0]), (20, 21))
+
+    def test_pool_grows(self):
+        """Пул расширяется, не теряя снаряды"""
+        pool = BulletPool(capacity=2)
+        for i in range(5):
+            pool.spawn(i, i, 0, 0, i)
+        self.assertEqual(len(pool), 5)
+        self.assertEqual(pool.source[:5].tolist(), [0, 1, 2, 3, 4])
+
+    def test_own_turret_does_not_hit(self):
+        """Снаряд собственной турели не убивает змейку"""
+        pool = BulletPool()
+        pool.spawn(5.5, 6.2, 0, 0, 1)
+        self.assertEqual(pool.hit_heads([(5, 6), (5, 6), (7, 7)], [-1, 1, -1]),
+                         [True, False, False])
+
+    def test_turrets_share_pool(self):
+        """Все турели игры стреляют в общий пул"""
+        state = GameState()
+        state.add_turret(Turret(3, 3))
+        for turret in state.turrets:
+            turret.shoot(state.snake1, state.snake2)
+        self.assertEqual(len(state.bullets), 4)
+        self.assertEqual(len(state.turrets[1].bullets), 2)
+
+class TestParticleSystem(unittest.TestCase):
+    def test_particles_expire_and_slots_are_reused(self):
+        """Частица живёт свой срок, а её слот используется повторно"""
+        particles = ParticleSystem(capacity=4)
+        particles.spawn(FART_PARTICLE, 1, 1, radius=2, lifetime=2)
+        slot = particles.live()[0]
+        particles.update()
+        self.assertEqual(len(particles), 1)
+        self.assertEqual(particles.radius[slot], 2.5)
+        particles.update()
+        self.assertEqual(len(particles), 0)
+        particles.spawn(FART_PARTICLE, 2, 2)
+        self.assertEqual(particles.live().tolist(), [slot])
+
+    def test_oldest_is_evicted_when_full(self):
+        """При переполнении вытесняется самая старая частица"""
+        particles = ParticleSystem(capacity=3)
+        for x in range(5):
+            particles.spawn(FART_PARTICLE, x, 0)
+        self.assertEqual(len(particles), 3)
+        self.assertEqual(sorted(particles.x[particles.live()].tolist()), [2, 3, 4])
+
+    def test_fart_spam_is_capped(self):
+        """Спам кнопки пука не раздувает пул"""
+        state = GameState()
+        state.snake1.body = [(5, 20), (4, 20)]
+        for _ in range(1000):
+            state.step([(0, FART)])
+        self.assertLessEqual(len(state.particles), state.particles.capacity)
+
+class TestFlowField(unittest.TestCase):
+    def test_path_goes_around_obstacles(self):
+        """Путь обходит препятствия, а не упирается в них"""
+        grid = OccupancyGrid()
+        for y in range(0, 30):
+            grid.add(10, y)  # стена с проходом внизу
+        field = FlowField()
+        field.compute((5, 5), grid.cells, goals=[(15, 5)])
+        self.assertEqual(field.dist[5 * GRID_COUNT + 15], 10 + 2 * 25)
+        cell, steps = (15, 5), 0
+        while cell != (5, 5):
+            cell = field.next_step(cell)
+            self.assertNotIn(cell, grid)
+            steps += 1
+        self.assertEqual(steps, 60)
+
+    def test_unreachable_cell_has_no_step(self):
+        """В отрезанную клетку пути нет"""
+        grid = OccupancyGrid()
+        for pos in [(4, 5), (6, 5), (5, 4), (5, 6)]:
+            grid.add(*pos)
+        field = FlowField()
+        field.compute((20, 20), grid.cells, goals=[(5, 5)])
+        self.assertIsNone(field.next_step((5, 5)))
+
+    def test_search_stops_at_limit(self):
+        """Поиск с лимитом останавливается и сообщает об этом"""
+        grid = OccupancyGrid(500)
+        field = FlowField(500)
+        self.assertTrue(field.compute((10, 10), grid.cells, goals=[(400, 400)], limit=100))
+        self.assertIsNone(field.next_step((400, 400)))
+        self.assertFalse(field.compute((10, 10), grid.cells, goals=[(12, 10)], limit=100))
+        self.assertEqual(field.next_step((12, 10)), (11, 10))
+
+    def test_monster_reaches_tail_behind_wall(self):
+        """Монстр обходит тело другой змейки и догоняет хвост"""
+        state = GameState()
+        state.snake1.body = [(5, 20)]
+        state.snake1.direction = [0, 0]
+        state.snake2.body = [(10, y) for y in range(2, 35)]
+        state.snake2.direction = [0, 0]
+        state.snake1.god_mode = state.snake2.god_mode = True
+        monster = PoopMonster(15, 20, state.snake1)
+        state.poop_monsters.append(monster)
+        state.countdown_timer = 0
+        for _ in range(200):
+            state.update_flow_fields()
+            monster.move(state.flow_fields[state.snake1] if monster.aligned() else None)
+            self.assertNotIn((int(monster.x), int(monster.y)), state.snake2.cells)
+            if (monster.x, monster.y) == (5, 20):
+                break
+        self.assertEqual((monster.x, monster.y), (5, 20))
+
+class TestPoopIndex(unittest.TestCase):
+    def test_poop_kills_unless_owner_eats_it(self):
+        """Какашка убивает, пока у её хозяина не активен поедатель"""
+        owner = Snake(20, 20, 'BLUE')
+        snake = Snake(5, 5, 'GREEN')
+        poop = PoopIndex()
+        poop.add(PoopSpot(5, 5), owner)
+        self.assertTrue(snake.check_collision(owner, poop=poop))
+        owner.poop_eater = 10
+        self.assertFalse(snake.check_collision(owner, poop=poop))
+
+    def test_shared_cell_keeps_both_owners(self):
+        """На одной клетке помнятся какашки обеих змеек"""
+        snake1 = Snake(5, 5, 'GREEN')
+        snake2 = Snake(20, 20, 'BLUE')
+        poop = PoopIndex()
+        poop.add(PoopSpot(3, 3), snake1)
+        poop.add(PoopSpot(3, 3), snake2)
+        snake1.poop_eater = 10
+        self.assertEqual(poop.owners((3, 3)), [snake1, snake2])
+        self.assertTrue(poop.is_deadly((3, 3)))
+
+    def test_next_level_clears_poop(self):
+        """Новый уровень убирает все какашки и освобождает клетки"""
+        state = GameState()
+        state.snake1.apples_eaten = 2
+        state.move_snake(state.snake1)
+        self.assertEqual(len(state.poop), 1)
+        x, y = next(iter(state.poop.cells))
+        count = state.board.count(x, y)
+        state.next_level()
+        self.assertEqual(len(state.poop), 0)
+        self.assertEqual(state.snake1.poop_spots, [])
+        self.assertEqual(state.board.count(x, y), count - 1)
+
+class TestGameState(unittest.TestCase):
+    def setUp(self):
+        self.state = GameState()
+        self.state.countdown_timer = 0
+
+    def test_import_without_display(self):
+        """Логика игры импортируется и работает без окна pygame"""
+        import subprocess
+        import sys
+        check = "import sys, engine; assert 'pygame' not in sys.modules"
+        subprocess.run([sys.executable, '-c', check], check=True,
+                       cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.state.step()
+        self.assertEqual(self.state.snake1.body[0], (6, GRID_COUNT // 2))
+
+    def test_large_arena(self):
+        """На большой арене змейки стартуют у краёв и упираются в её стены"""
+        state = GameState(seed=2, size=300)
+        state.countdown_timer = 0
+        self.assertEqual(state.snake2.body[0], (294, 150))
+        self.assertEqual((state.turrets[0].x, state.turrets[0].y), (150, 150))
+        for _ in range(5):
+            state.step()
+        self.assertFalse(state.game_over)
+        state.step()
+        self.assertEqual(state.snake2.death, 'wall')
+        x, y = state.food
+        self.assertTrue(1 <= x <= 298 and 1 <= y <= 298)
+
+    def test_countdown_blocks_movement(self):
+        """Во время обратного отсчёта змейки стоят на месте"""
+        self.state.countdown_timer = 2
+        head = self.state.snake1.body[0]
+        self.state.step()
+        self.state.step()
+        self.assertEqual(self.state.snake1.body[0], head)
+        self.state.step()
+        self.assertNotEqual(self.state.snake1.body[0], head)
+
+    def test_input_changes_direction(self):
+        """Ввод игрока меняет направление, но не даёт развернуться назад"""
+        self.state.step([(0, UP), (1, RIGHT)])
+        self.assertEqual(self.state.snake1.direction, [0, -1])
+        self.assertEqual(self.state.snake2.direction, [1, 0])
+        self.state.step([(0, DOWN)])
+        self.assertEqual(self.state.snake1.direction, [0, -1])
+
+    def test_eating_food(self):
+        """Змейка растёт и получает очко за яблоко"""
+        head = self.state.snake1.body[0]
+        self.state.food = (head[0] + 1, head[1])
+        self.state.step()
+        self.assertEqual(self.state.snake1.score, 1)
+        self.assertEqual(self.state.apples_eaten_this_level, 1)
+        self.state.step()
+        self.assertEqual(len(self.state.snake1.body), 2)
+
+    def test_speed_boost_moves_twice(self):
+        """Ускорение двигает змейку на две клетки за тик"""
+        x, y = self.state.snake1.body[0]
+        self.state.snake1.speed_boost = 2
+        self.state.step()
+        self.assertEqual(self.state.snake1.body[0], (x + 2, y))
+        self.assertEqual(self.state.snake2.body[0][0], GRID_COUNT - 5)
+        self.state.step()
+        self.state.step()
+        self.assertEqual(self.state.snake1.body[0], (x + 5, y))
+
+    def test_boosted_snake_eats_food_on_the_way(self):
+        """Ускоренная змейка не перепрыгивает яблоко"""
+        x, y = self.state.snake1.body[0]
+        self.state.snake1.speed_boost = 10
+        self.state.food = (x + 1, y)
+        self.state.step()
+        self.assertEqual(self.state.snake1.score, 1)
+
+    def test_boosted_snake_stops_when_game_ends(self):
+        """После конца игры ускоренная змейка не делает второй шаг"""
+        state = self.state
+        state.turrets = []
+        state.snake1.body = [(10, 10)]
+        state.snake1.direction = [1, 0]
+        state.snake2.body = [(12, 10), (13, 10)]
+        state.snake2.direction = [-1, 0]
+        state.snake2.speed_boost = 10
+        state.food = (10, 10)
+        state.step()
+        self.assertTrue(state.game_over)
+        self.assertEqual(state.snake2.body[0], (11, 10))
+        self.assertEqual(state.snake2.score, 0)
+
+    def test_wall_ends_game(self):
+        """Выход за стену заканчивает игру"""
+        self.state.step([(0, LEFT)])
+        for _ in range(10):
+            self.state.step()
+        self.assertTrue(self.state.game_over)
+
+    def test_many_ticks_headless(self):
+        """Симуляция прогоняет тысячи тиков без дисплея"""
+        ticks = 0
+        while ticks < 5000:
+            if self.state.game_over:
+                self.state.reset()
+                self.state.countdown_timer = 0
+            self.state.step()
+            ticks += 1
+        self.assertGreaterEqual(self.state.current_level, 1)
+
+class TestPartyMatch(unittest.TestCase):
+    def setUp(self):
+        self.state = GameState(seed=4, players=4)
+        self.state.countdown_timer = 0
+        self.state.turrets = []
+        self.state.power_up = None
+
+    def test_player_count_is_checked(self):
+        """Число игроков ограничено от 2 до MAX_PLAYERS"""
+        for players in (1, MAX_PLAYERS + 1):
+            with self.assertRaises(ValueError):
+                GameState(players=players)
+        self.assertEqual(len(GameState(players=MAX_PLAYERS).snakes), MAX_PLAYERS)
+
+    def test_start_positions_are_spread(self):
+        """Змейки стартуют на разных клетках, чётные слева, нечётные справа"""
+        state = GameState(players=MAX_PLAYERS)
+        heads = [snake.body[0] for snake in state.snakes]
+        self.assertEqual(len(set(heads)), MAX_PLAYERS)
+        self.assertEqual({x for x, _ in heads[::2]}, {5})
+        self.assertEqual({x for x, _ in heads[1::2]}, {GRID_COUNT - 6})
+        self.assertEqual(state.snake2.body[0], heads[1])
+
+    def test_match_goes_on_after_one_death(self):
+        """Погибшая змейка убирается с поля, остальные играют дальше"""
+        state = self.state
+        loser = state.snakes[2]
+        loser.body = [(0, 30)]
+        loser.direction = [-1, 0]
+        state.step()
+        self.assertEqual(loser.death, 'wall')
+        self.assertFalse(state.game_over)
+        self.assertEqual(len(loser.body), 0)
+        self.assertNotIn((0, 30), state.bodies)
+        heads = [snake.body[0] for snake in state.alive()]
+        state.step([(2, DOWN)])
+        self.assertEqual(len(state.alive()), 3)
+        self.assertEqual([snake.body[0] for snake in state.alive()],
+                         [(x + 1, y) for x, y in heads])
+
+    def test_head_on_kills_both(self):
+        """Лобовое столкновение убивает обеих, кто бы ни ходил первым"""
+        for first, second in ((0, 1), (1, 0)):
+            state = GameState(seed=4, players=4)
+            state.countdown_timer = 0
+            state.turrets = []
+            a, b = state.snakes[first], state.snakes[second]
+            a.body = [(10, 10), (9, 10)]
+            a.direction = [1, 0]
+            b.body = [(12, 10), (13, 10)]
+            b.direction = [-1, 0]
+            state.step()
+            self.assertEqual((a.death, b.death), ('snake', 'snake'))
+            self.assertFalse(state.game_over)
+            self.assertEqual(len(state.alive()), 2)
+
+    def test_swapping_heads_kills_both(self):
+        """Змейки, проскочившие друг сквозь друга, погибают обе"""
+        state = self.state
+        a, b = state.snakes[0], state.snakes[1]
+        a.body = [(10, 10), (9, 10)]
+        b.body = [(11, 10), (12, 10)]
+        b.direction = [-1, 0]
+        state.step()
+        self.assertTrue(a.death and b.death)
+
+    def test_last_survivor_ends_match(self):
+        """Игра кончается, когда в живых остаётся одна змейка"""
+        state = self.state
+        for i in (1, 2, 3):
+            state.snakes[i].death = 'wall'
+            state.snakes[i].body = []
+        state.snakes[0].body = [(GRID_COUNT - 1, 5)]
+        state.step()
+        self.assertTrue(state.game_over)
+
+
+def fingerprint(state):
+    """Всё состояние игры в сравнимом виде"""
+    return (state.tick, state.current_level, state.apples_eaten_this_level,
+            state.countdown_timer, state.game_over, state.food,
+            state.power_up and (state.power_up.x, state.power_up.y, state.power_up.type),
+            state.rng.getstate(), bytes(state.board.cells), list(state.board.free),
+            bytes(state.bodies.cells), {pos: list(spots) for pos, spots in state.poop.cells.items()},
+            [(list(snake.body), bytes(snake.cells.cells), snake.direction, snake.score,
+              snake.death, snake.shield, snake.speed_boost, snake.poop_eater, snake.grow,
+              list(snake.poop_spots)) for snake in state.snakes],
+            [(turret.x, turret.y, turret.shoot_timer) for turret in state.turrets],
+            [(m.x, m.y, m.heading, m.target_snake) for m in state.poop_monsters],
+            state.bullets.x[:state.bullets.count].tolist(), state.bullets.next_id,
+            state.particles.x.tolist(), list(state.particles.free), state.state_hash())
+
+
+def play(state, rng, ticks):
+    """Случайная игра с кормлением и рестартами; хэши по тикам"""
+    hashes = []
+    for _ in range(ticks):
+        if state.game_over:
+            inputs = [(0, RESTART)] if rng.random() < 0.2 else []
+        else:
+            inputs = [(rng.randrange(state.players), rng.choice([UP, DOWN, LEFT, RIGHT, FART]))
+                      for _ in range(rng.randrange(3))]
+            snake = rng.choice(state.alive())
+            x, y = snake.body[0]
+            ahead = (x + snake.direction[0], y + snake.direction[1])
+            if 0 < ahead[0] < state.size - 1 and 0 < ahead[1] < state.size - 1 and \
+                    ahead not in state.board:
+                state.food = ahead
+        state.step(inputs)
+        hashes.append(state.state_hash())
+    return hashes
+
+
+class TestCheckpoints(unittest.TestCase):
+    def test_restore_replays_exactly(self):
+        """Откат возвращает игру в точности, и она повторяется тик в тик"""
+        state = GameState(seed=5, players=4)
+        play(state, random.Random(1), 50)
+        checkpoint = state.save()
+        before = fingerprint(state)
+        hashes = play(state, random.Random(2), 400)
+        self.assertGreater(state.current_level, 2)
+        self.assertGreater(len(state.poop_monsters), 1)
+        state.restore(checkpoint)
+        self.assertEqual(fingerprint(state), before)
+        self.assertEqual(play(state, random.Random(2), 400), hashes)
+
+    def test_rollback_window(self):
+        """Окно отката: старые точки забываются, журнал не растёт"""
+        state = GameState(seed=6)
+        rng = random.Random(3)
+        window = []
+        for _ in range(300):
+            window.append((state.save(), fingerprint(state)))
+            if len(window) > 8:
+                state.release(window.pop(0)[0])
+            play(state, rng, 1)
+            if rng.random() < 0.2:
+                checkpoint, saved = window[rng.randrange(len(window))]
+                state.restore(checkpoint)
+                self.assertEqual(fingerprint(state), saved)
+                window = [entry for entry in window if entry[0].live]
+        self.assertLessEqual(len(state.checkpoints), 8)
+        state.release(window[-1][0])
+        self.assertEqual(state.trail, [])
+        self.assertIsNone(state.board.trail)
+        self.assertIsNone(state.snake1.body.trail)
+
+    def test_stale_checkpoint_is_rejected(self):
+        """Точка, сохранённая после той, к которой откатились, недействительна"""
+        state = GameState(seed=7)
+        first = state.save()
+        state.step()
+        second = state.save()
+        state.restore(first)
+        with self.assertRaises(ValueError):
+            state.restore(second)
+
+    def test_hash_tells_games_apart(self):
+        """Одинаковые игры дают одинаковый хэш, расхождение сразу видно"""
+        games = [GameState(seed=8, players=3) for _ in range(2)]
+        hashes = [play(state, random.Random(4), 200) for state in games]
+        self.assertEqual(hashes[0], hashes[1])
+        self.assertGreater(len(set(hashes[0])), 150)
+        games = [GameState(seed=8, players=3) for _ in range(2)]
+        for state, turn in zip(games, (UP, DOWN)):
+            state.countdown_timer = 0
+            state.step([(1, turn)])
+        self.assertNotEqual(games[0].state_hash(), games[1].state_hash())
+
+    def test_hashes_are_kept_up_to_date(self):
+        """Хэши тел и помёта совпадают с посчитанными заново"""
+        state = GameState(seed=9)
+        play(state, random.Random(5), 300)
+        for snake in state.snakes:
+            self.assertEqual(snake.body.hash, SnakeBody(list(snake.body)).hash)
+        poop = PoopIndex()
+        for spots in state.poop.cells.values():
+            for spot, owner in spots:
+                poop.add(spot, owner)
+        self.assertEqual(poop.hash, state.poop.hash)
+
+    def test_free_cells_undo_in_order(self):
+        """Откат доски восстанавливает и порядок свободных клеток"""
+        rng = random.Random(6)
+        for size in (20, 300):
+            grid = FreeCells(size)
+            grid.trail = []
+            cells = [(rng.randrange(size), rng.randrange(size)) for _ in range(200)]
+            for x, y in cells[:100]:
+                grid.add(x, y)
+            before = (bytes(grid.cells), grid.free and list(grid.free), grid.occupied)
+            mark = len(grid.trail)
+            for x, y in cells[100:]:
+                grid.add(x, y)
+            for x, y in cells[50:150]:
+                grid.remove(x, y)
+            grid.random_free(rng)
+            while len(grid.trail) > mark:
+                record = grid.trail.pop()
+                record[0].undo(record)
+            self.assertEqual((bytes(grid.cells), grid.free and list(grid.free), grid.occupied),
+                             before)
+
+
+class TestRendering(unittest.TestCase):
+    def setUp(self):
+        import pygame
+        import game
+        self.pygame = pygame
+        self.game = game
+        pygame.init()
+
+    def test_background_is_cached(self):
+        """Фон рисуется один раз на размер окна"""
+        first = self.game.get_background((800, 800))
+        self.assertIs(self.game.get_background((800, 800)), first)
+        self.assertEqual(first.get_at((0, 0))[:3], (139, 0, 0))
+        self.assertEqual(first.get_at((25, 25))[:3], (30, 30, 30))
+
+    def test_background_rebuilt_on_resize(self):
+        """При смене размера окна фон перестраивается"""
+        first = self.game.get_background((800, 800))
+        second = self.game.get_background((400, 400))
+        self.assertIsNot(first, second)
+        self.assertEqual(second.get_size(), (400, 400))
+        self.assertEqual(second.get_at((399, 200))[:3], (139, 0, 0))
+
+    def test_dirty_rects_match_full_redraw(self):
+        """Частичная перерисовка даёт тот же кадр, что и полная"""
+        pygame = self.pygame
+        screen = pygame.display.set_mode((800, 800))
+        full = pygame.Surface((800, 800))
+        renderer = self.game.DirtyRectRenderer(screen)
+        state = GameState()
+        state.power_up = None  # its animation depends on wall-clock time
+        state.snake1.god_mode = state.snake2.god_mode = True
+        for tick in range(60):
+            state.step([(0, UP)] if tick == 20 else [])
+            if tick == 25:
+                head = state.snake1.body[0]
+                state.food = (head[0], head[1] - 1)
+            renderer.render(state)
+            self.game.draw_game(full, state)
+            self.assertEqual(pygame.image.tobytes(screen, 'RGB'),
+                             pygame.image.tobytes(full, 'RGB'))
+        self.assertFalse(renderer.full_redraw)
+
+    def test_draw_calls_do_not_grow_with_snakes(self):
+        """Число вызовов отрисовки не зависит от длины змей и количества помёта"""
+        from profiler import Profiler
+        pygame = self.pygame
+        counts = []
+        for length in (2, 600):
+            state = GameState(seed=3, profiler=Profiler(enabled=True))
+            state.power_up = None
+            state.snake1.body = [(x, y) for y in range(2, 38) for x in range(1, 39)][:length]
+            for x in range(1, length // 20 + 2):
+                state.poop.add(PoopSpot(x, 38), state.snake2)
+            state.poop_monsters.append(PoopMonster(20, 39, None))
+            surface = pygame.Surface((800, 800))
+            self.game.draw_game(surface, state)
+            counts.append(state.profiler.counters['draw_calls'])
+            self.assertEqual(surface.get_at((5 + 20 * 37, 5 + 20 * 15))[:3],
+                             (0, 255, 0) if length > 2 else (30, 30, 30))
+            # Monster body with its red eyes, from one pre-rendered sprite
+            self.assertEqual(surface.get_at((20 * 20 + 2, 39 * 20 + 2))[:3], (139, 69, 19))
+            self.assertEqual(surface.get_at((20 * 20 + 6, 39 * 20 + 6))[:3], (255, 0, 0))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_effect_frames_are_baked_once(self):
+        """Кадры анимаций рисуются один раз и масштабируются под клетку"""
+        atlas = self.game.EffectAtlas(max_entries=3)
+        frame = atlas.frame('stink', 8, 20)
+        self.assertIs(atlas.frame('stink', 8, 20), frame)
+        small, _ = atlas.frame('stink', 8, 10)
+        self.assertLess(small.get_width(), frame[0].get_width())
+        # Brown rings around a transparent centre
+        surface, (cx, cy) = frame
+        self.assertEqual(surface.get_at((cx, cy))[:3], atlas.TRANSPARENT)
+        self.assertIn((139, 69, 19), [surface.get_at((cx + dx, cy))[:3] for dx in range(1, 6)])
+        atlas.frame('fart', 4, 20)
+        atlas.frame(SHIELD, 0, 20)
+        atlas.frame(SHIELD, 1, 20)
+        self.assertNotIn(('stink', 8, 20), atlas.frames)
+
+    def test_effects_are_one_draw_call(self):
+        """Любое число облачков рисуется одним вызовом"""
+        from profiler import Profiler
+        counts = []
+        for particles in (1, 200):
+            state = GameState(seed=3, profiler=Profiler(enabled=True))
+            state.power_up = None
+            for i in range(particles):
+                kind = STINK_PARTICLE if i % 2 else FART_PARTICLE
+                state.particles.spawn(kind, i % 38 + 1, i // 38 + 1, radius=1 + i % 3)
+            self.game.draw_game(self.pygame.Surface((800, 800)), state, 0.5)
+            counts.append(state.profiler.counters['draw_calls'])
+        self.assertEqual(counts[0], counts[1])
+
+    def test_interpolated_frame_between_ticks(self):
+        """Кадр между тиками рисует змейку на полпути"""
+        pygame = self.pygame
+        surface = pygame.Surface((800, 800))
+        state = GameState()
+        state.countdown_timer = 0
+        state.power_up = None
+        prev = self.game.capture_positions(state)
+        state.step()
+        self.game.draw_game(surface, state, 0.5, prev)
+        x, y = prev[state.snake1][0]
+        px = int((x + 0.5) * 20)
+        self.assertEqual(surface.get_at((px + 2, y * 20 + 2))[:3], (0, 255, 0))
+        self.assertNotEqual(surface.get_at((px - 5, y * 20 + 2))[:3], (0, 255, 0))
+
+    def test_camera_shows_standard_arena_whole(self):
+        """Стандартная арена видна целиком в обоих режимах камеры"""
+        state = GameState()
+        for follow in (None, 0, 1):
+            camera = self.game.Camera((800, 800), follow)
+            camera.update(state)
+            self.assertEqual(camera.key(), (0, 0, 20))
+            self.assertTrue(camera.shows_whole(state.size, (800, 800)))
+
+    def test_camera_follows_snake_on_large_arena(self):
+        """Камера держит голову змейки в центре и не выходит за арену"""
+        pygame = self.pygame
+        state = GameState(seed=1, size=300)
+        state.power_up = None
+        state.snake1.body = [(150, 100)]
+        camera = self.game.Camera((800, 800), follow=0)
+        camera.update(state)
+        self.assertEqual(camera.visible(state.size), (130, 80, 171, 121))
+        surface = pygame.Surface((800, 800))
+        self.game.draw_game(surface, state, camera=camera)
+        self.assertEqual(surface.get_at((392, 392))[:3], (0, 255, 0))
+
+        # Near the edge the view stops at the wall
+        state.snake1.body = [(2, 2)]
+        camera.update(state)
+        self.assertEqual((camera.x, camera.y), (0, 0))
+        self.game.draw_game(surface, state, camera=camera)
+        self.assertEqual(surface.get_at((5, 5))[:3], (139, 0, 0))
+
+    def test_fit_camera_zooms_out_for_both_snakes(self):
+        """В режиме fit камера отдаляется, чтобы обе головы были в кадре"""
+        state = GameState(seed=1, size=120)
+        camera = self.game.Camera((800, 800))
+        camera.update(state)
+        self.assertLess(camera.cell, 20)
+        x0, _, x1, _ = camera.visible(state.size)
+        for snake in state.snakes:
+            self.assertTrue(x0 <= snake.body[0][0] < x1)
+
+    def test_camera_skips_knocked_out_snake(self):
+        """Камера не следит за выбывшей змейкой и рисует партию без неё"""
+        import pygame
+        state = GameState(seed=1, size=120, players=4)
+        state.snakes[0].death = 'wall'
+        state.snakes[0].body = []
+        camera = self.game.Camera((800, 800), follow=0)
+        camera.update(state)
+        x0, y0, x1, y1 = camera.visible(state.size)
+        for snake in state.snakes[1:]:
+            x, y = snake.body[0]
+            self.assertTrue(x0 <= x < x1 and y0 <= y < y1)
+        self.game.draw_game(pygame.Surface((800, 800)), state, camera=camera)
+
+class TestTextCache(unittest.TestCase):
+    def setUp(self):
+        import pygame
+        import game
+        pygame.init()
+        self.game = game
+
+    def test_rendered_text_is_reused(self):
+        """Повторный текст берётся из кэша, шрифт создаётся один раз"""
+        cache = self.game.TextCache()
+        first = cache.render('Level: 1', 36, (255, 255, 255))
+        self.assertIs(cache.render('Level: 1', 36, (255, 255, 255)), first)
+        self.assertIsNot(cache.render('Level: 1', 36, (0, 255, 0)), first)
+        cache.render('Level: 2', 36, (255, 255, 255))
+        self.assertEqual(list(cache.fonts), [36])
+
+    def test_least_recently_used_is_evicted(self):
+        """При переполнении вытесняется давно не использованный текст"""
+        cache = self.game.TextCache(max_entries=2)
+        first = cache.render('a', 36, (255, 255, 255))
+        cache.render('b', 36, (255, 255, 255))
+        cache.render('a', 36, (255, 255, 255))
+        cache.render('c', 36, (255, 255, 255))
+        self.assertIs(cache.render('a', 36, (255, 255, 255)), first)
+        self.assertNotIn(('b', 36, (255, 255, 255)), cache.surfaces)
+
 # class TestUtils(unittest.TestCase):
 #     def test_mock_grid_count(self):
 #         """Проверка выхода снаряда за границы поля"""
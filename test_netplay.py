@@ -0,0 +1,191 @@
+import asyncio
+import os
+import random
+import threading
+import time
+import unittest
+
+import numpy as np
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from engine import GameState, UP, DOWN, LEFT, RIGHT, FART, RESTART
+from netplay import (Server, NetClient, SnapshotEncoder, SnapshotDecoder, RemoteState,
+                     format_report)
+
+
+def assert_matches(test, snap, state):
+    """Снимок совпадает с состоянием сервера на том же тике"""
+    test.assertEqual(snap.tick, state.tick)
+    test.assertEqual(snap.game_over, state.game_over)
+    test.assertEqual(snap.level, state.current_level)
+    test.assertEqual(snap.food, state.food)
+    for (body, score, death, _), snake in zip(snap.snakes, state.snakes):
+        test.assertEqual(body, list(snake.body))
+        test.assertEqual(score, snake.score)
+        test.assertEqual(death, snake.death)
+    test.assertEqual(snap.poop, list(state.poop.cells))
+    test.assertEqual(snap.turrets, [(turret.x, turret.y) for turret in state.turrets])
+    test.assertEqual([(x, y) for x, y, _ in snap.monsters],
+                     [(monster.x, monster.y) for monster in state.poop_monsters])
+    n = state.bullets.count
+    test.assertEqual(len(snap.bullets), n)
+    np.testing.assert_allclose(snap.bullets[:, 0], state.bullets.x[:n], atol=1e-3)
+    np.testing.assert_allclose(snap.bullets[:, 1], state.bullets.y[:n], atol=1e-3)
+    test.assertEqual(len(snap.particles), len(state.particles))
+
+
+class TestSnapshots(unittest.TestCase):
+    def test_deltas_rebuild_every_tick(self):
+        """Дельты от любого подтверждённого тика восстанавливают состояние точно"""
+        state = GameState(seed=8, players=4)
+        encoder = SnapshotEncoder()
+        decoder = SnapshotDecoder()
+        encoder.record(state)
+        acked = None
+        rng = random.Random(9)
+        keyframes = rounds = 0
+        for _ in range(1500):
+            inputs = [(rng.randrange(4), rng.choice([UP, DOWN, LEFT, RIGHT, FART]))
+                      for _ in range(rng.randrange(3))]
+            if state.game_over:
+                # Bullets stand still until someone restarts
+                inputs = [(0, RESTART)] if rng.random() < 0.1 else []
+                rounds += bool(inputs)
+            elif state.tick % 5 == 0:
+                # Feed a snake so there is poop and level changes to sync
+                snake = rng.choice(state.alive())
+                x, y = snake.body[0]
+                ahead = (x + snake.direction[0], y + snake.direction[1])
+                if 0 < ahead[0] < state.size - 1 and 0 < ahead[1] < state.size - 1 and \
+                        ahead not in state.board:
+                    state.food = ahead
+            state.step(inputs)
+            encoder.record(state)
+            data = encoder.encode(state, acked)
+            keyframes += acked not in encoder.records
+            # The client misses some snapshots, so bases lag by a few ticks
+            if rng.random() < 0.6:
+                snap = decoder.decode(data)
+                assert_matches(self, snap, state)
+                acked = snap.tick
+        self.assertGreater(rounds, 2)
+        self.assertGreater(state.current_level, 1)
+        self.assertLess(keyframes, 10)
+
+    def test_delta_is_much_smaller_than_keyframe(self):
+        """Дельта длинных змей весит в разы меньше ключевого кадра"""
+        state = GameState(seed=1)
+        state.countdown_timer = 0
+        for snake in state.snakes:
+            snake.god_mode = True
+        state.snake1.body = [(x, y) for y in range(2, 20) for x in range(1, 39)]
+        encoder = SnapshotEncoder()
+        encoder.record(state)
+        base = state.tick
+        state.step()
+        encoder.record(state)
+        keyframe = encoder.encode(state)
+        delta = encoder.encode(state, base)
+        self.assertLess(len(delta) * 20, len(keyframe))
+
+    def test_unknown_base_is_rejected(self):
+        """Дельта к неизвестному тику не принимается"""
+        state = GameState(seed=2)
+        encoder = SnapshotEncoder()
+        encoder.record(state)
+        state.step()
+        encoder.record(state)
+        with self.assertRaises(ValueError):
+            SnapshotDecoder().decode(encoder.encode(state, 0))
+
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.server = Server(players=2, tick_rate=100)
+        self.port = self.call(self.server.start())
+        self.clients = []
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        self.stop()
+        self.loop.close()
+
+    def call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(5)
+
+    def stop(self):
+        if self.loop.is_running():
+            self.call(self.server.close())
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(5)
+
+    def connect(self, match):
+        client = NetClient('127.0.0.1', self.port, match)
+        self.clients.append(client)
+        return client
+
+    def test_matches_over_localhost(self):
+        """Несколько матчей идут в одном процессе, клиенты видят то же, что сервер"""
+        pairs = [(self.connect('a'), self.connect('a')), (self.connect('b'), self.connect('b'))]
+        self.assertEqual([client.player for pair in pairs for client in pair], [0, 1, 0, 1])
+        latest = {}
+        deadline = time.perf_counter() + 10
+        while time.perf_counter() < deadline:
+            for client in self.clients:
+                snap = client.poll()
+                if snap:
+                    latest[client] = snap
+                    if snap.tick % 7 == 0:
+                        client.send([UP if snap.tick % 14 else DOWN])
+            if len(latest) == 4 and min(snap.tick for snap in latest.values()) >= 40:
+                break
+            time.sleep(0.002)
+        self.assertGreaterEqual(min(snap.tick for snap in latest.values()), 40)
+
+        report = self.server.report()
+        self.assertEqual(set(report), {'a', 'b'})
+        for stats in report.values():
+            self.assertGreater(stats['tick_ms']['mean'], 0)
+            self.assertIn('encode', stats['phases_ms'])
+            for client in stats['clients']:
+                self.assertGreater(client['kbps'], 0)
+                # Only the first ticks, before any acknowledgement, are keyframes
+                self.assertLess(client['keyframes'] * 10, client['snapshots'])
+        self.assertTrue(format_report(report, 100)[0].startswith('2 matches'))
+
+        matches = dict(self.server.matches)
+        self.stop()
+        for client in self.clients:
+            while not client.closed:
+                snap = client.poll()
+                if snap:
+                    latest[client] = snap
+                time.sleep(0.001)
+        for (first, second), name in zip(pairs, 'ab'):
+            state = matches[name].state
+            for client in (first, second):
+                assert_matches(self, latest[client], state)
+
+        import pygame
+        from game import WINDOW_SIZE, draw_game
+        view = RemoteState(state.size, state.players)
+        view.apply(latest[first])
+        self.assertEqual(view.snake1.body, list(state.snake1.body))
+        pygame.init()
+        draw_game(pygame.Surface((WINDOW_SIZE, WINDOW_SIZE)), view)
+
+    def test_full_match_turns_players_away(self):
+        """Третьему игроку в матч на двоих отказывают"""
+        self.connect('duel')
+        self.connect('duel')
+        with self.assertRaises(ConnectionError):
+            self.connect('duel')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from engine import GameState, PoopMonster
+from profiler import Profiler
+
+
+class TestProfiler(unittest.TestCase):
+    def test_disabled_records_nothing(self):
+        """Выключенный профилировщик ничего не копит"""
+        profiler = Profiler()
+        self.assertIs(profiler.scope('a'), profiler.scope('b'))
+        with profiler.scope('a'):
+            pass
+        profiler.count('bullets', 5)
+        profiler.end_frame(0.5)
+        self.assertEqual(profiler.frames, 0)
+        self.assertEqual(profiler.phases, {})
+        self.assertEqual(profiler.counters, {})
+
+    def test_phases_histogram_and_spikes(self):
+        """Фазы, гистограмма кадров и медленные кадры попадают в сводку"""
+        profiler = Profiler(enabled=True, spike_ms=50)
+        for seconds in (0.002, 0.010, 0.080):
+            with profiler.scope('turrets'):
+                pass
+            profiler.count('bullets', 3)
+            profiler.end_frame(seconds)
+        with profiler.scope('monsters'):
+            pass
+        profiler.end_frame(0.001)
+
+        summary = profiler.summary()
+        self.assertEqual(summary['frames'], 4)
+        self.assertEqual(len(profiler.phases['turrets']), 4)
+        self.assertEqual(len(profiler.phases['monsters']), 1)
+        self.assertEqual(summary['histogram']['<4ms'], 2)
+        self.assertEqual(summary['histogram']['<16ms'], 1)
+        self.assertEqual(summary['histogram']['<100ms'], 1)
+        self.assertEqual(summary['counters'], {'bullets': 3})
+        self.assertEqual([spike['frame'] for spike in summary['spikes']], [3])
+
+    def test_export_json_and_csv(self):
+        """Сводка дописывается в JSON-журнал и в CSV с одним заголовком"""
+        profiler = Profiler(enabled=True, spike_ms=0)
+        with profiler.scope('move'):
+            pass
+        profiler.end_frame(0.01)
+        with tempfile.TemporaryDirectory() as tmp:
+            log = os.path.join(tmp, 'profile.jsonl')
+            table = os.path.join(tmp, 'profile.csv')
+            profiler.export(log)
+            profiler.export(table)
+            profiler.export(table)
+            with open(log) as f:
+                entry = json.loads(f.readline())
+            self.assertIn('move', entry['phases'])
+            self.assertEqual(len(entry['spikes']), 1)
+            with open(table, newline='') as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['frames'], '1')
+        self.assertIn('move_max', rows[0])
+        # Spikes already logged are not repeated
+        self.assertEqual(rows[1]['spikes'], '0')
+
+    def test_periodic_export(self):
+        """С заданным файлом сводки пишутся сами по интервалу"""
+        with tempfile.TemporaryDirectory() as tmp:
+            log = os.path.join(tmp, 'profile.jsonl')
+            profiler = Profiler(enabled=True, export_path=log, export_interval=0)
+            profiler.end_frame(0.01)
+            profiler.end_frame(0.01)
+            with open(log) as f:
+                self.assertEqual(len(f.readlines()), 2)
+
+    def test_game_phases(self):
+        """Тик игры и отрисовка размечены по фазам"""
+        from game import WINDOW_SIZE, draw_game, count_entities
+        import pygame
+
+        profiler = Profiler(enabled=True)
+        state = GameState(seed=1, profiler=profiler)
+        state.countdown_timer = 0
+        state.poop_monsters.append(PoopMonster(2, 2, state.snake1))
+        state.step()
+        pygame.init()
+        draw_game(pygame.Surface((WINDOW_SIZE, WINDOW_SIZE)), state)
+        count_entities(profiler, state)
+        profiler.end_frame(0.01)
+        for phase in ('particles', 'turrets', 'move', 'pickups', 'collisions', 'monsters',
+                      'draw_background', 'draw_snakes', 'draw_text'):
+            self.assertIn(phase, profiler.phases)
+        self.assertEqual(profiler.counters['monsters'], 1)
+        self.assertEqual(profiler.counters['length1'], 1)
+        self.assertGreater(profiler.counters['draw_calls'], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
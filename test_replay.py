@@ -0,0 +1,137 @@
+import io
+import os
+import random
+import struct
+import tempfile
+import unittest
+
+from engine import GameState, UP, DOWN, LEFT, RIGHT, FART, RESTART
+from replay import END, EVENT, MAGIC, Recorder, Replayer, load, read_header
+from test_game import fingerprint
+
+
+def play_random_match(seed, ticks, stream):
+    """Сыграть матч со случайным вводом, записывая его в поток"""
+    state = GameState(seed)
+    recorder = Recorder(stream, state.seed)
+    keys = random.Random(seed + 1)
+    for _ in range(ticks):
+        inputs = []
+        if keys.random() < 0.3:
+            inputs.append((keys.randint(0, 1), keys.choice([UP, DOWN, LEFT, RIGHT, FART])))
+        if state.game_over:
+            inputs.append((0, RESTART))
+        recorder.record(state.tick, inputs)
+        state.step(inputs)
+    recorder.close(state.tick)
+    return state
+
+
+class TestDeterminism(unittest.TestCase):
+    def test_same_seed_same_match(self):
+        """Одинаковый сид и ввод дают одинаковую партию"""
+        first = play_random_match(7, 1000, io.BytesIO())
+        second = play_random_match(7, 1000, io.BytesIO())
+        self.assertEqual(fingerprint(first), fingerprint(second))
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self.stream = io.BytesIO()
+        self.final = play_random_match(42, 3000, self.stream)
+        self.stream.seek(0)
+
+    def test_log_round_trip(self):
+        """Лог читается обратно с тем же сидом и длиной"""
+        seed, events, end_tick = load(self.stream)
+        self.assertEqual(seed, 42)
+        self.assertEqual(end_tick, 3000)
+        self.assertTrue(events)
+
+    def test_replay_reproduces_match(self):
+        """Повтор лога приходит к тому же состоянию"""
+        replayer = Replayer(*load(self.stream))
+        self.assertEqual(fingerprint(replayer.run()), fingerprint(self.final))
+
+    def test_seek_from_keyframe(self):
+        """Перемотка от ключевого кадра совпадает с полным прогоном"""
+        replayer = Replayer(*load(self.stream), keyframe_interval=250)
+        replayer.run()
+        self.assertIn(2500, replayer.keyframes)
+        state = replayer.seek(2600)
+        expected = Replayer(replayer.seed, replayer.events, 2600).run()
+        self.assertEqual(fingerprint(state), fingerprint(expected))
+
+    def test_arena_size_is_recorded(self):
+        """Размер арены сохраняется в логе и используется при повторе"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'match.log')
+            state = GameState(5, size=60)
+            with open(path, 'wb') as stream:
+                recorder = Recorder(stream, state.seed, state.size)
+                for _ in range(200):
+                    recorder.record(state.tick, [])
+                    state.step()
+                recorder.close(state.tick)
+            replayer = Replayer.from_file(path)
+        self.assertEqual(replayer.size, 60)
+        self.assertEqual(fingerprint(replayer.run()), fingerprint(state))
+
+    def test_party_match_is_recorded(self):
+        """Число игроков сохраняется в логе, старые логи читаются как дуэли"""
+        state = GameState(6, size=50, players=6)
+        stream = io.BytesIO()
+        recorder = Recorder(stream, state.seed, state.size, players=6)
+        keys = random.Random(7)
+        for _ in range(300):
+            inputs = [(keys.randrange(6), keys.choice([UP, DOWN, LEFT, RIGHT]))]
+            recorder.record(state.tick, inputs)
+            state.step(inputs)
+        recorder.close(state.tick)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'party.log')
+            with open(path, 'wb') as f:
+                f.write(stream.getvalue())
+            replayer = Replayer.from_file(path)
+        self.assertEqual(replayer.players, 6)
+        final = replayer.run()
+        self.assertEqual([snake.score for snake in final.snakes],
+                         [snake.score for snake in state.snakes])
+        self.assertEqual([snake.death for snake in final.snakes],
+                         [snake.death for snake in state.snakes])
+
+        # A version 2 header is seed and arena size only
+        old = struct.pack('<4sHqH', MAGIC, 2, 9, 60)
+        self.assertEqual(read_header(io.BytesIO(old)), (9, 60, 2))
+
+    def test_duel_log_from_before_party_matches(self):
+        """Лог дуэли версии 2 с рестартами повторяется так же, как до партий"""
+        # Both snakes send inputs whether alive or not, so a dead snake's
+        # fart draws from the generator until someone restarts
+        keys = random.Random(30)
+        state = GameState(30)
+        log = [struct.pack('<4sHqH', MAGIC, 2, 30, 40)]
+        for _ in range(1500):
+            inputs = [(keys.randint(0, 1), keys.choice([UP, DOWN, LEFT, RIGHT, FART, FART]))
+                      for _ in range(keys.randrange(3))]
+            if state.game_over and keys.random() < 0.2:
+                inputs.append((0, RESTART))
+            log += [EVENT.pack(state.tick, player, action) for player, action in inputs]
+            state.step(inputs)
+        log.append(EVENT.pack(1500, 0, END))
+        final = Replayer(*load(io.BytesIO(b''.join(log)))).run()
+        # As the engine played this log before party matches came in
+        self.assertEqual(fingerprint(final), fingerprint(state))
+        self.assertEqual((final.tick, final.current_level, final.food,
+                          [snake.score for snake in final.snakes],
+                          [list(snake.body) for snake in final.snakes], final.poop_monsters),
+                         (1500, 1, (8, 8), [3, 0], [[(5, 20)], [(34, 20)]], []))
+
+    def test_rejects_other_files(self):
+        """Чужой файл не принимается за лог"""
+        with self.assertRaises(ValueError):
+            load(io.BytesIO(b'not a log at all'))
+
+
+if __name__ == '__main__':
+    unittest.main(argv=[''], exit=False, verbosity=2)
@@ -0,0 +1,39 @@
+import unittest
+
+from tournament import play_match, run_tournament, greedy_policy, random_policy, DEATHS, DRAW
+
+
+class TestTournament(unittest.TestCase):
+    def test_match_is_reproducible(self):
+        """Матч с тем же сидом и ботами повторяется в точности"""
+        policies = [greedy_policy, random_policy]
+        first = play_match(11, policies)
+        self.assertEqual(first, play_match(11, policies))
+        seed, winner, ticks, level, s1, s2, d1, d2 = first
+        self.assertIn(winner, (0, 1, DRAW))
+        self.assertTrue(d1 or d2 or ticks == 5000)
+        self.assertLess(max(d1, d2), len(DEATHS))
+
+    def test_results_do_not_depend_on_workers(self):
+        """Итоги одинаковы при одном и нескольких процессах"""
+        one = run_tournament(['greedy', 'random'], 60, workers=1, chunk_size=7)
+        two = run_tournament(['greedy', 'random'], 60, workers=2, chunk_size=7)
+        self.assertEqual(one.matches, 60)
+        self.assertEqual(one.summary(), two.summary())
+        self.assertEqual(sum(one.wins) + one.draws, 60)
+        self.assertEqual(sum(one.levels.values()), 60)
+        # Greedy almost never runs into the wall
+        self.assertGreater(one.wins[0], one.wins[1])
+
+    def test_overrides_reach_workers(self):
+        """Переопределённые параметры баланса действуют в рабочих процессах"""
+        normal = run_tournament(['greedy', 'greedy'], 20, workers=2, max_ticks=300)
+        quick = run_tournament(['greedy', 'greedy'], 20, workers=2, max_ticks=300,
+                               overrides={'LEVEL_APPLES': 1})
+        self.assertGreater(max(quick.levels), max(normal.levels))
+        with self.assertRaises(ValueError):
+            run_tournament(['greedy', 'greedy'], 1, overrides={'GRID_COUNT': 10})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,262 @@
+"""Headless bot-vs-bot tournaments spread across a process pool.
+
+Each worker process plays chunks of seeded matches with its own engine and
+sends back one compact tuple per match; the parent folds them into win
+rates, match lengths, death causes and per-level statistics as chunks
+arrive. Matches are independent, so throughput grows with the number of
+cores. Balance knobs from engine (SHIELD_TIME, SHOOT_INTERVAL,
+LEVEL_APPLES, ...) can be overridden for a whole run with --set.
+
+    python tournament.py greedy random --matches 10000 --set LEVEL_APPLES=6
+"""
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import random
+import time
+from collections import Counter
+
+import ai
+import engine
+from engine import DEATHS, GameState, GRID_COUNT, UP, DOWN, LEFT, RIGHT, DIRECTIONS
+
+TUNABLES = ('SHIELD_TIME', 'SPEED_TIME', 'POOP_EATER_TIME', 'SHOOT_INTERVAL', 'LEVEL_APPLES')
+
+# Winner codes in a match record
+DRAW = -1
+
+
+def random_policy(state, player, rng):
+    """Turn at random now and then."""
+    if rng.random() < 0.2:
+        return rng.choice([UP, DOWN, LEFT, RIGHT])
+    return None
+
+
+def greedy_policy(state, player, rng):
+    """Head for the apple along the first safe direction."""
+    snake = state.snakes[player]
+    head = snake.body[0]
+    target = state.food or head
+    options = sorted(DIRECTIONS, key=lambda a: (
+        abs(head[0] + DIRECTIONS[a][0] - target[0]) +
+        abs(head[1] + DIRECTIONS[a][1] - target[1]), rng.random()))
+    for action in options:
+        dx, dy = DIRECTIONS[action]
+        if [dx, dy] == [-snake.direction[0], -snake.direction[1]]:
+            continue
+        x, y = head[0] + dx, head[1] + dy
+        if (0 <= x < GRID_COUNT and 0 <= y < GRID_COUNT and (x, y) not in state.poop.cells
+                and not any((x, y) in other.cells for other in state.snakes)):
+            return action
+    return None
+
+
+POLICIES = {
+    'random': random_policy,
+    'greedy': greedy_policy,
+    'ai': ai.policy,
+}
+
+
+def load_policy(name):
+    """A policy by registered name, or 'module:function' for any callable.
+
+    A policy is called as policy(state, player, rng) and returns one of the
+    direction actions, or None to keep going.
+    """
+    if name in POLICIES:
+        return POLICIES[name]
+    module, _, attr = name.partition(':')
+    if not attr:
+        raise ValueError(f'unknown policy {name!r}')
+    return getattr(importlib.import_module(module), attr)
+
+
+def play_match(seed, policies, max_ticks=5000):
+    """Play one match and return its record.
+
+    The record is (seed, winner, ticks, level, score1, score2, death1,
+    death2), winner being 0, 1 or DRAW and deaths indices into DEATHS.
+    The snake that survives wins; if both die or time runs out, the higher
+    score wins.
+    """
+    state = GameState(seed)
+    state.countdown_timer = 0
+    rngs = [random.Random(seed * 2 + player) for player in range(2)]
+    while not state.game_over and state.tick < max_ticks:
+        inputs = []
+        for player, policy in enumerate(policies):
+            action = policy(state, player, rngs[player])
+            if action is not None:
+                inputs.append((player, action))
+        state.step(inputs)
+
+    deaths = [snake.death for snake in state.snakes]
+    scores = [snake.score for snake in state.snakes]
+    if deaths[0] and not deaths[1]:
+        winner = 1
+    elif deaths[1] and not deaths[0]:
+        winner = 0
+    elif scores[0] != scores[1]:
+        winner = 0 if scores[0] > scores[1] else 1
+    else:
+        winner = DRAW
+    return (seed, winner, state.tick, state.current_level, scores[0], scores[1],
+            DEATHS.index(deaths[0]), DEATHS.index(deaths[1]))
+
+
+# Per-process state, set up once by the pool initializer
+_worker = {}
+
+
+def _init_worker(policy_names, overrides, max_ticks):
+    for name, value in overrides.items():
+        setattr(engine, name, value)
+    _worker['policies'] = [load_policy(name) for name in policy_names]
+    _worker['max_ticks'] = max_ticks
+
+
+def _play_chunk(seeds):
+    policies = _worker['policies']
+    swapped = policies[::-1]
+    records = []
+    for seed in seeds:
+        # Alternate sides so neither policy profits from its spawn point
+        if seed % 2:
+            record = play_match(seed, swapped, _worker['max_ticks'])
+            seed, winner, ticks, level, s1, s2, d1, d2 = record
+            record = (seed, 1 - winner if winner != DRAW else DRAW, ticks, level, s2, s1, d2, d1)
+        else:
+            record = play_match(seed, policies, _worker['max_ticks'])
+        records.append(record)
+    return records
+
+
+class Results:
+    """Running totals over match records, from the first policy's side."""
+
+    def __init__(self, names):
+        self.names = names
+        self.matches = 0
+        self.wins = [0, 0]
+        self.draws = 0
+        self.lengths = []
+        self.deaths = [Counter(), Counter()]
+        self.levels = Counter()
+        self.level_ticks = Counter()
+
+    def add(self, record):
+        seed, winner, ticks, level, s1, s2, d1, d2 = record
+        self.matches += 1
+        if winner == DRAW:
+            self.draws += 1
+        else:
+            self.wins[winner] += 1
+        self.lengths.append(ticks)
+        for player, death in enumerate((d1, d2)):
+            self.deaths[player][DEATHS[death] or 'alive'] += 1
+        self.levels[level] += 1
+        self.level_ticks[level] += ticks
+
+    def summary(self):
+        lengths = sorted(self.lengths)
+        n = max(self.matches, 1)
+
+        def percentile(q):
+            return lengths[min(len(lengths) - 1, int(q * len(lengths)))] if lengths else 0
+
+        return {
+            'matches': self.matches,
+            'policies': list(self.names),
+            'win_rate': [wins / n for wins in self.wins],
+            'draw_rate': self.draws / n,
+            'length': {
+                'mean': sum(lengths) / n,
+                'p50': percentile(0.5),
+                'p90': percentile(0.9),
+                'max': lengths[-1] if lengths else 0,
+            },
+            'deaths': [dict(counter) for counter in self.deaths],
+            'levels': {
+                level: {'matches': count, 'mean_length': self.level_ticks[level] / count}
+                for level, count in sorted(self.levels.items())
+            },
+        }
+
+
+def run_tournament(policy_names, matches, workers=None, chunk_size=32,
+                   first_seed=0, overrides=None, max_ticks=5000, progress=None):
+    """Play matches seeded first_seed.. between two policies; returns Results."""
+    overrides = overrides or {}
+    for name in overrides:
+        if name not in TUNABLES:
+            raise ValueError(f'{name} is not one of {", ".join(TUNABLES)}')
+    seeds = range(first_seed, first_seed + matches)
+    chunks = [seeds[i:i + chunk_size] for i in range(0, matches, chunk_size)]
+    results = Results(policy_names)
+    args = (policy_names, overrides, max_ticks)
+    # Fresh interpreters: a forked child of a process that already ran
+    # pygame.init() can deadlock
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(workers, initializer=_init_worker, initargs=args) as pool:
+        for records in pool.imap_unordered(_play_chunk, chunks):
+            for record in records:
+                results.add(record)
+            if progress:
+                progress(results)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Play headless bot matches on every core')
+    parser.add_argument('policies', nargs=2,
+                        help=f'two policies: {", ".join(POLICIES)} or module:function')
+    parser.add_argument('--matches', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='worker processes (default: all cores)')
+    parser.add_argument('--chunk-size', type=int, default=32,
+                        help='matches per batch sent back from a worker')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first match')
+    parser.add_argument('--max-ticks', type=int, default=5000,
+                        help='score decides matches that run this long')
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE',
+                        help=f'override a balance knob ({", ".join(TUNABLES)})')
+    parser.add_argument('--json', metavar='PATH', help='also write the summary as JSON')
+    args = parser.parse_args(argv)
+
+    overrides = {}
+    for item in args.set:
+        name, _, value = item.partition('=')
+        overrides[name] = int(value)
+
+    start = time.perf_counter()
+    results = run_tournament(args.policies, args.matches, args.workers, args.chunk_size,
+                             args.seed, overrides, args.max_ticks)
+    elapsed = time.perf_counter() - start
+    summary = results.summary()
+    summary['overrides'] = overrides
+    summary['seconds'] = elapsed
+
+    a, b = args.policies
+    print(f'{summary["matches"]} matches in {elapsed:.1f}s '
+          f'({sum(results.lengths) / elapsed:,.0f} ticks/s)')
+    print(f'{a}: {summary["win_rate"][0]:.1%}  {b}: {summary["win_rate"][1]:.1%}  '
+          f'draws: {summary["draw_rate"]:.1%}')
+    length = summary['length']
+    print(f'length: mean {length["mean"]:.0f}, p50 {length["p50"]}, '
+          f'p90 {length["p90"]}, max {length["max"]}')
+    for name, deaths in zip(args.policies, summary['deaths']):
+        print(f'{name} deaths: ' + ', '.join(f'{cause} {count}' for cause, count
+                                             in sorted(deaths.items(), key=lambda i: -i[1])))
+    for level, stats in summary['levels'].items():
+        print(f'level {level}: {stats["matches"]} matches, mean length {stats["mean_length"]:.0f}')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()